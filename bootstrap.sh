@@ -9,11 +9,18 @@ MODE="dev"
 if [[ "${2:-}" == "--prod" ]]; then
   MODE="prod"
   shift
+elif [[ "${2:-}" == "--cluster" ]]; then
+  MODE="cluster"
+  shift
 fi
 
 COMPOSE_FILE="docker-compose.yml"
+WEAVIATE_SERVICES="weaviate"
 if [[ "$MODE" == "prod" ]]; then
   COMPOSE_FILE="docker-compose.prod.yml"
+elif [[ "$MODE" == "cluster" ]]; then
+  COMPOSE_FILE="docker-compose.cluster.yml"
+  WEAVIATE_SERVICES="weaviate weaviate-1 weaviate-2"
 fi
 
 # Detect docker compose v2 vs v1
@@ -32,14 +39,20 @@ fi
 WEAVIATE_HOST_PORT="${WEAVIATE_HOST_PORT:-8081}"
 WEAVIATE_GRPC_HOST_PORT="${WEAVIATE_GRPC_HOST_PORT:-50052}"
 
+# Bulk load: Weaviate builds vector indexes asynchronously, ETL streams each tier once
+if [[ "${BULK_LOAD:-0}" == "1" ]]; then
+  export ASYNC_INDEXING="${ASYNC_INDEXING:-true}"
+fi
+
 
 
 usage() {
   cat <<EOF
-Usage: ./bootstrap.sh {setup|up|build|load|logs|down|ps} [--prod]
+Usage: ./bootstrap.sh {setup|up|build|load|logs|down|ps} [--prod|--cluster]
 
 Options:
-  --prod : use docker-compose.prod.yml (no volumes, baked-in data/code)
+  --prod    : use docker-compose.prod.yml (no volumes, baked-in data/code)
+  --cluster : use docker-compose.cluster.yml (3 Weaviate nodes, sharded + replicated schema)
 
   setup  : up → build → load (one-click)
   up     : start Weaviate (and deps) in background
@@ -52,6 +65,12 @@ Options:
 Env (optional):
   WEAVIATE_HOST_PORT       (default: 8081)
   WEAVIATE_GRPC_HOST_PORT  (default: 50052)
+  BULK_LOAD=1              bulk load: async indexing + one streaming pass per tier
+                           (timings appended to data/outputs/import_timings.json)
+  SNAPSHOTS=0              always load from CSV/npy; default 1 restores ./weaviate_backups when the
+                           artifacts are unchanged and saves a snapshot after a full load
+  BLUE_GREEN=1             load into new <Tier>_v<timestamp> collections while the current ones keep
+                           serving; flip the alias registry after a sanity query, drop old versions
 EOF
 }
 wait_for_weaviate() {
@@ -100,8 +119,8 @@ check_ports() {
 
 cmd_up() {
   check_ports
-  echo "🚀 Starting services (weaviate)…"
-  (cd "$PROJECT_ROOT" && $COMPOSE up -d --remove-orphans weaviate)
+  echo "🚀 Starting services (${WEAVIATE_SERVICES})…"
+  (cd "$PROJECT_ROOT" && $COMPOSE up -d --remove-orphans $WEAVIATE_SERVICES)
   echo "✅ Weaviate should be coming up."
   echo "   Try: http://localhost:${WEAVIATE_HOST_PORT}/v1/graphql"
   echo "🌐 Weaviate REST will be available at: http://localhost:${WEAVIATE_HOST_PORT}/v1/graphql"
@@ -125,7 +144,7 @@ cmd_load() {
 
 cmd_logs() {
   echo "🪵 Tailing logs (Ctrl+C to stop)…"
-  (cd "$PROJECT_ROOT" && $COMPOSE logs -f weaviate etl || true)
+  (cd "$PROJECT_ROOT" && $COMPOSE logs -f $WEAVIATE_SERVICES etl || true)
 }
 
 cmd_down() {
@@ -0,0 +1,357 @@
+# aliases.py
+# Blue-green collection versions. A load writes to physical collections such as Window_v202610171200
+# while the current version keeps serving; the search scripts resolve logical names (Window, Sentence, ...)
+# through a one-object registry collection, so flipping all tiers to a new version is a single write.
+# Weaviate 1.24 has no native aliases, hence the registry (AliasRegistry).
+#
+# examples:
+#   python etl/app/aliases.py status
+#   python etl/app/aliases.py check    --version v202610171200       # sanity only
+#   python etl/app/aliases.py flip     --version v202610171200       # sanity, then switch all tiers
+#   python etl/app/aliases.py rollback                               # back to the previous mapping
+#   python etl/app/aliases.py gc --keep 1                            # drop old, unreferenced versions
+#   python etl/app/aliases.py reset                                  # serve the unversioned names again
+#   python etl/app/aliases.py bump                                   # new index stamp (result_cache.py)
+import argparse
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from weaviate import WeaviateClient
+from weaviate.classes.config import Configure, DataType, Property, Tokenization
+from weaviate.classes.data import DataObject
+
+REGISTRY = "AliasRegistry"
+REGISTRY_KEY = "tiers"
+REGISTRY_UUID = uuid.uuid5(uuid.NAMESPACE_URL, f"{REGISTRY}:{REGISTRY_KEY}")
+TIERS = ["Window", "Sentence", "Subchunk", "Chunk"]
+_VERSION_RE = re.compile(r"^(?P<logical>[A-Z][A-Za-z0-9]*)_(?P<version>v\d+)$")
+ALIAS_TTL = float(os.getenv("ALIAS_TTL_SEC", "30"))
+# index stamp: a second registry object, rewritten after every load / flip; cached search results carry it.
+# Read at most every STAMP_TTL seconds (two REST calls otherwise on every search), so another process's
+# bump can go unnoticed, and its cached results stay servable, for up to that long; 0 = read every time
+STAMP_KEY = "index_stamp"
+STAMP_UUID = uuid.uuid5(uuid.NAMESPACE_URL, f"{REGISTRY}:{STAMP_KEY}")
+STAMP_TTL = float(os.getenv("INDEX_STAMP_TTL_SEC", "5"))
+
+_cache: Dict[str, object] = {"at": 0.0, "targets": None}
+_stamp: Dict[str, object] = {"at": 0.0, "stamp": None}
+
+
+def new_version() -> str:
+    """v<YYYYmmddHHMMSS><microseconds>: sorts by build time, and two builds in the same second differ."""
+    return "v" + datetime.now().strftime("%Y%m%d%H%M%S%f")
+
+
+def versioned(name: str, version: str = "") -> str:
+    """Physical collection name for a logical tier ("Window", "v2026..." → "Window_v2026...")."""
+    return f"{name}_{version}" if version else name
+
+
+def logical_name(name: str) -> str:
+    """Window_v202610171200 → Window; unversioned names are returned unchanged (ids/uuids use this)."""
+    m = _VERSION_RE.match(name)
+    return m.group("logical") if m else name
+
+
+# --------------------
+# Registry
+# --------------------
+def _registry_config() -> Dict[str, object]:
+    return dict(
+        name=REGISTRY,
+        description="Logical tier name → physical (versioned) collection, flipped atomically",
+        vectorizer_config=Configure.Vectorizer.none(),
+        vector_index_config=Configure.VectorIndex.flat(),
+        properties=[
+            Property(name="key", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+            Property(name="targets", data_type=DataType.TEXT, index_searchable=False),
+            Property(name="previous", data_type=DataType.TEXT, index_searchable=False),
+            Property(name="version", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+            Property(name="updated_at", data_type=DataType.TEXT, index_searchable=False),
+        ],
+    )
+
+
+def ensure_registry(client: WeaviateClient):
+    if client.collections.exists(REGISTRY):
+        return client.collections.get(REGISTRY)
+    return client.collections.create(**_registry_config())
+
+
+def read_registry(client: WeaviateClient) -> Optional[Dict[str, str]]:
+    if not client.collections.exists(REGISTRY):
+        return None
+    obj = client.collections.get(REGISTRY).query.fetch_object_by_id(REGISTRY_UUID)
+    return dict(obj.properties) if obj else None
+
+
+def read_aliases(client: WeaviateClient) -> Dict[str, str]:
+    reg = read_registry(client)
+    return json.loads(reg.get("targets") or "{}") if reg else {}
+
+
+def version_in_use(client: WeaviateClient, version: str, tiers: List[str] = TIERS) -> List[str]:
+    """Why `version` can't take a new build: its collections already exist or the registry points at them."""
+    reasons = [f"{versioned(t, version)} exists" for t in tiers if client.collections.exists(versioned(t, version))]
+    reg = read_registry(client) or {}
+    for field in ("targets", "previous"):
+        names = set(json.loads(reg.get(field) or "{}").values())
+        if names & {versioned(t, version) for t in tiers}:
+            reasons.append("serving" if field == "targets" else "the rollback target")
+    return reasons
+
+
+def resolve(client: WeaviateClient, name: str, ttl: float = ALIAS_TTL) -> str:
+    """
+    Physical collection currently serving `name`. Without a registry (plain setup) the name itself.
+    The mapping is cached for `ttl` seconds so long-running searchers pick up a flip on their own.
+    """
+    if _cache["targets"] is None or time.time() - float(_cache["at"]) > ttl:
+        try:
+            _cache["targets"] = read_aliases(client)
+        except Exception:  # registry unreachable: keep serving the last known mapping
+            _cache["targets"] = _cache["targets"] or {}
+        _cache["at"] = time.time()
+    return _cache["targets"].get(name, name)
+
+
+async def resolve_async(client, name: str) -> str:
+    """resolve() for WeaviateAsyncClient (no cache: async callers resolve once per run)."""
+    if not await client.collections.exists(REGISTRY):
+        return name
+    obj = await client.collections.get(REGISTRY).query.fetch_object_by_id(REGISTRY_UUID)
+    targets = json.loads((obj.properties or {}).get("targets") or "{}") if obj else {}
+    return targets.get(name, name)
+
+
+def write_aliases(client: WeaviateClient, targets: Dict[str, str], version: str):
+    """One object holds every tier, so readers see either the old or the new mapping, never a mix."""
+    coll = ensure_registry(client)
+    # no mapping yet (first flip, or after reset): the unversioned collections are serving, so they are
+    # the rollback target and gc must keep them
+    current = read_aliases(client) or {t: t for t in TIERS if client.collections.exists(t)}
+    props = {
+        "key": REGISTRY_KEY,
+        "targets": json.dumps(targets, sort_keys=True),
+        "previous": json.dumps(current, sort_keys=True),
+        "version": version,
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    res = coll.data.insert_many([DataObject(properties=props, uuid=REGISTRY_UUID)])  # batch import upserts
+    if res.errors:
+        raise RuntimeError(f"registry update failed: {list(res.errors.values())[0].message}")
+    _cache["targets"], _cache["at"] = dict(targets), time.time()
+    bump_index_stamp(client, f"aliases → {version or 'unversioned'}")
+
+
+# --------------------
+# Index stamp (result_cache.py)
+# --------------------
+def _stamp_object(note: str) -> DataObject:
+    props = {
+        "key": STAMP_KEY,
+        "version": f"{time.time_ns():x}",
+        "targets": note,
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    return DataObject(properties=props, uuid=STAMP_UUID)
+
+
+def bump_index_stamp(client: WeaviateClient, note: str = "") -> str:
+    """New stamp after a load / flip: search results cached under the old one are never served again."""
+    obj = _stamp_object(note)
+    res = ensure_registry(client).data.insert_many([obj])
+    if res.errors:
+        raise RuntimeError(f"index stamp update failed: {list(res.errors.values())[0].message}")
+    _stamp["stamp"], _stamp["at"] = obj.properties["version"], time.time()
+    return obj.properties["version"]
+
+
+async def bump_index_stamp_async(client, note: str = "") -> str:
+    """bump_index_stamp() for WeaviateAsyncClient."""
+    if not await client.collections.exists(REGISTRY):
+        await client.collections.create(**_registry_config())
+    obj = _stamp_object(note)
+    res = await client.collections.get(REGISTRY).data.insert_many([obj])
+    if res.errors:
+        raise RuntimeError(f"index stamp update failed: {list(res.errors.values())[0].message}")
+    return obj.properties["version"]
+
+
+def index_stamp(client: WeaviateClient, ttl: float = STAMP_TTL) -> Optional[str]:
+    """
+    Current index stamp ("" before the first bump); None when the registry can't be read, so callers
+    skip their result cache rather than risk a stale answer. Cached for `ttl` seconds (INDEX_STAMP_TTL_SEC,
+    default 5): after another process bumps the stamp, results of the old index may be served until then.
+    """
+    if _stamp["stamp"] is None or time.time() - float(_stamp["at"]) > ttl:
+        try:
+            obj = None
+            if client.collections.exists(REGISTRY):
+                obj = client.collections.get(REGISTRY).query.fetch_object_by_id(STAMP_UUID)
+            _stamp["stamp"] = ((obj.properties or {}).get("version") or "") if obj else ""
+        except Exception:
+            return None
+        _stamp["at"] = time.time()
+    return _stamp["stamp"]
+
+
+def physical_versions(client: WeaviateClient, tier: str) -> List[str]:
+    """Every physical collection of a tier (unversioned legacy name included), oldest first."""
+    names = [n for n in client.collections.list_all() if logical_name(n) == tier]
+    return sorted(names, key=lambda n: (n != tier, n))
+
+
+# --------------------
+# Sanity + flip
+# --------------------
+def count(client: WeaviateClient, name: str) -> int:
+    """Objects in `name`; summed over its queryable tenants on a multi-tenant collection."""
+    from tenants import active_tenants
+    coll = client.collections.get(name)
+    scopes = [coll.with_tenant(t) for t in active_tenants(coll)] or [coll]
+    return sum(c.aggregate.over_all(total_count=True).total_count or 0 for c in scopes)
+
+
+def sanity_check(client: WeaviateClient, version: str, tiers: List[str] = TIERS, query: str = "mettā",
+                 min_ratio: float = 0.9) -> bool:
+    """
+    New version passes when every tier exists and is non-empty, holds at least `min_ratio` of the
+    objects the serving version has, and a BM25 query on Window returns hits.
+    """
+    ok = True
+    for tier in tiers:
+        new = versioned(tier, version)
+        if not client.collections.exists(new):
+            print(f"[!] {new} does not exist")
+            ok = False
+            continue
+        n_new = count(client, new)
+        cur = resolve(client, tier, ttl=0)
+        n_cur = count(client, cur) if cur != new and client.collections.exists(cur) else 0
+        ratio_ok = n_new > 0 and (n_cur == 0 or n_new >= min_ratio * n_cur)
+        print(f"[{'✓' if ratio_ok else '!'}] {tier}: {new}={n_new} objects (serving {cur}={n_cur})")
+        ok = ok and ratio_ok
+    if ok and "Window" in tiers:
+        from tenants import active_tenants, with_tenant
+        coll = client.collections.get(versioned("Window", version))
+        hits, where = [], ""
+        for t in active_tenants(coll) or [""]:  # multi-tenant: any book answering is enough
+            hits, where = with_tenant(coll, t).query.bm25(query=query, limit=3).objects, t
+            if hits:
+                break
+        scope = f" (tenant {where})" if where else ""
+        print(f"[{'✓' if hits else '!'}] bm25 '{query}' on {versioned('Window', version)}{scope}: {len(hits)} hits")
+        ok = bool(hits)
+    return ok
+
+
+def flip(client: WeaviateClient, version: str, tiers: List[str] = TIERS, force: bool = False,
+         min_ratio: float = 0.9) -> bool:
+    if not force and not sanity_check(client, version, tiers, min_ratio=min_ratio):
+        print(f"[!] {version} failed the sanity check; still serving the previous version")
+        return False
+    targets = read_aliases(client)
+    targets.update({t: versioned(t, version) for t in tiers})
+    write_aliases(client, targets, version)
+    print(f"[✓] flipped {', '.join(tiers)} → {version}")
+    return True
+
+
+def rollback(client: WeaviateClient) -> bool:
+    reg = read_registry(client)
+    previous = json.loads(reg.get("previous") or "{}") if reg else {}
+    if not previous:
+        print("[!] no previous mapping to roll back to")
+        return False
+    gone = [name for name in previous.values() if not client.collections.exists(name)]
+    if gone:
+        print(f"[!] previous mapping points at deleted collections ({', '.join(gone)}); not rolling back")
+        return False
+    write_aliases(client, previous, "rollback")
+    print(f"[✓] rolled back → {previous}")
+    return True
+
+
+def reset(client: WeaviateClient) -> bool:
+    """After an in-place (non blue-green) load: point every tier back at its unversioned collection."""
+    if not read_aliases(client):
+        return False
+    write_aliases(client, {}, "")
+    print("[✓] aliases reset → unversioned collections")
+    return True
+
+
+def gc(client: WeaviateClient, keep: int = 1, tiers: List[str] = TIERS, dry_run: bool = False) -> List[str]:
+    """
+    Delete versions that are neither serving nor in the previous mapping (rollback target),
+    keeping the newest `keep` other versions per tier as well.
+    """
+    reg = read_registry(client)
+    if not reg:
+        print("[skip] no registry yet; nothing is versioned")
+        return []
+    protected = set(json.loads(reg.get("targets") or "{}").values()) | set(json.loads(reg.get("previous") or "{}").values())
+    dropped = []
+    for tier in tiers:
+        old = [n for n in physical_versions(client, tier) if n not in protected]
+        for name in old[: max(0, len(old) - keep)]:
+            if not dry_run:
+                client.collections.delete(name)
+            dropped.append(name)
+            print(f"[-] {'would drop' if dry_run else 'dropped'} {name}")
+    return dropped
+
+
+def main():
+    from weaviate_nodes import connect_any
+
+    ap = argparse.ArgumentParser(description="Blue-green collection versions: status / check / flip / rollback / gc.")
+    ap.add_argument("cmd", choices=["status", "check", "flip", "rollback", "reset", "gc", "bump"])
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_URL", "http://localhost:8081"))
+    ap.add_argument("--grpc-port", default=os.getenv("WEAVIATE_GRPC_PORT", "50052"))
+    ap.add_argument("--version", default="", help="Version suffix, e.g. v202610171200")
+    ap.add_argument("--collections", default=",".join(TIERS))
+    ap.add_argument("--min-ratio", type=float, default=0.9, help="new/serving object count needed to flip")
+    ap.add_argument("--force", action="store_true", help="flip without the sanity check")
+    ap.add_argument("--keep", type=int, default=0, help="gc: old versions to keep besides serving + previous")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+    tiers = [c for c in args.collections.split(",") if c]
+    if args.cmd in ("check", "flip") and not args.version:
+        ap.error(f"{args.cmd} needs --version")
+
+    client = connect_any(args.url, args.grpc_port)
+    try:
+        if args.cmd == "status":
+            reg = read_registry(client) or {}
+            targets = json.loads(reg.get("targets") or "{}")
+            print(f"[i] version={reg.get('version', '-')} updated_at={reg.get('updated_at', '-')} "
+                  f"index_stamp={index_stamp(client) or '-'}")
+            for tier in tiers:
+                serving = targets.get(tier, tier)
+                others = [n for n in physical_versions(client, tier) if n != serving]
+                print(f"    {tier:<9} → {serving}" + (f"   (also: {', '.join(others)})" if others else ""))
+        elif args.cmd == "check":
+            raise SystemExit(0 if sanity_check(client, args.version, tiers, min_ratio=args.min_ratio) else 1)
+        elif args.cmd == "flip":
+            raise SystemExit(0 if flip(client, args.version, tiers, args.force, args.min_ratio) else 1)
+        elif args.cmd == "rollback":
+            raise SystemExit(0 if rollback(client) else 1)
+        elif args.cmd == "reset":
+            reset(client)
+        elif args.cmd == "bump":
+            print(f"[✓] index stamp → {bump_index_stamp(client, 'aliases.py bump')}")
+        else:
+            gc(client, keep=args.keep, tiers=tiers, dry_run=args.dry_run)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# async_ingest_search.py
+# asyncio ingestion + multi-tier search on the v4 async client (WeaviateAsyncClient).
+# One process, no threads for network I/O: bounded semaphores cap in-flight requests, and CSV parsing /
+# vector loading run in asyncio.to_thread so the next batch is prepared while earlier ones are on the wire.
+#
+# examples:
+#   python etl/app/async_ingest_search.py insert --outdir data/outputs --concurrency 8 --batch-size 256
+#   python etl/app/async_ingest_search.py search --query "mettā" --mode hybrid --k 5
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from weaviate import WeaviateAsyncClient
+from weaviate.connect import ConnectionParams
+from weaviate.classes.data import DataObject
+
+from aliases import bump_index_stamp_async, resolve_async
+from ingest_report import IngestReport, send_batch_async
+from insert_vectors_generic import safe_cast
+from pali_fold import add_folded, folded_query, has_folded_async
+from embedding_cache import shared_cache
+from query_encoder import BATCH_MAX, BATCH_WINDOW_MS, MicroBatchEncoder
+from pipeline import VECTOR_FILES
+from stream_align import aligned_batches, iter_csv_batches
+from tenants import TenantRouter, tenant_map_from_profile, with_tenant
+from weaviate_nodes import parse_nodes
+from search_weaviate_labse_hybridfix import DEFAULT_MODEL, encode_query_labse, pick_return_props, short_text
+
+TIERS = ["Window", "Sentence", "Subchunk", "Chunk"]
+
+
+async def connect_async(url: str, grpc_port) -> WeaviateAsyncClient:
+    url, grpc_port = random.choice(parse_nodes(url, grpc_port))  # any cluster node can coordinate
+    client = WeaviateAsyncClient(ConnectionParams.from_url(url, grpc_port=grpc_port))
+    await client.connect()
+    return client
+
+
+# --------------------
+# Ingestion
+# --------------------
+def _build_objects(collection: str, id_col: str, batch):
+    """Records (+ float32 vector block) → (DataObjects, ids, records); runs in a worker thread next to the CSV parsing."""
+    if isinstance(batch, tuple):  # aligned_batches(): (ids, records, vectors)
+        sids, recs, block = batch
+    else:                         # iter_csv_batches(): records only
+        recs, block = batch, None
+        sids = [rec[id_col] for rec in recs]
+    objs = []
+    for i, rec in enumerate(recs):
+        props = add_folded({c: safe_cast(c, v) for c, v in rec.items()}, collection)
+        uid = uuid.uuid5(uuid.NAMESPACE_URL, f"{collection}:{sids[i]}")
+        objs.append(DataObject(properties=props, uuid=uid, vector=block[i] if block is not None else None))
+    return objs, list(sids), recs
+
+
+async def ingest_tier(client: WeaviateAsyncClient, collection: str, csv_path: Path, id_col: str,
+                      ids_path: Optional[Path], npy_path: Optional[Path], sem: asyncio.Semaphore,
+                      batch_size: int, stats, retries: int = 2, tenant: str = ""):
+    coll = client.collections.get(collection)
+    mt = bool((await coll.config.get()).multi_tenancy_config.enabled)
+    router = TenantRouter(mt, tenant, tenant_map_from_profile() if mt else None)
+
+    def on_skip(the_id, why):
+        print(f"    [!] {collection}: skip id={the_id} ({why})")
+        stats.record_skip()
+
+    if ids_path is not None and npy_path is not None:
+        # chunked CSV + mmap'ed vectors, aligned batch by batch (see stream_align.py); rows without
+        # a vector come as vectorless batches, since there is no separate CSV pass for this tier
+        batches = aligned_batches(str(csv_path), id_col, str(ids_path), str(npy_path),
+                                  batch_size=batch_size, on_skip=on_skip, orphans=True)
+    else:
+        batches = iter_csv_batches(str(csv_path), batch_size=batch_size)
+
+    stats.start()
+    inflight = set()
+    sent = 0
+
+    async def send(objs, sids, t):
+        nonlocal sent
+        try:
+            await send_batch_async(with_tenant(coll, t), objs, stats, retries=retries, source_ids=sids)
+            sent += len(objs)
+            print(f"[✓] {collection}: {sent} sent")
+        finally:
+            sem.release()
+
+    while True:
+        batch = await asyncio.to_thread(next, batches, None)
+        if batch is None:
+            break
+        objs, sids, recs = await asyncio.to_thread(_build_objects, collection, id_col, batch)
+        for t_objs, t_ids, t in router.split(objs, sids, recs):
+            if not t_objs:
+                continue
+            if t:
+                await router.ensure_async(coll, [t])
+            await sem.acquire()  # released by send(); bounds both requests and buffered batches
+            task = asyncio.create_task(send(t_objs, t_ids, t))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+
+    if inflight:
+        await asyncio.gather(*inflight)
+    stats.finish()
+    stats.print_summary()
+
+
+async def run_insert(args):
+    outdir = Path(args.outdir)
+    wanted = set(args.collections.split(","))
+    report = IngestReport({"url": args.url, "batch_size": args.batch_size,
+                           "concurrency": args.concurrency, "client": "async"})
+    client = await connect_async(args.url, args.grpc_port)
+    try:
+        sem = asyncio.Semaphore(args.concurrency)
+        jobs = []
+        for coll, csv_name, idcol, _txtcol, ids_name, npy_name in VECTOR_FILES:
+            if coll not in wanted:
+                continue
+            csvp, idsp, npyp = outdir / csv_name, outdir / ids_name, outdir / npy_name
+            if not csvp.exists():
+                print(f"[skip] {coll}: {csv_name} not found in {outdir}")
+                continue
+            with_vectors = idsp.exists() and npyp.exists() and not args.no_vectors
+            phase = "vectors" if with_vectors else "csv"
+            print(f"[i] {coll}: {csv_name} ({phase})")
+            jobs.append(ingest_tier(
+                client, coll, csvp, idcol,
+                idsp if with_vectors else None, npyp if with_vectors else None,
+                sem, args.batch_size, report.stats(coll, phase), retries=args.retries, tenant=args.tenant,
+            ))
+        t0 = time.perf_counter()
+        await asyncio.gather(*jobs)  # tiers share one semaphore, so they interleave on the wire
+        print(f"[DONE] async ingest finished in {time.perf_counter() - t0:.1f}s")
+        await bump_index_stamp_async(client, "async_ingest_search insert")  # cached search results are stale now
+    finally:
+        await client.close()
+    if args.report:
+        report.write(args.report, run=args.report_run)
+
+
+# --------------------
+# Search
+# --------------------
+async def search_one(client: WeaviateAsyncClient, collection: str, query: str, mode: str, k: int,
+                     alpha: float, qvec: Optional[np.ndarray], sem: asyncio.Semaphore, tenant: str = "",
+                     fold: bool = True):
+    coll = with_tenant(client.collections.get(await resolve_async(client, collection)), tenant)
+    props = pick_return_props(collection)
+    # BM25 on the diacritic-folded copy (raw text on collections loaded before folding)
+    kw_query, kw_props = folded_query(collection, query, fold and await has_folded_async(coll, collection))
+    async with sem:
+        if mode == "vector":
+            return await coll.query.near_vector(near_vector=qvec, limit=k, return_properties=props)
+        if mode == "hybrid":
+            return await coll.query.hybrid(query=kw_query, query_properties=kw_props, vector=qvec, alpha=alpha,
+                                           limit=k, return_properties=props)
+        return await coll.query.bm25(query=kw_query, query_properties=kw_props, limit=k, return_properties=props)
+
+
+async def search_tiers(client: WeaviateAsyncClient, query: str, collections: List[str], mode: str = "bm25",
+                       k: int = 5, alpha: float = 0.5, model: str = DEFAULT_MODEL,
+                       sem: Optional[asyncio.Semaphore] = None, tenant: str = "", fold: bool = True,
+                       encoder: Optional[MicroBatchEncoder] = None) -> Dict[str, Any]:
+    """Query every tier concurrently; returns {collection: QueryReturn | Exception}."""
+    sem = sem or asyncio.Semaphore(len(collections))
+    qvec = None
+    if mode in ("vector", "hybrid"):
+        # model.encode is CPU-bound; keep the event loop free for other queries. With an encoder,
+        # the queries of this run are encoded together in micro-batches (query_encoder.py)
+        if encoder is not None:
+            qvec = await asyncio.to_thread(encoder.encode, query)
+        else:
+            qvec = await asyncio.to_thread(encode_query_labse, query, model)
+    results = await asyncio.gather(
+        *(search_one(client, c, query, mode, k, alpha, qvec, sem, tenant, fold) for c in collections),
+        return_exceptions=True,
+    )
+    return dict(zip(collections, results))
+
+
+def print_tier(collection: str, res):
+    if isinstance(res, Exception):
+        print(f"[{collection}] failed: {res}")
+        return
+    props = pick_return_props(collection)
+    id_field, text_field = props[0], props[1]
+    print(f"[{collection}] {len(res.objects)} objects")
+    for i, o in enumerate(res.objects or [], start=1):
+        p = o.properties or {}
+        print(f"{i:>2}. [{collection.lower()}] {p.get(id_field, '')} | chunk={p.get('chunk_id', '')}")
+        print(f"    {short_text(p.get(text_field, ''))}")
+
+
+async def run_search(args):
+    client = await connect_async(args.url, args.grpc_port)
+    try:
+        sem = asyncio.Semaphore(args.concurrency)
+        collections = args.collections.split(",")
+        encoder = None
+        if args.mode != "bm25" and len(args.query) > 1:
+            encoder = MicroBatchEncoder(args.model, window_ms=args.batch_window_ms, max_batch=args.batch_max,
+                                        cache=shared_cache())
+        t0 = time.perf_counter()
+        per_query = await asyncio.gather(*(
+            search_tiers(client, q, collections, args.mode, args.k, args.alpha, args.model, sem, args.tenant,
+                         not args.no_fold, encoder)
+            for q in args.query
+        ))
+        elapsed = (time.perf_counter() - t0) * 1000
+        for q, tiers in zip(args.query, per_query):
+            print(f"\n=== {q} ===")
+            for c in collections:
+                print_tier(c, tiers[c])
+        print(f"\n[i] {len(args.query)} queries × {len(collections)} tiers in {elapsed:.0f} ms")
+        if encoder is not None:
+            print(f"[i] query encoder: {encoder.stats()}")
+    finally:
+        await client.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="asyncio ingestion and multi-tier search (WeaviateAsyncClient).")
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_URL", "http://localhost:8081"),
+                    help="REST URL, or comma-separated node URLs of a cluster")
+    ap.add_argument("--grpc-port", default=os.getenv("WEAVIATE_GRPC_PORT", "50052"), help="gRPC port, or one per node")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ins = sub.add_parser("insert", help="Insert CSV rows (+ vectors when ids/npy exist) for all tiers")
+    ins.add_argument("--outdir", default=os.getenv("OUTPUTS_DIR", "data/outputs"))
+    ins.add_argument("--collections", default=",".join(TIERS))
+    ins.add_argument("--batch-size", type=int, default=256)
+    ins.add_argument("--concurrency", type=int, default=8, help="insert_many requests in flight (all tiers)")
+    ins.add_argument("--retries", type=int, default=2)
+    ins.add_argument("--no-vectors", action="store_true", help="BM25-only: ignore ids/npy files")
+    ins.add_argument("--report", default="", help="Write an ingestion report (JSON) to this path")
+    ins.add_argument("--report-run", default="async")
+    ins.add_argument("--tenant", default="", help="Multi-tenant schema: load only this book (tenant)")
+
+    srch = sub.add_parser("search", help="Search several tiers (and queries) concurrently")
+    srch.add_argument("--query", action="append", required=True, help="Repeat for several queries")
+    srch.add_argument("--collections", default=",".join(TIERS))
+    srch.add_argument("--mode", choices=["bm25", "hybrid", "vector"], default="bm25")
+    srch.add_argument("--k", type=int, default=5)
+    srch.add_argument("--alpha", type=float, default=0.5, help="hybrid alpha (0..1) higher favors vector")
+    srch.add_argument("--model", default=DEFAULT_MODEL)
+    srch.add_argument("--concurrency", type=int, default=8, help="queries in flight")
+    srch.add_argument("--tenant", default=os.getenv("WEAVIATE_TENANT", ""), help="Book / tenant to search")
+    srch.add_argument("--no-fold", action="store_true", help="Search the original text instead of the diacritic-folded copy")
+    srch.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS,
+                      help="Encode concurrent queries together, waiting up to this long for a batch")
+    srch.add_argument("--batch-max", type=int, default=BATCH_MAX, help="Max queries per encode call")
+    args = ap.parse_args()
+
+    asyncio.run(run_insert(args) if args.cmd == "insert" else run_search(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# bench_ingest.py
+# Ingestion benchmark: for every (batch size × concurrency) combination, reset the 4 collections,
+# load data/outputs (CSV phase and/or vector phase) and record objects/sec, batch latency
+# percentiles, retries and failed objects per collection into one JSON report.
+#
+# example:
+#   docker compose run --rm etl python etl/app/bench_ingest.py \
+#       --batch-sizes 64,256,1024 --concurrency 1,2,4 --report data/outputs/ingest_bench.json
+import argparse
+import os
+from pathlib import Path
+
+from ingest_report import IngestReport
+from insert_vectors_generic import insert_vectors
+from pipeline import OUTPUTS_DIR, VECTOR_FILES
+from weaviate_multitier_setup_and_search_patched import connect, create_collections, ingest_all
+
+COLLECTIONS = ["Window", "Sentence", "Subchunk", "Chunk"]
+
+
+def int_list(s: str):
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def reset_collections(client, names, profile=None):
+    existing = set(client.collections.list_all())
+    for name in names:
+        if name in existing:
+            client.collections.delete(name)
+    create_collections(client, use_vectorizer=False, profile=profile)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark CSV/vector ingestion against data/outputs.")
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_URL", "http://localhost:8081"))
+    ap.add_argument("--grpc-port", type=int, default=int(os.getenv("WEAVIATE_GRPC_PORT", "50052")))
+    ap.add_argument("--outdir", default=str(OUTPUTS_DIR), help="Directory with CSV/ids/npy artifacts")
+    ap.add_argument("--batch-sizes", default="64,256,1024")
+    ap.add_argument("--concurrency", default="1,2,4")
+    ap.add_argument("--phase", choices=["csv", "vectors", "both"], default="vectors",
+                    help="csv = BM25-only rows, vectors = rows + LaBSE vectors")
+    ap.add_argument("--schema-profile", default=None, help="Schema profile to create collections with")
+    ap.add_argument("--label", default="", help="Free-form tag stored in settings (e.g. Weaviate config under test)")
+    ap.add_argument("--report", default="ingest_bench.json")
+    ap.add_argument("--yes", action="store_true", help="Do not ask before deleting collections")
+    args = ap.parse_args()
+
+    if not args.yes:
+        ans = input(f"⚠️  This deletes {', '.join(COLLECTIONS)} on {args.url} for every run. Continue? [y/N] ")
+        if ans.strip().lower() != "y":
+            return
+
+    outdir = Path(args.outdir)
+    client = connect(args.url, args.grpc_port)
+    try:
+        for bs in int_list(args.batch_sizes):
+            for conc in int_list(args.concurrency):
+                run = f"bs{bs}_c{conc}_{args.phase}"
+                print(f"\n=== {run} ===")
+                reset_collections(client, COLLECTIONS, profile=args.schema_profile)
+                report = IngestReport({
+                    "url": args.url, "batch_size": bs, "concurrency": conc,
+                    "phase": args.phase, "label": args.label, "outdir": str(outdir),
+                    "schema_profile": args.schema_profile or "default",
+                })
+
+                if args.phase in ("csv", "both"):
+                    ingest_all(client, str(outdir), batch_size=bs, concurrency=conc, report=report)
+
+                if args.phase in ("vectors", "both"):
+                    for coll, csv_name, idcol, _txtcol, ids_name, npy_name in VECTOR_FILES:
+                        csvp, idsp, npyp = outdir / csv_name, outdir / ids_name, outdir / npy_name
+                        if not (csvp.exists() and idsp.exists() and npyp.exists()):
+                            print(f"[skip] {coll}: missing {csv_name} or {ids_name} or {npy_name}")
+                            continue
+                        insert_vectors(client, coll, str(csvp), idcol, str(idsp), str(npyp),
+                                       batch_size=bs, concurrency=conc,
+                                       stats=report.stats(coll, "vectors"))
+
+                report.write(args.report, run=run)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# embedding_cache.py
+# Query-embedding cache: popular queries ("mettā", "jhāna", "satipaṭṭhāna") skip the model entirely.
+# Two tiers keyed by model + normalized query text (NFC, whitespace collapsed):
+#   - a bounded in-memory LRU per process (QUERY_CACHE_SIZE entries)
+#   - an optional SQLite file (QUERY_CACHE_PATH) shared by CLI runs and search service workers
+# Hit / miss counters per tier are kept for /metrics and `stats`.
+#
+# examples:
+#   QUERY_CACHE_PATH=data/cache/query_embeddings.sqlite python etl/app/search_and_save.py --collection Window --mode hybrid --query "mettā"
+#   python etl/app/embedding_cache.py stats --path data/cache/query_embeddings.sqlite
+#   python etl/app/embedding_cache.py clear --path data/cache/query_embeddings.sqlite
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")
+
+
+def normalize_query(text: str) -> str:
+    """Cache key text: NFC + collapsed whitespace. Case and diacritics stay (they change the embedding)."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class EmbeddingCache:
+    def __init__(self, capacity: int = CACHE_SIZE, path: Optional[str] = CACHE_PATH):
+        self.capacity = max(0, capacity)
+        self.path = path or ""
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")  # readers in other processes don't block the writer
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, query TEXT NOT NULL,"
+                " dim INTEGER NOT NULL, vec BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return f"{model}\x1f{normalize_query(text)}"
+
+    def _remember(self, key: str, vec: np.ndarray):
+        if not self.capacity:
+            return
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = self.key(model, text)
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.counts["memory_hits"] += 1
+                return vec
+            if self._db is not None:
+                row = self._db.execute("SELECT dim, vec FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vec = np.frombuffer(row[1], dtype=np.float32, count=row[0])
+                    self._remember(key, vec)
+                    self.counts["disk_hits"] += 1
+                    return vec
+            self.counts["misses"] += 1
+            return None
+
+    def put(self, model: str, text: str, vec: np.ndarray):
+        key = self.key(model, text)
+        vec = np.ascontiguousarray(vec, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vec)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, model, query, dim, vec, created) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, normalize_query(text), int(vec.shape[0]), vec.tobytes(), time.time()),
+                )
+                self._db.commit()
+
+    def get_or_encode(self, model: str, text: str, encode: Callable[[str], np.ndarray]) -> np.ndarray:
+        vec = self.get(model, text)
+        if vec is None:
+            vec = encode(text)
+            self.put(model, text, vec)
+        return vec
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            size = len(self._lru)
+            disk = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0] if self._db else None
+        lookups = sum(counts.values())
+        return {
+            **counts,
+            "hit_rate": round((counts["memory_hits"] + counts["disk_hits"]) / lookups, 3) if lookups else 0.0,
+            "memory_entries": size,
+            "memory_capacity": self.capacity,
+            "disk_path": self.path or None,
+            "disk_entries": disk,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_shared: Optional[EmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> EmbeddingCache:
+    """Process-wide cache configured from QUERY_CACHE_SIZE / QUERY_CACHE_PATH."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = EmbeddingCache()
+        return _shared
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect / clear the on-disk query-embedding cache.")
+    ap.add_argument("cmd", choices=["stats", "clear"])
+    ap.add_argument("--path", default=CACHE_PATH or "data/cache/query_embeddings.sqlite")
+    args = ap.parse_args()
+    if not Path(args.path).exists():
+        print(f"[skip] no cache at {args.path}")
+        return
+    cache = EmbeddingCache(capacity=0, path=args.path)
+    try:
+        if args.cmd == "stats":
+            rows = cache._db.execute("SELECT model, COUNT(*) FROM query_embeddings GROUP BY model").fetchall()
+            print(f"[i] {args.path}: {sum(n for _, n in rows)} cached query embeddings")
+            for model, n in rows:
+                print(f"    {n:>7}  {model}")
+        else:
+            cache.clear()
+            print(f"[-] cleared {args.path}")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
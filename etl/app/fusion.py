@@ -0,0 +1,89 @@
+# fusion.py
+# Merge per-tier result lists (Window / Sentence / Subchunk / Chunk) into one ranking.
+# BM25 / hybrid scores of different collections are not comparable, so the tiers are combined by
+# reciprocal-rank fusion (1 / (rrf_k + rank)) or by min-max normalized scores. Hits that cover the
+# same tokens (a Window and the Sentence inside it, a Chunk and its Subchunk, ...) are reported once: the
+# finest of them is kept and the others add their contribution to it, so a passage found by several
+# tiers outranks one that only a single tier returned.
+#
+# example:
+#   python etl/app/weaviate_multitier_setup_and_search_patched.py --search "mettā" --fusion rrf
+from typing import Dict, List, Optional
+
+FUSION_METHODS = ("rrf", "score")
+RRF_K = 60
+
+
+def _normalized(scores: List[Optional[float]]) -> List[float]:
+    vals = [s for s in scores if s is not None]
+    if not vals:
+        return [0.0] * len(scores)
+    lo, hi = min(vals), max(vals)
+    if hi == lo:
+        return [1.0 if s is not None else 0.0 for s in scores]
+    return [(s - lo) / (hi - lo) if s is not None else 0.0 for s in scores]
+
+
+def spans_overlap(a: Dict, b: Dict) -> bool:
+    """Same chunk and intersecting [token_start, token_end]; hits without a span never overlap."""
+    if not a.get("chunk_id") or a.get("chunk_id") != b.get("chunk_id"):
+        return False
+    try:
+        return int(a["token_start"]) <= int(b["token_end"]) and int(b["token_start"]) <= int(a["token_end"])
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def dedupe_overlaps(hits: List[Dict]) -> List[Dict]:
+    """
+    Merge hits that cover some of the same tokens into the finest one (shortest span, best "fused" on
+    ties): each merged hit adds its "fused" to every kept hit it overlaps and its kind to their "tiers".
+    Hits without a span (or chunk_id) are kept as they are. Kept hits come back finest first; fuse() ranks them.
+    """
+    kept: List[Dict] = []
+    by_chunk: Dict[str, List[Dict]] = {}
+    for h in sorted(hits, key=lambda h: (_span_len(h), -h["fused"])):
+        same = by_chunk.setdefault(h.get("chunk_id") or "", [])
+        covered = [k for k in same if spans_overlap(h, k)]
+        for k in covered:  # corroboration: another tier found (part of) the same passage
+            k["fused"] += h["fused"]
+            k["tiers"].append(h.get("kind", ""))
+        if covered:
+            continue
+        h = {**h, "tiers": [h.get("kind", "")]}
+        same.append(h)
+        kept.append(h)
+    return kept
+
+
+def fuse(ranked: Dict[str, List[Dict]], method: str = "rrf", limit: int = 10, rrf_k: int = RRF_K,
+         dedupe: bool = True) -> List[Dict]:
+    """
+    ranked: {tier: [hit, ...] best first}, each hit a dict with "score" (may be None), "chunk_id",
+    "token_start", "token_end". Returns the top `limit` hits with a "fused" score added; with dedupe
+    overlapping hits are merged first (dedupe_overlaps) and "tiers" lists the tiers that found each.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"unknown fusion {method!r} (expected {' | '.join(FUSION_METHODS)})")
+    pooled: List[Dict] = []
+    for hits in ranked.values():
+        if method == "rrf":
+            fused = [1.0 / (rrf_k + rank) for rank in range(1, len(hits) + 1)]
+        else:
+            fused = _normalized([h.get("score") for h in hits])
+        for h, f in zip(hits, fused):
+            pooled.append({**h, "fused": f})
+    if dedupe:
+        pooled = dedupe_overlaps(pooled)
+    for h in pooled:
+        h["fused"] = round(h["fused"], 6)
+    # ties (same rank in two tiers) go to the finer tier: fewer tokens first
+    pooled.sort(key=lambda h: (-h["fused"], _span_len(h)))
+    return pooled[:limit]
+
+
+def _span_len(h: Dict) -> int:
+    try:
+        return int(h["token_end"]) - int(h["token_start"])
+    except (KeyError, TypeError, ValueError):
+        return 1 << 30
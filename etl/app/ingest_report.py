@@ -0,0 +1,250 @@
+# ingest_report.py
+# Per-collection ingestion stats (objects/sec, batch latency percentiles, retries, failed objects)
+# shared by the inserters and bench_ingest.py. Results are written/merged as JSON.
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+MAX_ERROR_LEN = 500
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (q in 0..100); None for an empty list."""
+    if not values:
+        return None
+    s = sorted(values)
+    pos = (len(s) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (pos - lo)
+
+
+class CollectionStats:
+    """Counters for one collection + phase (e.g. Window/csv, Window/vectors)."""
+
+    def __init__(self, collection: str, phase: str = "insert"):
+        self.collection = collection
+        self.phase = phase
+        self.objects_ok = 0
+        self.objects_failed = 0
+        self.retries = 0
+        self.batch_latencies: List[float] = []
+        self.failures: List[Dict[str, Any]] = []
+        self.skipped = 0
+        self._t0: Optional[float] = None
+        self._t1: Optional[float] = None
+        self._lock = threading.Lock()  # send_batches() may record from worker threads
+
+    def start(self):
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+
+    def finish(self):
+        self._t1 = time.perf_counter()
+
+    def record_batch(self, n_ok: int, seconds: float):
+        with self._lock:
+            self.objects_ok += n_ok
+            self.batch_latencies.append(seconds)
+
+    def record_retry(self, n: int = 1):
+        with self._lock:
+            self.retries += n
+
+    def record_skip(self, n: int = 1):
+        with self._lock:
+            self.skipped += n
+
+    def record_failure(self, uid: Any, error: Any, source_id: Optional[str] = None):
+        with self._lock:
+            self.objects_failed += 1
+            self.failures.append({
+                "uuid": str(uid) if uid is not None else None,
+                "source_id": source_id,
+                "error": str(error)[:MAX_ERROR_LEN],
+            })
+
+    @property
+    def elapsed(self) -> float:
+        if self._t0 is None:
+            return 0.0
+        return (self._t1 or time.perf_counter()) - self._t0
+
+    def summary(self) -> Dict[str, Any]:
+        lat_ms = [x * 1000.0 for x in self.batch_latencies]
+        elapsed = self.elapsed
+
+        def r(x):
+            return round(x, 3) if x is not None else None
+
+        return {
+            "collection": self.collection,
+            "phase": self.phase,
+            "objects_ok": self.objects_ok,
+            "objects_failed": self.objects_failed,
+            "skipped": self.skipped,
+            "retries": self.retries,
+            "batches": len(lat_ms),
+            "elapsed_sec": r(elapsed),
+            "objects_per_sec": r(self.objects_ok / elapsed) if elapsed > 0 else None,
+            "batch_latency_ms": {
+                "p50": r(percentile(lat_ms, 50)),
+                "p90": r(percentile(lat_ms, 90)),
+                "p95": r(percentile(lat_ms, 95)),
+                "p99": r(percentile(lat_ms, 99)),
+                "max": r(max(lat_ms)) if lat_ms else None,
+                "mean": r(sum(lat_ms) / len(lat_ms)) if lat_ms else None,
+            },
+            "failures": self.failures,
+        }
+
+    def print_summary(self):
+        s = self.summary()
+        lat = s["batch_latency_ms"]
+        print(f"[report] {self.collection}/{self.phase}: ok={s['objects_ok']} failed={s['objects_failed']} "
+              f"skipped={s['skipped']} retries={s['retries']} ops={s['objects_per_sec']} "
+              f"p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms")
+
+
+class IngestReport:
+    """A set of CollectionStats plus the run settings (batch size, concurrency, Weaviate URL...)."""
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = dict(settings or {})
+        self.collections: Dict[str, CollectionStats] = {}
+
+    def stats(self, collection: str, phase: str = "insert") -> CollectionStats:
+        key = f"{collection}/{phase}"
+        if key not in self.collections:
+            self.collections[key] = CollectionStats(collection, phase)
+        return self.collections[key]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "settings": self.settings,
+            "collections": {k: v.summary() for k, v in self.collections.items()},
+        }
+
+    def write(self, path: str, run: Optional[str] = None):
+        """
+        Merge this report into `path`. Each inserter runs as its own process in pipeline.py,
+        so reports accumulate per run name (default: "default") and per collection/phase.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        doc: Dict[str, Any] = {"runs": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    doc = json.load(f)
+            except (OSError, ValueError):
+                doc = {"runs": {}}
+        mine = self.to_dict()
+        run_doc = doc.setdefault("runs", {}).setdefault(run or "default", {"settings": {}, "collections": {}})
+        run_doc["settings"].update(mine["settings"])
+        run_doc["collections"].update(mine["collections"])
+        run_doc["updated_at"] = mine["created_at"]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, indent=2)
+        print(f"[report] written → {path}")
+
+
+def send_batch(coll, objects: List[Any], stats: CollectionStats, retries: int = 2,
+               backoff: float = 0.5, source_ids: Optional[List[str]] = None):
+    """
+    insert_many() one batch of DataObjects, re-sending only the failed objects up to `retries` times.
+    Every attempt is timed as one batch; objects still failing after the last attempt are recorded
+    with their error. Batch import overwrites existing uuids, so this also serves "replace" mode.
+    """
+    pending = list(range(len(objects)))
+    attempt = 0
+    while pending:
+        batch = [objects[i] for i in pending]
+        t0 = time.perf_counter()
+        try:
+            res = coll.data.insert_many(batch)
+            errors = {pending[j]: e.message for j, e in res.errors.items()}
+        except Exception as e:  # whole request failed (timeout, connection, ...)
+            errors = {i: str(e) for i in pending}
+        stats.record_batch(len(pending) - len(errors), time.perf_counter() - t0)
+
+        if not errors:
+            return
+        attempt += 1
+        if attempt > retries:
+            for i, msg in errors.items():
+                sid = source_ids[i] if source_ids else None
+                stats.record_failure(getattr(objects[i], "uuid", None), msg, sid)
+            return
+        pending = sorted(errors)
+        stats.record_retry(len(pending))
+        time.sleep(backoff * attempt)
+
+
+async def send_batch_async(coll, objects: List[Any], stats: CollectionStats, retries: int = 2,
+                           backoff: float = 0.5, source_ids: Optional[List[str]] = None):
+    """send_batch() for a CollectionAsync (WeaviateAsyncClient); same retry/failure accounting."""
+    pending = list(range(len(objects)))
+    attempt = 0
+    while pending:
+        batch = [objects[i] for i in pending]
+        t0 = time.perf_counter()
+        try:
+            res = await coll.data.insert_many(batch)
+            errors = {pending[j]: e.message for j, e in res.errors.items()}
+        except Exception as e:
+            errors = {i: str(e) for i in pending}
+        stats.record_batch(len(pending) - len(errors), time.perf_counter() - t0)
+
+        if not errors:
+            return
+        attempt += 1
+        if attempt > retries:
+            for i, msg in errors.items():
+                sid = source_ids[i] if source_ids else None
+                stats.record_failure(getattr(objects[i], "uuid", None), msg, sid)
+            return
+        pending = sorted(errors)
+        stats.record_retry(len(pending))
+        await asyncio.sleep(backoff * attempt)
+
+
+def send_batches(coll, batches: Iterable[tuple], stats: CollectionStats, concurrency: int = 1,
+                 retries: int = 2, on_batch=None):
+    """
+    Send (objects, source_ids) batches with up to `concurrency` insert_many requests in flight.
+    A batch may carry a third item, the tenant it goes to on a multi-tenant collection (tenants.py).
+    `on_batch(n_objects)` is called after each batch for progress printing.
+    """
+    def target(item):
+        return coll.with_tenant(item[2]) if len(item) > 2 and item[2] else coll
+
+    stats.start()
+    if concurrency <= 1:
+        for item in batches:
+            objects, sids = item[0], item[1]
+            send_batch(target(item), objects, stats, retries=retries, source_ids=sids)
+            if on_batch:
+                on_batch(len(objects))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            inflight = []
+            for item in batches:
+                objects, sids = item[0], item[1]
+                inflight.append((len(objects), pool.submit(send_batch, target(item), objects, stats, retries, 0.5, sids)))
+                # keep at most 2×concurrency batches buffered so memory stays bounded
+                while len(inflight) >= 2 * concurrency:
+                    n, fut = inflight.pop(0)
+                    fut.result()
+                    if on_batch:
+                        on_batch(n)
+            for n, fut in inflight:
+                fut.result()
+                if on_batch:
+                    on_batch(n)
+    stats.finish()
@@ -2,9 +2,16 @@
 # Insert rows from CSV into any collection (Window/Sentence/Subchunk/Chunk) with a given vector per row.
 import argparse, uuid
 from typing import Dict, Any, List
-import numpy as np, pandas as pd
+import pandas as pd
 from weaviate import WeaviateClient
 from weaviate.connect import ConnectionParams
+from weaviate.classes.data import DataObject
+
+from ingest_report import CollectionStats, IngestReport, send_batches
+from aliases import bump_index_stamp, logical_name
+from pali_fold import add_folded
+from stream_align import DEFAULT_MAX_PENDING, aligned_batches
+from tenants import TenantRouter
 
 INT_FIELDS = {"size", "order_idx", "level", "token_start", "token_end"}
 
@@ -13,9 +20,9 @@ def connect(url: str, grpc_port: int) -> WeaviateClient:
     client = WeaviateClient(cp); client.connect(); return client
 
 def safe_cast(col: str, val: Any) -> Any:
-    if pd.isna(val): return None
+    if pd.isna(val) or val == "": return None
     if col in INT_FIELDS:
-        try: return int(val)
+        try: return int(float(val))  # CSV cells arrive as strings ("12", "12.0")
         except: return None
     return str(val)
 
@@ -23,6 +30,55 @@ def load_ids(path: str) -> List[str]:
     with open(path, "r", encoding="utf-8") as f:
         return [line.strip() for line in f if line.strip()]
 
+def insert_vectors(client: WeaviateClient, collection: str, csv_path: str, id_col: str,
+                   ids_path: str, npy_path: str, batch_size: int = 256, concurrency: int = 1,
+                   stats=None, max_pending: int = DEFAULT_MAX_PENDING, tenant: str = "",
+                   insert_orphans: bool = False):
+    """
+    Insert CSV rows + aligned vectors into `collection` with insert_many batches; returns the stats.
+    CSV is read in chunks and vectors are memory-mapped, so memory is bounded by batch size.
+    insert_orphans=True also inserts CSV rows without a vector (empty text), vectorless, so this pass
+    alone loads the whole tier (bulk mode skips the CSV pass for tiers with vectors).
+    On a multi-tenant collection rows go to their book's tenant; `tenant` loads only that one.
+    A versioned `collection` (Window_v2026..., blue-green) keeps the logical tier's object uuids.
+    """
+    stats = stats if stats is not None else CollectionStats(collection, "vectors")
+    col = client.collections.get(collection)
+    tier = logical_name(collection)
+    router = TenantRouter.for_collection(col, only=tenant)
+
+    def on_skip(the_id, why):
+        print(f"    [!] Skip id={the_id} ({why})")
+        stats.record_skip()
+
+    def batches():
+        for batch_ids, recs, block in aligned_batches(csv_path, id_col, ids_path, npy_path,
+                                                      batch_size=batch_size, max_pending=max_pending,
+                                                      on_skip=on_skip, orphans=insert_orphans):
+            objs = []
+            vecs = block if block is not None else [None] * len(recs)  # orphan batch: rows without text
+            for the_id, rec, vec in zip(batch_ids, recs, vecs):
+                props: Dict[str, Any] = add_folded({c: safe_cast(c, v) for c, v in rec.items()}, tier)
+                uid = uuid.uuid5(uuid.NAMESPACE_URL, f"{tier}:{the_id}")
+                # vec is a float32 row view of the batch block; the client packs it directly
+                objs.append(DataObject(properties=props, uuid=uid, vector=vec))
+            for t_objs, t_ids, t in router.split(objs, batch_ids, recs):
+                if t:
+                    router.ensure(col, [t])
+                yield t_objs, t_ids, t
+
+    done = 0
+    def progress(n):
+        nonlocal done
+        done += n
+        print(f"[✓] {done} done")
+
+    send_batches(col, batches(), stats, concurrency=concurrency, on_batch=progress)
+    for f in stats.failures[:20]:
+        print(f"    [-] Insert failed id={f['source_id']} uuid={f['uuid']}: {f['error']}")
+    stats.print_summary()
+    return stats
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--url", required=True)
@@ -34,38 +90,27 @@ def main():
     ap.add_argument("--ids", required=True)          # *.txt (one id per line)
     ap.add_argument("--npy", required=True)          # *.npy (vectors aligned to --ids)
     ap.add_argument("--batch-size", type=int, default=256)
+    ap.add_argument("--concurrency", type=int, default=1)   # insert_many requests in flight
+    ap.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING)  # out-of-order rows/ids held while aligning
+    ap.add_argument("--report", default="")                 # ingestion report JSON (merged per run)
+    ap.add_argument("--report-run", default="default")
+    ap.add_argument("--tenant", default="")                 # load only this book/tenant (multi-tenant schema)
+    ap.add_argument("--insert-orphans", action="store_true")  # also insert CSV rows without a vector (bulk mode)
     args = ap.parse_args()
 
-    df = pd.read_csv(args.csv, encoding="utf-8-sig")
-    ids = load_ids(args.ids)
-    vecs = np.load(args.npy)
-    if len(ids) != len(vecs):
-        raise ValueError(f"ids ({len(ids)}) and vectors ({len(vecs)}) length mismatch")
-
-    id_to_row = {str(row[args.id_col]): i for i, row in df.iterrows()}
-
     client = connect(args.url, args.grpc_port)
     try:
-        col = client.collections.get(args.collection)
-        total, start = len(ids), 0
-        while start < total:
-            end = min(start + args.batch_size, total)
-            print(f"[i] Batch {start}-{end-1}")
-            for i in range(start, end):
-                the_id, vec = ids[i], vecs[i]
-                if the_id not in id_to_row:
-                    print(f"    [!] Skip id={the_id} (not found in CSV)"); continue
-                row = df.iloc[id_to_row[the_id]]
-                props: Dict[str, Any] = {c: safe_cast(c, row[c]) for c in df.columns}
-                uid = uuid.uuid5(uuid.NAMESPACE_URL, f"{args.collection}:{the_id}")
-                try:
-                    col.data.insert(properties=props, uuid=str(uid), vector=vec.astype(np.float32))
-                except Exception as e:
-                    print(f"    [-] Insert failed id={the_id} uuid={uid}: {e}")
-            print(f"[✓] {end} / {total} done")
-            start = end
-        print(f"[DONE] Inserted {total} objects into '{args.collection}'.")
+        stats = insert_vectors(client, args.collection, args.csv, args.id_col, args.ids, args.npy,
+                               batch_size=args.batch_size, concurrency=args.concurrency,
+                               max_pending=args.max_pending, tenant=args.tenant,
+                               insert_orphans=args.insert_orphans)
+        print(f"[DONE] Inserted {stats.objects_ok} objects into '{args.collection}' ({stats.objects_failed} failed).")
+        bump_index_stamp(client, f"insert_vectors_generic {args.collection}")  # cached search results are stale now
         print("Tip: If you inserted the same IDs earlier without vectors, delete the collection and re-insert.")
+        if args.report:
+            report = IngestReport({"url": args.url, "batch_size": args.batch_size, "concurrency": args.concurrency})
+            report.collections[f"{args.collection}/vectors"] = stats
+            report.write(args.report, run=args.report_run)
     finally:
         client.close()
 
@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 import argparse
-import numpy as np
-import pandas as pd
+import uuid
 from weaviate import WeaviateClient
 from weaviate.connect import ConnectionParams
+from weaviate.classes.data import DataObject
+
+from aliases import bump_index_stamp, versioned
+from ingest_report import CollectionStats, IngestReport, send_batches
+from pali_fold import add_folded
+from stream_align import DEFAULT_MAX_PENDING, aligned_batches
+from tenants import TenantRouter
 
 INT_FIELDS = {"size", "order_idx", "token_start", "token_end", "level"}
 
@@ -27,6 +33,14 @@ def main():
     ap.add_argument("--win-npy", required=True, help="windows_labse.npy")
     ap.add_argument("--batch", type=int, default=256)
     ap.add_argument("--upsert_mode", choices=["insert", "replace"], default="replace")
+    ap.add_argument("--concurrency", type=int, default=1, help="insert_many requests in flight")
+    ap.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                    help="out-of-order rows/ids held while aligning CSV with ids")
+    ap.add_argument("--retries", type=int, default=2, help="re-send failed objects this many times")
+    ap.add_argument("--report", default="", help="Write an ingestion report (JSON) to this path")
+    ap.add_argument("--report-run", default="default")
+    ap.add_argument("--tenant", default="", help="Load only this book/tenant (multi-tenant schema)")
+    ap.add_argument("--version", default="", help="Blue-green: upsert into Window_<version> (aliases.py)")
     args = ap.parse_args()
 
     # Connect
@@ -34,93 +48,69 @@ def main():
     client.connect()
 
     try:
-        coll = client.collections.get("Window")
-
-        # Load
-        df = pd.read_csv(args.win_csv, encoding="utf-8")
-        # force strings for all columns so we control casting ourselves
-        for c in df.columns:
-            if c not in INT_FIELDS:
-                df[c] = df[c].astype(str)
-
-        with open(args.win_ids, "r", encoding="utf-8") as f:
-            ids = [line.strip() for line in f if line.strip()]
-
-        vecs = np.load(args.win_npy)
-        if len(ids) != len(vecs):
-            raise ValueError(f"IDs ({len(ids)}) and vectors ({len(vecs)}) length mismatch")
-
-        # Reindex df by ids order; drop missing ids while keeping vectors aligned
-        df = df.set_index("window_id")
-        # reindex will create NaN rows for missing ids -> make a mask to keep only those present in df
-        mask = [i in df.index for i in ids]
-        if not any(mask):
-            raise ValueError("None of the IDs from windows_ids.txt exist in the CSV (window_id column).")
-        ids_kept = [i for i, keep in zip(ids, mask) if keep]
-        vecs_kept = vecs[mask]
-        df = df.loc[ids_kept].reset_index()
+        coll = client.collections.get(versioned("Window", args.version))
+        router = TenantRouter.for_collection(coll, only=args.tenant)
 
-        total = len(ids_kept)
-        print(f"[i] Ready to upsert {total} windows (after aligning CSV with ids).")
+        # Stream CSV chunks + mmap'ed vectors, aligned with windows_ids.txt batch by batch
+        # (peak memory is bounded by --batch, not by the number of windows).
+        print(f"[i] Streaming {args.win_csv} with {args.win_npy} (batch={args.batch}).")
 
         # Upsert loop
-        def make_props(row: pd.Series):
+        def make_props(row: dict):
             props = {}
             for k, v in row.items():
                 if k in INT_FIELDS:
                     props[k] = safe_int(v)
                 else:
                     props[k] = None if str(v).strip().lower() in ("nan", "") else v
-            return props
-
-        # Batch insert/replace
-        start = 0
-        while start < total:
-            end = min(start + args.batch, total)
-            batch_ids = ids_kept[start:end]
-            batch_vecs = vecs_kept[start:end]
-            batch_rows = df.iloc[start:end]
-
-            objects = []
-            for i, (_, row) in enumerate(batch_rows.iterrows()):
-                props = make_props(row)
-                obj = {
-                    "uuid": batch_ids[i],
-                    "properties": props,
-                    "vector": batch_vecs[i].astype(float).tolist(),
-                }
-                objects.append(obj)
-
-            # Use the new Collections Batch API
-            try:
-                if args.upsert_mode == "replace":
-                    # replace is idempotent; overwrites if exists, creates if not
-                    coll.data.replace_many(objects)
-                else:
-                    coll.data.insert_many(objects)
-                print(f"[✓] Window: {end} / {total}")
-            except Exception as e:
-                print(f"[!] Batch {start}-{end} failed: {e}")
-                # Optional: fall back to per-row to surface the bad item
-                for i, obj in enumerate(objects):
-                    try:
-                        if args.upsert_mode == "replace":
-                            coll.data.replace(
-                                uuid=obj["uuid"],
-                                properties=obj["properties"],
-                                vector=obj["vector"]
-                            )
-                        else:
-                            coll.data.insert(
-                                uuid=obj["uuid"],
-                                properties=obj["properties"],
-                                vector=obj["vector"]
-                            )
-                    except Exception as ee:
-                        print(f"    [-] Failed uuid={obj['uuid']}: {ee}")
-            start = end
+            return add_folded(props, "Window")
+
+        # Batch insert/replace.
+        # Batch import overwrites objects with the same uuid, so insert_many covers both modes;
+        # only the objects the server rejected are re-sent (counted as retries in the report).
+        stats = CollectionStats("Window", "vectors")
+
+        def on_skip(the_id, why):
+            print(f"    [!] Skip id={the_id} ({why})")
+            stats.record_skip()
+
+        def batches():
+            for batch_ids, batch_rows, batch_vecs in aligned_batches(
+                    args.win_csv, "window_id", args.win_ids, args.win_npy,
+                    batch_size=args.batch, max_pending=args.max_pending, on_skip=on_skip):
+                # batch_vecs is one contiguous float32 block; each object gets a row view of it, so no
+                # per-element Python floats are built here — the client packs the float32 row itself
+                objects = []
+                for i, row in enumerate(batch_rows):
+                    props = make_props(row)
+                    objects.append(DataObject(
+                        uuid=uuid.uuid5(uuid.NAMESPACE_URL, f"Window:{batch_ids[i]}"),
+                        properties=props,
+                        vector=batch_vecs[i],
+                    ))
+                for t_objs, t_ids, t in router.split(objects, batch_ids, batch_rows):
+                    if t:
+                        router.ensure(coll, [t])
+                    yield t_objs, t_ids, t
+
+        done = 0
+        def progress(n):
+            nonlocal done
+            done += n
+            print(f"[✓] Window: {done} upserted")
+
+        send_batches(coll, batches(), stats, concurrency=args.concurrency,
+                     retries=args.retries, on_batch=progress)
+        for f in stats.failures:
+            print(f"    [-] Failed id={f['source_id']} uuid={f['uuid']}: {f['error']}")
+        stats.print_summary()
+        if args.report:
+            report = IngestReport({"url": args.url, "batch_size": args.batch, "concurrency": args.concurrency})
+            report.collections["Window/vectors"] = stats
+            report.write(args.report, run=args.report_run)
 
         print("[DONE] vectors + properties upserted to 'Window'.")
+        bump_index_stamp(client, "insert_with_vectors Window")  # cached search results are stale now
     finally:
         client.close()
 
@@ -0,0 +1,288 @@
+# local_ann.py
+# Compressed approximate vector index over the *_labse.npy artifacts, for local search at corpus scale
+# where exact search (local_search.py) gets too slow / too big for laptops and small nodes:
+#   - IVF: a k-means coarse quantizer (nlist centroids); a query scans only the nprobe closest lists
+#   - codes per vector: PQ (m sub-vectors × 8-bit codebook ids of the residual to its centroid; scored
+#     with one query lookup table) or binary (1 bit per dimension of the mean-centered vector, Hamming)
+#   - exact re-scoring of the best `rerank` candidates from the memory-mapped float32 vectors
+# The index is one .npz per tier under LOCAL_ANN_DIR; with LOCAL_ANN=1 `--backend local` vector / hybrid
+# searches use it when present. `eval` reports recall@k against exact search, latency and memory per
+# million vectors (also on synthetic data of any size).
+#
+# examples:
+#   OUTPUTS_DIR=data/outputs python etl/app/local_ann.py build --collection Subchunk --codes pq
+#   OUTPUTS_DIR=data/outputs python etl/app/local_ann.py eval --collection Subchunk --k 10 --nprobe 8
+#   python etl/app/local_ann.py eval --synthetic 200000 --codes binary --nprobe 16
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from local_search import OUTPUTS_DIR, TIER_FILES, _pct, topk
+from stream_align import open_vectors
+
+ANN_DIR = Path(os.getenv("LOCAL_ANN_DIR", str(Path(OUTPUTS_DIR).parent / "cache" / "ann")))
+USE_ANN = os.getenv("LOCAL_ANN", "0") == "1"
+NPROBE = int(os.getenv("LOCAL_ANN_NPROBE", "8"))
+RERANK = int(os.getenv("LOCAL_ANN_RERANK", "10"))  # exact re-scoring of the best k * RERANK candidates
+TRAIN_MAX = 100_000  # k-means runs on at most this many sampled vectors
+BLOCK = 65536
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+def _nearest(x: np.ndarray, c: np.ndarray, spherical: bool) -> np.ndarray:
+    """Index of the closest centroid per row (max dot product if spherical, else min L2), in blocks."""
+    out = np.empty(x.shape[0], dtype=np.int32)
+    c_sq = None if spherical else (c * c).sum(axis=1)
+    for start in range(0, x.shape[0], BLOCK):
+        dots = np.asarray(x[start:start + BLOCK], dtype=np.float32) @ c.T
+        out[start:start + BLOCK] = dots.argmax(axis=1) if spherical else (c_sq - 2 * dots).argmin(axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 20, spherical: bool = False, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd iterations; empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    k = min(k, x.shape[0])
+    c = x[rng.choice(x.shape[0], size=k, replace=False)].astype(np.float32)
+    for _ in range(iters):
+        assign = _nearest(x, c, spherical)
+        sums = np.zeros_like(c)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k).astype(np.float32)
+        empty = counts == 0
+        c = sums / np.maximum(counts, 1)[:, None]
+        if empty.any():
+            c[empty] = x[rng.choice(x.shape[0], size=int(empty.sum()), replace=False)]
+        if spherical:
+            c /= np.linalg.norm(c, axis=1, keepdims=True) + 1e-12
+    return c
+
+
+def build_ann(vectors: np.ndarray, nlist: int = 0, codes: str = "pq", m: int = 48, iters: int = 20,
+              seed: int = 0) -> Dict[str, np.ndarray]:
+    """IVF + PQ / binary codes for a (n, d) matrix of normalized vectors; returns the arrays to save."""
+    n, d = vectors.shape
+    nlist = min(n, nlist or max(1, int(4 * np.sqrt(n))))
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, TRAIN_MAX), replace=False))], dtype=np.float32)
+    centroids = kmeans(sample, nlist, iters, spherical=True, seed=seed)
+    nlist = centroids.shape[0]
+    assign = _nearest(vectors, centroids, spherical=True)
+    order = np.argsort(assign, kind="stable").astype(np.int32)  # vector rows grouped by list
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+    out = {"centroids": centroids, "list_offsets": offsets, "list_ids": order,
+           "kind": np.array(codes), "shape": np.array([n, d], dtype=np.int64)}
+
+    if codes == "pq":
+        if d % m:
+            raise ValueError(f"--m {m} must divide the vector size {d}")
+        dsub = d // m
+        resid = sample - centroids[_nearest(sample, centroids, spherical=True)]
+        books = np.stack([kmeans(resid[:, j * dsub:(j + 1) * dsub], 256, iters, seed=seed + j) for j in range(m)])
+        if books.shape[1] < 256:  # fewer training vectors than codebook entries: pad with unused zeros
+            books = np.concatenate([books, np.zeros((m, 256 - books.shape[1], dsub), np.float32)], axis=1)
+        pq = np.empty((n, m), dtype=np.uint8)
+        for start in range(0, n, BLOCK):
+            rows = np.asarray(vectors[start:start + BLOCK], dtype=np.float32)
+            r = rows - centroids[assign[start:start + BLOCK]]
+            for j in range(m):
+                pq[start:start + BLOCK, j] = _nearest(r[:, j * dsub:(j + 1) * dsub], books[j], spherical=False)
+        out.update(codebooks=books, codes=pq[order])
+    elif codes == "binary":
+        mean = sample.mean(axis=0)
+        bits = np.empty((n, (d + 7) // 8), dtype=np.uint8)
+        for start in range(0, n, BLOCK):
+            bits[start:start + BLOCK] = np.packbits(np.asarray(vectors[start:start + BLOCK]) > mean, axis=1)
+        out.update(mean=mean.astype(np.float32), codes=bits[order])
+    else:
+        raise ValueError(f"unknown codes {codes!r} (expected pq | binary)")
+    return out
+
+
+class AnnIndex:
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.centroids = arrays["centroids"]
+        self.offsets, self.ids = arrays["list_offsets"], arrays["list_ids"]
+        self.codes = arrays["codes"]
+        self.kind = str(arrays["kind"])
+        self.codebooks = arrays.get("codebooks")
+        self.mean = arrays.get("mean")
+        self.n, self.d = (int(v) for v in arrays["shape"])
+        self.source = arrays.get("source", np.zeros(2, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path: Path) -> "AnnIndex":
+        with np.load(path) as z:
+            return cls({k: z[k] for k in z.files})
+
+    def candidates(self, q: np.ndarray, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(vector rows, approximate scores) from the nprobe closest lists."""
+        coarse = self.centroids @ q
+        lists = np.argsort(-coarse)[:nprobe]
+        spans = [(self.offsets[i], self.offsets[i + 1]) for i in lists]
+        pos = np.concatenate([np.arange(lo, hi) for lo, hi in spans]) if spans else np.empty(0, np.int64)
+        if self.kind == "pq":
+            lut = np.einsum("jkd,jd->jk", self.codebooks, q.reshape(self.codebooks.shape[0], -1))  # (m, 256)
+            base = np.concatenate([np.full(hi - lo, coarse[i], np.float32) for i, (lo, hi) in zip(lists, spans)])
+            approx = base + lut[np.arange(lut.shape[0]), self.codes[pos]].sum(axis=1)
+        else:
+            qbits = np.packbits(q > self.mean)
+            approx = -_POPCOUNT[self.codes[pos] ^ qbits].sum(axis=1).astype(np.float32)
+        return self.ids[pos], approx
+
+    def search(self, vectors: np.ndarray, q: np.ndarray, k: int, nprobe: int = NPROBE,
+               rerank: int = RERANK) -> Tuple[np.ndarray, np.ndarray]:
+        """(row indices, exact scores) best first: approximate shortlist, then exact dot products from `vectors`."""
+        rows, approx = self.candidates(q, nprobe)
+        short = min(len(rows), max(k, k * rerank))
+        if len(rows) > short:
+            rows = rows[np.argpartition(-approx, short - 1)[:short]]
+        rows = np.sort(rows)  # ascending reads from the memory-mapped floats
+        exact = np.asarray(vectors[rows], dtype=np.float32) @ q
+        best = np.argsort(-exact, kind="stable")[:k]
+        return rows[best], exact[best]
+
+    def nbytes(self) -> Dict[str, int]:
+        fixed = self.centroids.nbytes + self.offsets.nbytes
+        fixed += self.codebooks.nbytes if self.codebooks is not None else 0
+        fixed += self.mean.nbytes if self.mean is not None else 0
+        return {"per_vector": int(self.codes.shape[1] + self.ids.itemsize), "fixed": int(fixed)}
+
+
+def ann_path(tier: str, index_dir: Path = ANN_DIR) -> Path:
+    return Path(index_dir) / f"{tier}.npz"
+
+
+def _source_stamp(path: Path) -> np.ndarray:
+    st = path.stat()
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def save_ann(arrays: Dict[str, np.ndarray], path: Path, source: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez(tmp, source=_source_stamp(source), **arrays)
+    os.replace(tmp, path)  # readers never see a half-written index
+    return path
+
+
+def load_tier_ann(tier: str, npy_path: Path, index_dir: Path = ANN_DIR) -> Optional[AnnIndex]:
+    """The tier's ANN index when LOCAL_ANN=1 and one was built from the current npy, else None (exact search)."""
+    path = ann_path(tier, index_dir)
+    if not USE_ANN or not path.exists():
+        return None
+    index = AnnIndex.load(path)
+    if not (index.source == _source_stamp(npy_path)).all():
+        print(f"[!] {tier}: {path} is older than {npy_path.name}; exact search until `local_ann.py build`")
+        return None
+    return index
+
+
+# --------------------
+# Evaluation: recall@k vs exact, latency, memory
+# --------------------
+def _mb_per_million(per_vector: int, fixed: int = 0) -> float:
+    return round((per_vector * 1_000_000 + fixed) / 2**20, 1)
+
+
+def synthetic(n: int, d: int = 768, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered, normalized float32 vectors (LaBSE-like geometry is not needed for recall / memory numbers)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, d)).astype(np.float32)
+    x = centers[rng.integers(0, clusters, n)] + rng.normal(scale=0.6, size=(n, d)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def evaluate(vectors: np.ndarray, index: AnnIndex, queries: int = 200, k: int = 10, nprobe: int = NPROBE,
+             rerank: int = RERANK, seed: int = 1) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(vectors.shape[0], size=min(queries, vectors.shape[0]), replace=False)
+    recall, exact_ms, ann_ms = [], [], []
+    for i in picks:
+        q = np.asarray(vectors[i], dtype=np.float32) + rng.normal(0, 0.05, vectors.shape[1]).astype(np.float32)
+        q /= np.linalg.norm(q)
+        t = time.perf_counter()
+        truth, _ = topk(vectors, q, k)
+        exact_ms.append((time.perf_counter() - t) * 1000)
+        t = time.perf_counter()
+        got, _ = index.search(vectors, q, k, nprobe, rerank)
+        ann_ms.append((time.perf_counter() - t) * 1000)
+        recall.append(len(set(truth.tolist()) & set(got.tolist())) / len(truth))
+    mem = index.nbytes()
+    return {
+        "vectors": int(vectors.shape[0]), "dims": int(vectors.shape[1]), "codes": index.kind,
+        "nlist": int(index.centroids.shape[0]), "nprobe": nprobe, "rerank": rerank, "k": k,
+        "queries": len(picks),
+        f"recall_at_{k}": round(float(np.mean(recall)), 4),
+        "exact_ms": {"p50": round(_pct(exact_ms, 0.5), 3), "p95": round(_pct(exact_ms, 0.95), 3)},
+        "ann_ms": {"p50": round(_pct(ann_ms, 0.5), 3), "p95": round(_pct(ann_ms, 0.95), 3)},
+        "bytes_per_vector": {"float32": 4 * int(vectors.shape[1]), "index": mem["per_vector"]},
+        "mb_per_million": {"float32": _mb_per_million(4 * int(vectors.shape[1])),
+                           "index": _mb_per_million(mem["per_vector"], mem["fixed"])},
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="IVF-PQ / IVF-binary index over *_labse.npy with exact re-scoring.")
+    ap.add_argument("cmd", choices=["build", "eval"])
+    ap.add_argument("--collection", default="Window,Sentence,Subchunk,Chunk", help="Comma-separated tiers")
+    ap.add_argument("--outdir", default=str(OUTPUTS_DIR), help="Directory with the ids / npy artifacts")
+    ap.add_argument("--index-dir", default=str(ANN_DIR), help="Where the <tier>.npz indexes live (LOCAL_ANN_DIR)")
+    ap.add_argument("--codes", choices=["pq", "binary"], default="pq")
+    ap.add_argument("--nlist", type=int, default=0, help="IVF lists (default: 4·√n)")
+    ap.add_argument("--m", type=int, default=48, help="PQ sub-vectors = bytes per vector (must divide the dims)")
+    ap.add_argument("--iters", type=int, default=20, help="k-means iterations")
+    ap.add_argument("--nprobe", type=int, default=NPROBE)
+    ap.add_argument("--rerank", type=int, default=RERANK)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--synthetic", type=int, default=0, help="eval: build + measure on N synthetic vectors instead")
+    ap.add_argument("--out", default="", help="eval: also write the report as JSON")
+    args = ap.parse_args()
+
+    def build(vectors):
+        t0 = time.perf_counter()
+        arrays = build_ann(vectors, args.nlist, args.codes, args.m, args.iters)
+        return arrays, time.perf_counter() - t0
+
+    reports = []
+    if args.synthetic:
+        vectors = synthetic(args.synthetic)
+        arrays, secs = build(vectors)
+        print(f"[✓] synthetic: {args.synthetic} vectors indexed in {secs:.1f}s")
+        reports.append({"tier": "synthetic", **evaluate(vectors, AnnIndex(arrays), args.queries, args.k,
+                                                        args.nprobe, args.rerank)})
+    for tier in ([] if args.synthetic else [c for c in args.collection.split(",") if c]):
+        npy = Path(args.outdir) / TIER_FILES[tier][3]
+        if not npy.exists():
+            print(f"[skip] {tier}: {npy} not found (set OUTPUTS_DIR)")
+            continue
+        vectors = open_vectors(str(npy))
+        path = ann_path(tier, Path(args.index_dir))
+        if args.cmd == "build" or not path.exists():
+            arrays, secs = build(vectors)
+            save_ann(arrays, path, npy)
+            print(f"[✓] {tier}: {vectors.shape[0]} vectors → {path} ({args.codes}, "
+                  f"nlist={arrays['centroids'].shape[0]}, {path.stat().st_size / 1e6:.1f} MB, {secs:.1f}s)")
+        if args.cmd == "eval":
+            reports.append({"tier": tier, **evaluate(vectors, AnnIndex.load(path), args.queries, args.k,
+                                                     args.nprobe, args.rerank)})
+    for r in reports:
+        rk = f"recall_at_{r['k']}"
+        print(f"[report] {r['tier']}: {r['vectors']} × {r['dims']} {r['codes']} nlist={r['nlist']} "
+              f"nprobe={r['nprobe']}  {rk}={r[rk]:.3f}  ann p50={r['ann_ms']['p50']:.2f} ms "
+              f"(exact {r['exact_ms']['p50']:.2f} ms)  per 1M vectors: {r['mb_per_million']['index']:.0f} MB "
+              f"index vs {r['mb_per_million']['float32']:.0f} MB float32")
+    if args.out and reports:
+        Path(args.out).write_text(json.dumps(reports, indent=2), encoding="utf-8")
+        print(f"[✓] report → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# local_bm25.py
+# Offline BM25 over the tier CSVs (windows_with_headings.csv, sentences_with_headings.csv, subchunks_200.csv,
+# chunks.csv): no Weaviate needed for CI, relevance experiments, or as a fallback while it is down.
+# Text is tokenized the way the folded BM25 fields are searched (pali_fold.fold: NFC, diacritics stripped,
+# lowercased, aa/ii/uu collapsed, then split on non-word characters), so mettā / metta / mettaa match.
+# The inverted index is stored per tier as one .npz of flat arrays (CSR postings):
+#   terms (sorted, one UTF-8 blob), offsets[V+1], docs[P] int32, tfs[P] uint16, doc_len[N] int32, ids[N]
+# and rebuilt automatically when the source CSV changes. `--mode bm25 --backend local` in the search CLIs.
+#
+# examples:
+#   OUTPUTS_DIR=data/outputs python etl/app/local_bm25.py build
+#   OUTPUTS_DIR=data/outputs python etl/app/local_bm25.py query --collection Sentence "mettaa bhavana"
+#   OUTPUTS_DIR=data/outputs python etl/app/search_and_save.py --backend local --collection Window --query "mettā"
+import argparse
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from local_search import TIER_FILES, OUTPUTS_DIR
+from pali_fold import FOLD_FIELDS, fold
+from stream_align import iter_csv_records
+
+BM25_DIR = Path(os.getenv("LOCAL_BM25_DIR", str(Path(OUTPUTS_DIR).parent / "cache" / "bm25")))
+K1, B = 1.2, 0.75  # Weaviate's BM25 defaults
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Pāli-aware word tokens: the same folding as the <text>_folded fields in Weaviate."""
+    return _TOKEN.findall(fold(text or ""))
+
+
+def _source_stamp(path: Path) -> np.ndarray:
+    st = path.stat()
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def build_index(tier: str, outdir: Path = OUTPUTS_DIR, index_dir: Path = BM25_DIR) -> Path:
+    """Stream the tier CSV once and write <index_dir>/<tier>.npz."""
+    csv_name, id_field, _, _ = TIER_FILES[tier]
+    csv_path = Path(outdir) / csv_name
+    if not csv_path.exists():
+        raise FileNotFoundError(f"{tier}: {csv_path} not found (set OUTPUTS_DIR)")
+    text_field = FOLD_FIELDS[tier]
+    vocab: Dict[str, int] = {}
+    term_ids, doc_ids, tfs = array("i"), array("i"), array("i")
+    doc_len, ids = array("i"), []
+    t0 = time.perf_counter()
+    for doc, rec in enumerate(iter_csv_records(str(csv_path))):
+        tokens = tokenize(rec.get(text_field, ""))
+        counts: Dict[int, int] = {}
+        for t in tokens:
+            tid = vocab.setdefault(t, len(vocab))
+            counts[tid] = counts.get(tid, 0) + 1
+        for tid, tf in counts.items():
+            term_ids.append(tid)
+            doc_ids.append(doc)
+            tfs.append(tf)
+        doc_len.append(len(tokens))
+        ids.append(rec[id_field])
+
+    # group postings by term (docs stay ascending inside a term: stable sort), terms sorted for bisect
+    terms = np.array(list(vocab), dtype=str)
+    by_term = np.argsort(terms, kind="stable")  # sorted position → old term id
+    new_id = np.empty(len(terms), dtype=np.int64)
+    new_id[by_term] = np.arange(len(terms))
+    t_ids = new_id[np.frombuffer(term_ids, dtype=np.int32)] if term_ids else np.empty(0, dtype=np.int64)
+    order = np.argsort(t_ids, kind="stable")
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(t_ids, minlength=len(terms)), out=offsets[1:])
+
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    out = index_dir / f"{tier}.npz"
+    tmp = index_dir / f"{tier}.tmp.npz"
+    np.savez(
+        tmp,
+        terms=np.frombuffer("\n".join(terms[by_term]).encode("utf-8"), dtype=np.uint8),  # not <U{longest}
+        offsets=offsets,
+        docs=np.frombuffer(doc_ids, dtype=np.int32)[order],
+        tfs=np.minimum(np.frombuffer(tfs, dtype=np.int32)[order], np.iinfo(np.uint16).max).astype(np.uint16),
+        doc_len=np.frombuffer(doc_len, dtype=np.int32).copy(),
+        ids=np.array(ids, dtype=str),
+        source=_source_stamp(csv_path),
+    )
+    os.replace(tmp, out)  # readers never see a half-written index
+    print(f"[✓] {tier}: {len(ids)} docs, {len(terms)} terms, {len(order)} postings → {out} "
+          f"({out.stat().st_size / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s)")
+    return out
+
+
+class LocalBM25Index:
+    def __init__(self, tier: str, outdir: Path = OUTPUTS_DIR, index_dir: Path = BM25_DIR):
+        path = Path(index_dir) / f"{tier}.npz"
+        csv_path = Path(outdir) / TIER_FILES[tier][0]
+        if not path.exists() or (csv_path.exists() and not _fresh(path, csv_path)):
+            print(f"[i] building local BM25 index for {tier}")
+            build_index(tier, outdir, index_dir)
+        with np.load(path) as z:
+            self.terms: List[str] = z["terms"].tobytes().decode("utf-8").split("\n") if z["terms"].size else []
+            self.offsets = z["offsets"]
+            self.docs, self.tfs = z["docs"], z["tfs"].astype(np.float32)
+            self.doc_len, self.ids = z["doc_len"].astype(np.float32), z["ids"]
+        self.tier = tier
+        self.n_docs = len(self.ids)
+        self.avgdl = float(self.doc_len.mean()) if self.n_docs else 0.0
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = bisect_left(self.terms, term)
+        if i >= len(self.terms) or self.terms[i] != term:
+            return self.docs[:0], self.tfs[:0]
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return self.docs[lo:hi], self.tfs[lo:hi]
+
+    def search(self, query: str, k: int, k1: float = K1, b: float = B) -> List[Tuple[str, float]]:
+        """[(id, BM25 score)] best first; documents without any query term are never returned."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        norm = k1 * (1.0 - b + b * self.doc_len / (self.avgdl or 1.0))
+        for term in dict.fromkeys(tokenize(query)):
+            docs, tf = self.postings(term)
+            if not len(docs):
+                continue
+            idf = np.log(1.0 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (k1 + 1.0) / (tf + norm[docs])
+        hit = np.flatnonzero(scores)
+        if len(hit) > k:
+            hit = hit[np.argpartition(-scores[hit], k - 1)[:k]]
+        hit = hit[np.argsort(-scores[hit], kind="stable")]
+        return [(str(self.ids[i]), float(scores[i])) for i in hit]
+
+    def nbytes(self) -> int:
+        arrays = (self.offsets, self.docs, self.tfs, self.doc_len, self.ids)
+        return sum(len(t.encode("utf-8")) + 1 for t in self.terms) + sum(a.nbytes for a in arrays)
+
+
+def _fresh(index_path: Path, csv_path: Path) -> bool:
+    try:
+        with np.load(index_path) as z:
+            return bool((z["source"] == _source_stamp(csv_path)).all())
+    except Exception:  # unreadable / older layout
+        return False
+
+
+_loaded: Dict[Tuple[str, str], LocalBM25Index] = {}
+_loaded_lock = threading.Lock()
+
+
+def bm25_index(tier: str, outdir: Path = OUTPUTS_DIR, index_dir: Optional[Path] = None) -> LocalBM25Index:
+    """One loaded index per tier and process (built on first use if missing or stale)."""
+    index_dir = Path(index_dir or BM25_DIR)
+    key = (tier, str(index_dir))
+    with _loaded_lock:
+        if key not in _loaded:
+            _loaded[key] = LocalBM25Index(tier, outdir, index_dir)
+        return _loaded[key]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline BM25 inverted index over the tier CSVs.")
+    ap.add_argument("cmd", choices=["build", "query"])
+    ap.add_argument("query", nargs="?", default="")
+    ap.add_argument("--collection", default="Window,Sentence,Subchunk,Chunk", help="Comma-separated tiers")
+    ap.add_argument("--outdir", default=str(OUTPUTS_DIR), help="Directory with the tier CSVs")
+    ap.add_argument("--index-dir", default=str(BM25_DIR), help="Where the <tier>.npz indexes live (LOCAL_BM25_DIR)")
+    ap.add_argument("--k", type=int, default=10)
+    args = ap.parse_intermixed_args()
+    tiers = [c for c in args.collection.split(",") if c]
+
+    if args.cmd == "build":
+        for tier in tiers:
+            try:
+                build_index(tier, Path(args.outdir), Path(args.index_dir))
+            except FileNotFoundError as e:
+                print(f"[skip] {e}")
+        return
+    if not args.query:
+        ap.error("query needs the query text")
+    for tier in tiers:
+        index = bm25_index(tier, Path(args.outdir), Path(args.index_dir))
+        t0 = time.perf_counter()
+        hits = index.search(args.query, args.k)
+        print(f"[{tier}] {len(hits)} hits in {(time.perf_counter() - t0) * 1000:.2f} ms "
+              f"({index.n_docs} docs, index {index.nbytes() / 1e6:.1f} MB in memory)")
+        for i, (the_id, score) in enumerate(hits, start=1):
+            print(f"{i:>2}. {the_id}  {score:.4f}")
+
+
+if __name__ == "__main__":
+    main()
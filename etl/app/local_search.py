@@ -0,0 +1,290 @@
+# local_search.py
+# In-process search over the ETL artifacts in OUTPUTS_DIR, no Weaviate needed (offline runs, CI, laptops):
+# exact vector search on the memory-mapped *_labse.npy (blocked dot products + argpartition top-k per block)
+# or, with LOCAL_ANN=1, an IVF-PQ shortlist re-scored exactly (local_ann.py), BM25 on the inverted index of
+# local_bm25.py, and hybrid as Weaviate's relative score fusion of both;
+# hits joined back to their CSV rows by id. `--backend local` in the search CLIs (and "backend": "local"
+# in search_service.py requests) answers from here with the same result shape as Weaviate.
+#
+# examples:
+#   OUTPUTS_DIR=data/outputs python etl/app/search_and_save.py --backend local --collection Subchunk --mode vector --query "mettā"
+#   OUTPUTS_DIR=data/outputs python etl/app/search_and_save.py --backend local --collection Sentence --mode bm25 --query "metta"
+#   OUTPUTS_DIR=data/outputs python etl/app/local_search.py bench --collection Subchunk,Chunk --queries 200
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline import OUTPUTS_DIR, VECTOR_FILES
+from search_weaviate_labse_hybridfix import HEAVY_TEXT, encode_query_labse, kwic, pick_return_props
+from stream_align import iter_csv_records, iter_ids, open_vectors
+
+BLOCK_ROWS = int(os.getenv("LOCAL_BLOCK_ROWS", "65536"))  # vectors per dot-product block (~200 MB at 768 dims)
+TIER_FILES = {coll: (csv, idcol, ids, npy) for coll, csv, idcol, _txt, ids, npy in VECTOR_FILES}
+INT_PROPS = {"token_start", "token_end", "order_idx", "size", "level"}
+SPAN_PROPS = ["token_start", "token_end"]
+HYBRID_POOL = 4  # hybrid: each leg contributes its top k * HYBRID_POOL before fusion
+
+
+def topk(vectors: np.ndarray, q: np.ndarray, k: int, block: int = BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """(row indices, scores) of the k largest vectors @ q, best first; only `block` rows are in RAM at a time."""
+    best_i = np.empty(0, dtype=np.int64)
+    best_s = np.empty(0, dtype=np.float32)
+    for start in range(0, vectors.shape[0], block):
+        s = np.asarray(vectors[start:start + block], dtype=np.float32) @ q
+        idx = np.argpartition(-s, k - 1)[:k] if s.shape[0] > k else np.arange(s.shape[0])
+        best_i = np.concatenate([best_i, idx + start])
+        best_s = np.concatenate([best_s, s[idx]])
+        if best_s.shape[0] > k:
+            keep = np.argpartition(-best_s, k - 1)[:k]
+            best_i, best_s = best_i[keep], best_s[keep]
+    order = np.argsort(-best_s, kind="stable")
+    return best_i[order], best_s[order]
+
+
+class TierRows:
+    """id → the properties the search scripts return for one tier, read once from the tier CSV."""
+
+    def __init__(self, tier: str, outdir: Path = OUTPUTS_DIR):
+        csv_name, self.id_field, _, _ = TIER_FILES[tier]
+        self.tier = tier
+        self.csv_path = Path(outdir) / csv_name
+        if not self.csv_path.exists():
+            raise FileNotFoundError(f"{tier}: {self.csv_path} not found (set OUTPUTS_DIR)")
+        self.props = pick_return_props(tier) + [p for p in SPAN_PROPS if p not in pick_return_props(tier)]
+        self._rows: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def rows(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._rows is None:
+                rows = {}
+                for rec in iter_csv_records(str(self.csv_path)):
+                    rows[rec[self.id_field]] = {p: _typed(p, rec.get(p, "")) for p in self.props}
+                self._rows = rows
+            return self._rows
+
+    def get(self, the_id: str) -> Dict[str, Any]:
+        return dict(self.rows().get(the_id) or {self.id_field: the_id})
+
+
+def _typed(prop: str, value: str):
+    if prop in INT_PROPS:
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+    return value
+
+
+class LocalVectorIndex:
+    """Cosine search over one tier's normalized LaBSE vectors (memory-mapped, aligned to *_ids.txt): exact, or
+    an IVF shortlist re-scored exactly when LOCAL_ANN=1 and local_ann.py built an index for the tier."""
+
+    def __init__(self, tier: str, outdir: Path = OUTPUTS_DIR, block: int = BLOCK_ROWS):
+        _, _, ids_name, npy_name = TIER_FILES[tier]
+        ids_path, npy_path = Path(outdir) / ids_name, Path(outdir) / npy_name
+        for path in (ids_path, npy_path):
+            if not path.exists():
+                raise FileNotFoundError(f"{tier}: {path} not found (set OUTPUTS_DIR)")
+        self.tier = tier
+        self.block = block
+        self.ids = [the_id for _, the_id in iter_ids(str(ids_path))]
+        self.vectors = open_vectors(str(npy_path))
+        if self.vectors.shape[0] != len(self.ids):
+            raise ValueError(f"{tier}: {npy_name} has {self.vectors.shape[0]} rows but {ids_name} {len(self.ids)} ids")
+        from local_ann import load_tier_ann
+        self.ann = load_tier_ann(tier, npy_path)  # LOCAL_ANN=1: IVF shortlist + exact re-scoring
+
+    def search(self, qvec: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """[(id, cosine similarity)] best first."""
+        q = np.asarray(qvec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        if self.ann is not None:
+            idx, scores = self.ann.search(self.vectors, q, k)
+        else:
+            idx, scores = topk(self.vectors, q, k, self.block)
+        return [(self.ids[i], float(s)) for i, s in zip(idx, scores)]
+
+
+_loaded: Dict[Tuple[str, str, str], Any] = {}
+_loaded_lock = threading.Lock()
+
+
+def _get(kind: str, tier: str, outdir: Path, factory: Callable[[], Any]):
+    """One index / row table per (kind, tier, outdir) and process; the service reuses them across requests."""
+    key = (kind, tier, str(outdir))
+    with _loaded_lock:
+        if key not in _loaded:
+            _loaded[key] = factory()
+        return _loaded[key]
+
+
+def vector_index(tier: str, outdir: Path = OUTPUTS_DIR) -> LocalVectorIndex:
+    return _get("vectors", tier, outdir, lambda: LocalVectorIndex(tier, outdir))
+
+
+def tier_rows(tier: str, outdir: Path = OUTPUTS_DIR) -> TierRows:
+    return _get("rows", tier, outdir, lambda: TierRows(tier, outdir))
+
+
+UNSUPPORTED = {"follow_refs": "--follow-refs", "context": "--context", "facet": "--facet",
+               "filter_heading": "--filter-heading", "filter_path_prefix": "--filter-path-prefix"}
+
+
+def _min_max(ranked: List[Tuple[str, float]]) -> Dict[str, float]:
+    if not ranked:
+        return {}
+    lo, hi = min(s for _, s in ranked), max(s for _, s in ranked)
+    return {i: (s - lo) / (hi - lo) if hi > lo else 1.0 for i, s in ranked}
+
+
+def local_search(p: Dict[str, Any], encode=None, outdir: Path = OUTPUTS_DIR) -> Dict[str, Any]:
+    """
+    search() for backend=local: same result dict as the Weaviate path. vector: distance = 1 - cosine;
+    bm25: BM25 score on the folded text (local_bm25.py, always diacritic-insensitive); hybrid:
+    alpha * vector + (1 - alpha) * bm25 after min-max normalizing each leg (relative score fusion).
+    """
+    t0 = time.perf_counter()
+    for key, flag in UNSUPPORTED.items():
+        if p.get(key):
+            raise ValueError(f"{flag} needs the weaviate backend")
+    tier = p["collection"]
+    rows = tier_rows(tier, outdir)
+    k = p["k"]
+    pool = k * HYBRID_POOL if p["mode"] == "hybrid" else k
+    vec: List[Tuple[str, float]] = []
+    kw: List[Tuple[str, float]] = []
+    if p["mode"] != "bm25":
+        qvec = encode(p["query"]) if encode else encode_query_labse(p["query"], p["model"])
+        vec = vector_index(tier, outdir).search(qvec, pool)
+    if p["mode"] != "vector":
+        from local_bm25 import bm25_index
+        kw = bm25_index(tier, outdir).search(p["query"], pool)
+
+    if p["mode"] == "vector":
+        ranked = [(i, None, round(1.0 - sim, 6)) for i, sim in vec]
+    elif p["mode"] == "bm25":
+        ranked = [(i, score, None) for i, score in kw]
+    else:
+        nv, nk = _min_max(vec), _min_max(kw)
+        fused = {i: p["alpha"] * nv.get(i, 0.0) + (1 - p["alpha"]) * nk.get(i, 0.0) for i in {**nv, **nk}}
+        ranked = [(i, round(s, 6), None) for i, s in sorted(fused.items(), key=lambda x: -x[1])[:k]]
+    hits = [{
+        "uuid": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{tier}:{the_id}")),  # same ids the loaders give Weaviate
+        "score": score,
+        "distance": distance,
+        "properties": rows.get(the_id),
+        "references": {},
+    } for the_id, score, distance in ranked]
+    return finish_local(p, hits, t0)
+
+
+def finish_local(p: Dict[str, Any], hits: List[Dict[str, Any]], t0: float) -> Dict[str, Any]:
+    """--show / --hydrate as on Weaviate: heavy Chunk / Subchunk text becomes a KWIC snippet or is dropped."""
+    if p["show"]:
+        hits = hits[: p["show"]]
+    heavy = HEAVY_TEXT.get(p["collection"])
+    if heavy and p["hydrate"] != "full":
+        for h in hits:
+            text = h["properties"].pop(heavy, "")
+            if p["hydrate"] == "snippet":
+                h["properties"]["snippet"] = kwic(text, p["query"])
+    size = sum(len(str(v).encode("utf-8")) for h in hits for v in h["properties"].values() if v is not None)
+    return {
+        "collection": p["collection"], "query": p["query"], "mode": p["mode"], "objects": hits,
+        "payload_kb": {"phase1": round(size / 1024, 1), "hydrated": 0.0},
+        "degraded": False, "backend": "local", "cached": False,
+        "took_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+# --------------------
+# Benchmark: local vs Weaviate
+# --------------------
+def _pct(values: List[float], q: float) -> float:
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))] if s else 0.0
+
+
+def bench_tier(tier: str, n_queries: int, k: int, outdir: Path, client=None, seed: int = 0) -> Dict[str, Any]:
+    """Stored vectors (with a little noise) as queries: latency of local exact search vs near_vector, overlap@k."""
+    index = vector_index(tier, outdir)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(index.ids), size=min(n_queries, len(index.ids)), replace=False)
+    queries = [np.asarray(index.vectors[i], dtype=np.float32) + rng.normal(0, 0.01, index.vectors.shape[1]).astype(np.float32)
+               for i in picks]
+    out: Dict[str, Any] = {"tier": tier, "vectors": len(index.ids), "dims": int(index.vectors.shape[1]),
+                           "queries": len(queries), "k": k}
+    local_ms, local_ids = [], []
+    for q in queries:
+        t = time.perf_counter()
+        local_ids.append([i for i, _ in index.search(q, k)])
+        local_ms.append((time.perf_counter() - t) * 1000)
+    out["local_ms"] = {"p50": round(_pct(local_ms, 0.5), 3), "p95": round(_pct(local_ms, 0.95), 3)}
+    if client is not None:
+        from aliases import resolve
+        id_field = TIER_FILES[tier][1]
+        coll = client.collections.get(resolve(client, tier))
+        remote_ms, overlap = [], []
+        for q, ids in zip(queries, local_ids):
+            t = time.perf_counter()
+            res = coll.query.near_vector(near_vector=q.tolist(), limit=k, return_properties=[id_field])
+            remote_ms.append((time.perf_counter() - t) * 1000)
+            got = {(o.properties or {}).get(id_field) for o in res.objects}
+            overlap.append(len(got & set(ids)) / max(1, len(ids)))
+        out["weaviate_ms"] = {"p50": round(_pct(remote_ms, 0.5), 3), "p95": round(_pct(remote_ms, 0.95), 3)}
+        out["overlap_at_k"] = round(sum(overlap) / len(overlap), 3)  # < 1.0: HNSW missed exact neighbors
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local exact vector search over *_labse.npy: benchmark vs Weaviate.")
+    ap.add_argument("cmd", choices=["bench"])
+    ap.add_argument("--collection", default="Window,Sentence,Subchunk,Chunk", help="Comma-separated tiers")
+    ap.add_argument("--outdir", default=str(OUTPUTS_DIR), help="Directory with the CSV / ids / npy artifacts")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_URL", "http://localhost:8081"))
+    ap.add_argument("--grpc-port", default=os.getenv("WEAVIATE_GRPC_PORT", "50052"))
+    ap.add_argument("--no-weaviate", action="store_true", help="Time the local backend only")
+    ap.add_argument("--out", default="", help="Also write the report as JSON")
+    args = ap.parse_args()
+
+    client = None
+    if not args.no_weaviate:
+        from weaviate_nodes import connect_any
+        try:
+            client = connect_any(args.url, args.grpc_port)
+        except Exception as e:
+            print(f"[!] Weaviate at {args.url} unreachable ({e}); timing the local backend only")
+    reports = []
+    try:
+        for tier in [c for c in args.collection.split(",") if c]:
+            try:
+                r = bench_tier(tier, args.queries, args.k, Path(args.outdir), client)
+            except FileNotFoundError as e:
+                print(f"[skip] {e}")
+                continue
+            reports.append(r)
+            line = f"[report] {tier}: {r['vectors']} × {r['dims']}  local p50={r['local_ms']['p50']:.2f} ms p95={r['local_ms']['p95']:.2f} ms"
+            if "weaviate_ms" in r:
+                line += (f"  weaviate p50={r['weaviate_ms']['p50']:.2f} ms p95={r['weaviate_ms']['p95']:.2f} ms"
+                         f"  overlap@{args.k}={r['overlap_at_k']:.3f}")
+            print(line)
+    finally:
+        if client is not None:
+            client.close()
+    if args.out:
+        Path(args.out).write_text(json.dumps(reports, indent=2), encoding="utf-8")
+        print(f"[✓] report → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
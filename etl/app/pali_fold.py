@@ -0,0 +1,105 @@
+# pali_fold.py
+# Diacritic folding for Pāli text, so one BM25 query matches "mettā", "metta" and "mettaa".
+# The ETL stores a folded copy of each tier's text property (<prop>_folded: NFC, diacritics stripped,
+# lowercased, long vowels aa/ii/uu collapsed); the search scripts fold the query the same way and run
+# BM25 against that copy only.
+#
+# example:
+#   python etl/app/pali_fold.py "Mettaa-sutta" "Mettāsuttaṃ"
+import re
+import sys
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+# text property per tier that gets a folded copy
+FOLD_FIELDS = {"Window": "text", "Sentence": "sentence_text", "Subchunk": "subchunk_text", "Chunk": "chunk_text"}
+FOLD_SUFFIX = "_folded"
+_LONG_VOWEL = re.compile(r"([aiu])\1")
+
+
+class _FoldTable(dict):
+    """str.translate table filled on demand: every character maps to exactly one folded character."""
+
+    def __missing__(self, code: int) -> str:
+        ch = chr(code)
+        base = "".join(c for c in unicodedata.normalize("NFD", ch) if not unicodedata.combining(c))
+        out = (base or ch).lower()[:1] or ch
+        self[code] = out
+        return out
+
+
+_TABLE = _FoldTable()
+
+
+def fold_chars(text: str) -> str:
+    """NFC, strip diacritics, lowercase; same length as the NFC text (KWIC maps hits back by offset)."""
+    return unicodedata.normalize("NFC", text or "").translate(_TABLE)
+
+
+def fold(text: str) -> str:
+    """fold_chars() plus long vowels written doubled (mettaa) → single (metta)."""
+    return _LONG_VOWEL.sub(r"\1", fold_chars(text))
+
+
+def folded_field(tier: str) -> Optional[str]:
+    field = FOLD_FIELDS.get(tier)
+    return field + FOLD_SUFFIX if field else None
+
+
+def add_folded(props: Dict[str, Any], tier: str) -> Dict[str, Any]:
+    """Add the <text>_folded copy to an object's properties (in place); other tiers pass through."""
+    field = FOLD_FIELDS.get(tier)
+    if field and field in props:
+        props[field + FOLD_SUFFIX] = fold(props[field]) if props[field] is not None else None
+    return props
+
+
+_has_folded: Dict[str, bool] = {}
+
+
+def _remember_folded(name: str, tier: str, props) -> bool:
+    field = folded_field(tier)
+    _has_folded[name] = field in {pr.name for pr in props}
+    if not _has_folded[name]:
+        print(f"[i] {name} has no {field} (loaded before folding); BM25 on the unfolded text until reloaded")
+    return _has_folded[name]
+
+
+def has_folded(coll, tier: str) -> bool:
+    """Whether the collection's schema carries <text>_folded; checked once per physical collection."""
+    if not folded_field(tier):
+        return False
+    if coll.name not in _has_folded:
+        try:
+            return _remember_folded(coll.name, tier, coll.config.get().properties)
+        except Exception:  # schema unreadable: assume the current layout, the query itself reports errors
+            return True
+    return _has_folded[coll.name]
+
+
+async def has_folded_async(coll, tier: str) -> bool:
+    """has_folded() for a WeaviateAsyncClient collection."""
+    if not folded_field(tier):
+        return False
+    if coll.name not in _has_folded:
+        try:
+            return _remember_folded(coll.name, tier, (await coll.config.get()).properties)
+        except Exception:
+            return True
+    return _has_folded[coll.name]
+
+
+def folded_query(tier: str, query: str, enabled: bool = True) -> Tuple[str, Optional[List[str]]]:
+    """
+    (query, query_properties) for bm25 / hybrid: the folded query against the folded field.
+    Callers pass enabled=fold and has_folded(coll, tier), so older collections fall back to the raw text.
+    """
+    field = folded_field(tier)
+    if not enabled or not field:
+        return query, None
+    return fold(query), [field]
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        print(f"{arg} → {fold(arg)}")
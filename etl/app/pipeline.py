@@ -10,6 +10,14 @@ WEAVIATE_GRPC = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
 DATA_DIR      = Path(os.getenv("DATA_DIR", "/workspace/data"))
 OUTPUTS_DIR   = Path(os.getenv("OUTPUTS_DIR", str(DATA_DIR / "outputs")))
 WAIT_MAX_SEC  = int(os.getenv("WAIT_MAX_SEC", "600"))  # 10min default
+INGEST_REPORT = os.getenv("INGEST_REPORT", "")  # e.g. /workspace/data/outputs/ingest_report.json
+BULK_LOAD     = os.getenv("BULK_LOAD", "0") == "1"  # pair with ASYNC_INDEXING=true on the weaviate service
+BULK_BATCH    = int(os.getenv("BULK_BATCH_SIZE", "1024"))
+BULK_CONC     = int(os.getenv("BULK_CONCURRENCY", "4"))
+IMPORT_TIMINGS = Path(os.getenv("IMPORT_TIMINGS", str(OUTPUTS_DIR / "import_timings.json")))
+SNAPSHOTS     = os.getenv("SNAPSHOTS", "0") == "1"  # needs backup-filesystem on the weaviate service
+BLUE_GREEN    = os.getenv("BLUE_GREEN", "0") == "1"  # load into <Tier>_v<timestamp>, flip aliases when it passes
+PREWARM_TOP   = int(os.getenv("PREWARM_TOP", "100"))  # frequent queries replayed into the result cache after a load
 
 APP_DIR = Path(__file__).resolve().parent
 
@@ -52,48 +60,209 @@ def wait_ready(url: str, max_wait: int = WAIT_MAX_SEC):
             sys.exit(1)
         time.sleep(2)
 
+def vector_queue(url: str):
+    """(total queued vectors, shards still indexing) from /v1/nodes?output=verbose."""
+    with urllib.request.urlopen(url.rstrip("/") + "/v1/nodes?output=verbose", timeout=10) as r:
+        nodes = json.loads(r.read().decode("utf-8")).get("nodes", [])
+    queued, indexing = 0, 0
+    for node in nodes:
+        for shard in node.get("shards") or []:
+            queued += int(shard.get("vectorQueueLength") or 0)
+            if (shard.get("vectorIndexingStatus") or "READY").upper() == "INDEXING":
+                indexing += 1
+    return queued, indexing
+
+def wait_indexing_drained(url: str, max_wait: int = WAIT_MAX_SEC, poll: float = 2.0):
+    """With ASYNC_INDEXING the import returns before HNSW is built; block until every queue is empty."""
+    start = time.time()
+    print("⏳ Waiting for the async vector indexing queue to drain")
+    while True:
+        try:
+            queued, indexing = vector_queue(url)
+        except Exception as e:
+            print(f"   (nodes endpoint not available: {e})")
+            return
+        if queued == 0 and indexing == 0:
+            print(f"✅ Vector indexing done after {time.time() - start:.1f}s")
+            return
+        print(f"   queued={queued} shards_indexing={indexing}")
+        if time.time() - start > max_wait:
+            print("❌ Timed out waiting for vector indexing.", file=sys.stderr)
+            sys.exit(1)
+        time.sleep(poll)
+
+class Timings:
+    """Wall time per pipeline step, appended to IMPORT_TIMINGS so standard vs bulk runs can be compared."""
+    def __init__(self, mode: str):
+        self.mode, self.steps, self._t = mode, {}, None
+
+    def step(self, name: str):
+        self._close()
+        self._t = (name, time.perf_counter())
+
+    def _close(self):
+        if self._t:
+            name, t0 = self._t
+            self.steps[name] = round(time.perf_counter() - t0, 2)
+            self._t = None
+
+    def write(self, path: Path):
+        self._close()
+        runs = []
+        if path.exists():
+            try:
+                runs = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                runs = []
+        run = {"mode": self.mode, "at": time.strftime("%Y-%m-%dT%H:%M:%S"), "steps": self.steps,
+               "import_sec": round(sum(v for k, v in self.steps.items() if k in ("csv", "vectors", "references", "indexing", "restore")), 2)}
+        runs.append(run)
+        try:
+            path.write_text(json.dumps(runs, indent=2), encoding="utf-8")
+        except OSError as e:
+            print(f"   (could not write {path}: {e})")
+        print("⏱  " + "  ".join(f"{k}={v}s" for k, v in self.steps.items()) + f"  | import={run['import_sec']}s ({self.mode})")
+
+def sanity_tenant(args) -> str:
+    """On a multi-tenant schema queries need a tenant: the first queryable one of Window, else ""."""
+    try:
+        from aliases import resolve
+        from tenants import active_tenants
+        from weaviate_nodes import connect_any
+        client = connect_any(args.url, args.grpc_port)
+    except Exception as e:  # no client library / Weaviate unreachable: the search below reports it
+        print(f"[!] tenant lookup skipped: {e}")
+        return ""
+    try:
+        tenants = active_tenants(client.collections.get(resolve(client, "Window", ttl=0)))
+        return tenants[0] if tenants else ""
+    except Exception as e:
+        print(f"[!] tenant lookup failed: {e}")
+        return ""
+    finally:
+        client.close()
+
+def sanity_search(searcher: Path, args):
+    tenant = sanity_tenant(args)
+    sh([
+        "python", str(searcher),
+        "--url", args.url, "--grpc-port", str(args.grpc_port),
+        "--collection","Window","--mode","hybrid","--query","mettā","--k","5","--alpha","0.5",
+        *(["--tenant", tenant] if tenant else []),
+        "--no-cache"  # not logged as a user query, always hits the new index
+    ], check=False)
+
+def prewarm_results(args):
+    """New index stamp, then replay the most frequent logged queries into the result cache (result_cache.py)."""
+    conn = ["--url", args.url, "--grpc-port", str(args.grpc_port)]
+    sh(["python", str(APP_DIR / "aliases.py"), "bump", *conn], check=False)
+    service = os.getenv("SEARCH_SERVICE_URL", "")
+    if PREWARM_TOP <= 0 or not (service or os.getenv("RESULT_CACHE_PATH")):
+        return
+    print(f"🔥 Prewarm result cache (top {PREWARM_TOP} queries)")
+    sh(["python", str(APP_DIR / "result_cache.py"), "prewarm", "--top", str(PREWARM_TOP), *conn,
+        *(["--service", service] if service else [])], check=False)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--url", default=WEAVIATE_URL)
     ap.add_argument("--grpc-port", type=int, default=WEAVIATE_GRPC)
+    ap.add_argument("--report", default=INGEST_REPORT, help="Write an ingestion report (JSON) to this path")
+    ap.add_argument("--bulk", action="store_true", default=BULK_LOAD,
+                    help="Bulk load: one streaming pass per tier, big batches, then wait for async indexing")
+    ap.add_argument("--snapshots", action=argparse.BooleanOptionalAction, default=SNAPSHOTS,
+                    help="Restore a snapshot matching the artifact manifest instead of loading; save one after a load")
+    ap.add_argument("--force-load", action="store_true", help="Load from CSV/npy even if a matching snapshot exists")
+    ap.add_argument("--blue-green", action="store_true", default=BLUE_GREEN,
+                    help="Build a new collection version while the current one keeps serving, then flip (aliases.py)")
     args = ap.parse_args()
+    report_args = ["--report", args.report] if args.report else []
+    timings = Timings("bulk" if args.bulk else "standard")
+    snap_id = None
+    version = ""
+    if args.blue_green:
+        from aliases import new_version
+        version = new_version()
+    version_args = ["--version", version] if version else []
+    if version and args.snapshots:
+        # snapshots restore fixed collection names; a versioned build is never restored over the live one
+        print("ℹ️  --blue-green: snapshots disabled for this run")
+        args.snapshots = False
 
     print("=== Simple ETL Pipeline ===")
     print(f"WEAVIATE_URL={args.url}  GRPC={args.grpc_port}")
-    print(f"OUTPUTS_DIR={OUTPUTS_DIR}\n")
+    print(f"OUTPUTS_DIR={OUTPUTS_DIR}  MODE={timings.mode}" + (f"  VERSION={version}" if version else "") + "\n")
 
     # 0) outputs must exist (manual provided)
     if not OUTPUTS_DIR.exists() or not any(OUTPUTS_DIR.iterdir()):
         print(f"❌ outputs not found at {OUTPUTS_DIR}. Please put your CSV/NPY files there.", file=sys.stderr)
         sys.exit(1)
 
-    # 1) wait until Weaviate is up
+    # 1) wait until Weaviate is up (every node of a cluster: replicated collections need them all)
     wait_ready(args.url)
+    for node in [u.strip() for u in os.getenv("WEAVIATE_READ_URLS", "").split(",") if u.strip()]:
+        if node.rstrip("/") != args.url.rstrip("/"):
+            wait_ready(node)
 
     # scripts
     setup_script = APP_DIR / "weaviate_multitier_setup_and_search_patched.py"
     inserter     = APP_DIR / "insert_vectors_generic.py"
     searcher     = APP_DIR / "search_weaviate_labse_hybridfix.py"
+    aliases      = APP_DIR / "aliases.py"
+    linker       = APP_DIR / "references.py"
 
-    for p in (setup_script, inserter, searcher):
+    for p in (setup_script, inserter, searcher, aliases, linker):
         if not p.exists():
             print(f"❌ Missing script: {p}", file=sys.stderr); sys.exit(1)
 
+    # 1b) fast start: same outputs + schema profile + loader code → restore instead of re-ingesting
+    if args.snapshots:
+        import snapshot
+        snap_id = snapshot.snapshot_id(snapshot.artifact_manifest(OUTPUTS_DIR))
+        print(f"💾 Snapshot for current artifacts: {snap_id}")
+        if not args.force_load:
+            restored = Timings("restore")
+            restored.step("restore")
+            if snapshot.restore(args.url, snap_id):
+                # the restored tiers are the unversioned names; drop any blue-green mapping of earlier runs
+                sh(["python", str(aliases), "reset", "--url", args.url, "--grpc-port", str(args.grpc_port)],
+                   check=False)
+                print("🔎 Sanity search")
+                restored.step("sanity")
+                sanity_search(searcher, args)
+                restored.step("prewarm")
+                prewarm_results(args)
+                restored.write(IMPORT_TIMINGS)
+                print("✅ Done (restored from snapshot).")
+                return
+
+    # tiers whose vectors are present get properties + vectors in one pass (vector inserter)
+    vector_tiers = [t for t in VECTOR_FILES
+                    if all((OUTPUTS_DIR / f).exists() for f in (t[1], t[4], t[5]))]
+    batch_args = ["--batch-size", str(BULK_BATCH), "--concurrency", str(BULK_CONC)] if args.bulk else []
+
     # 2) schema
     print("🧱 Step 1/4: Schema setup")
-    sh(["python", str(setup_script), "--url", args.url, "--grpc-port", str(args.grpc_port), "--setup"])
+    timings.step("schema")
+    sh(["python", str(setup_script), "--url", args.url, "--grpc-port", str(args.grpc_port), "--setup", *version_args])
 
-    # 3) CSV/BM25 insert
+    # 3) CSV/BM25 insert (bulk: only tiers without vectors, the rest is streamed once in step 3,
+    #    rows without an embedding included)
     print("📚 Step 2/4: Insert CSV (BM25)")
-    sh([
-        "python", str(setup_script),
-        "--url", args.url, "--grpc-port", str(args.grpc_port),
-        "--outdir", str(OUTPUTS_DIR),
-        "--insert"
-    ])
+    timings.step("csv")
+    only = [c for c in ("Window", "Sentence", "Subchunk", "Chunk")
+            if not (args.bulk and c in {t[0] for t in vector_tiers})]
+    if only:
+        sh([
+            "python", str(setup_script),
+            "--url", args.url, "--grpc-port", str(args.grpc_port),
+            "--outdir", str(OUTPUTS_DIR),
+            "--insert", "--collections", ",".join(only), *batch_args, *report_args, *version_args
+        ])
 
     # 4) vectors (present-only)
     print("🧠 Step 3/4: Insert LaBSE vectors (present-only)")
+    timings.step("vectors")
     for coll, csv, idcol, txtcol, ids, npy in VECTOR_FILES:
         csvp, idsp, npyp = OUTPUTS_DIR/csv, OUTPUTS_DIR/ids, OUTPUTS_DIR/npy
         if csvp.exists() and idsp.exists() and npyp.exists():
@@ -101,22 +270,59 @@ def main():
             sh([
                 "python", str(inserter),
                 "--url", args.url, "--grpc-port", str(args.grpc_port),
-                "--collection", coll,
+                "--collection", f"{coll}_{version}" if version else coll,
                 "--csv", str(csvp),
                 "--id-col", idcol, "--text-col", txtcol,
-                "--ids", str(idsp), "--npy", str(npyp)
+                "--ids", str(idsp), "--npy", str(npyp),
+                *batch_args, *report_args, *(["--insert-orphans"] if args.bulk else [])
             ])
         else:
             print(f"   - {coll}: skip (missing {csv} or {ids} or {npy})")
 
-    # 5) quick sanity search (non-blocking)
-    print("🔎 Step 4/4: Sanity search")
+    # cross-references last: the vector insert above replaces whole objects (references included)
+    print("🔗 Step 3b/4: Link cross-references between tiers")
+    timings.step("references")
     sh([
-        "python", str(searcher),
+        "python", str(linker),
         "--url", args.url, "--grpc-port", str(args.grpc_port),
-        "--collection","Window","--mode","hybrid","--query","mettā","--k","5","--alpha","0.5"
-    ], check=False)
+        "--outdir", str(OUTPUTS_DIR), *report_args, *version_args
+    ])
+
+    # with ASYNC_INDEXING the HNSW graphs are still being built; search only once they are done
+    timings.step("indexing")
+    wait_indexing_drained(args.url)
+
+    # 4b) blue-green: switch readers to the new version only if it passes the sanity query
+    if version:
+        print(f"🔀 Flip aliases → {version}")
+        timings.step("flip")
+        alias_args = ["--url", args.url, "--grpc-port", str(args.grpc_port)]
+        if sh(["python", str(aliases), "flip", "--version", version, *alias_args], check=False).returncode != 0:
+            print(f"❌ {version} not promoted; the previous version is still serving.", file=sys.stderr)
+            timings.write(IMPORT_TIMINGS)
+            sys.exit(1)
+        # keep the serving + rollback versions and one older build
+        sh(["python", str(aliases), "gc", "--keep", "1", *alias_args], check=False)
+    else:
+        # an in-place load serves the unversioned names; drop any blue-green mapping left from earlier runs
+        sh(["python", str(aliases), "reset", "--url", args.url, "--grpc-port", str(args.grpc_port)], check=False)
+
+    # 5) quick sanity search (non-blocking)
+    print("🔎 Step 4/4: Sanity search")
+    timings.step("sanity")
+    sanity_search(searcher, args)
+
+    # 5b) cached search results of the old index are void now; refill the popular ones
+    timings.step("prewarm")
+    prewarm_results(args)
+
+    # 6) keep this load as a snapshot for the next cold start
+    if snap_id:
+        print("💾 Saving snapshot")
+        timings.step("snapshot")
+        snapshot.save(args.url, snap_id)
 
+    timings.write(IMPORT_TIMINGS)
     print("✅ Done.")
 
 if __name__ == "__main__":
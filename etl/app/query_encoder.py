@@ -0,0 +1,145 @@
+# query_encoder.py
+# Micro-batching query encoder: concurrent vector / hybrid searches hand their query text to one worker
+# thread, which waits up to --batch-window-ms for more requests (or until --batch-max are queued) and
+# encodes them in a single model.encode() call instead of one batch-size-1 forward pass each.
+# Used by search_service.py and async_ingest_search.py search; metrics: batch sizes and queue wait.
+#
+# example:
+#   python etl/app/query_encoder.py --threads 16 --queries 256 --batch-window-ms 5
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))
+BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "32"))
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class MicroBatchEncoder:
+    """
+    encode(text) blocks the caller until its vector is ready; calls from many threads are batched.
+    window_ms=0 never waits (only requests already queued share a batch); max_batch=1 is the old one-by-one path.
+    With a `cache` (embedding_cache.EmbeddingCache) cached queries are answered without queueing.
+    """
+
+    def __init__(self, model_name: str, window_ms: float = BATCH_WINDOW_MS, max_batch: int = BATCH_MAX,
+                 window: int = 1000, cache=None):
+        self.model_name = model_name
+        self.cache = cache
+        self.window_ms = window_ms
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes: Deque[int] = deque(maxlen=window)
+        self._waits_ms: Deque[float] = deque(maxlen=window)
+        self._encode_ms: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self._worker = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+        self._worker.start()
+
+    def _model(self):
+        from search_weaviate_labse_hybridfix import _load_model
+        return _load_model(self.model_name)
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        if self.cache is not None:
+            vec = self.cache.get(self.model_name, text)
+            if vec is not None:
+                return vec
+        fut: Future = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        vec = fut.result(timeout=timeout)
+        if self.cache is not None:
+            self.cache.put(self.model_name, text, vec)
+        return vec
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch:
+            left = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=left) if left > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [t for t, _, _ in batch]
+            t0 = time.perf_counter()
+            try:
+                vecs = self._model().encode(texts, batch_size=len(texts), normalize_embeddings=False,
+                                            convert_to_numpy=True).astype(np.float32)
+            except BaseException as e:  # hand the failure (e.g. missing sentence-transformers) to every caller
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            done = time.perf_counter()
+            with self._lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self._batch_sizes.append(len(batch))
+                self._encode_ms.append((done - t0) * 1000)
+                self._waits_ms.extend((t0 - queued) * 1000 for _, _, queued in batch)
+            for (_, fut, _), vec in zip(batch, vecs):
+                fut.set_result(vec)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus batch size / queue wait / encode time over the last `window` batches."""
+        with self._lock:
+            sizes, waits, enc = list(self._batch_sizes), list(self._waits_ms), list(self._encode_ms)
+            requests, batches = self.requests, self.batches
+        return {
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "requests": requests,
+            "batches": batches,
+            "batch_size_mean": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            "batch_size_max": max(sizes) if sizes else 0,
+            "queue_wait_ms_p50": round(_pct(waits, 0.50), 2),
+            "queue_wait_ms_p95": round(_pct(waits, 0.95), 2),
+            "encode_ms_p50": round(_pct(enc, 0.50), 2),
+            "encode_ms_p95": round(_pct(enc, 0.95), 2),
+        }
+
+
+def main():
+    from search_weaviate_labse_hybridfix import DEFAULT_MODEL
+
+    ap = argparse.ArgumentParser(description="Benchmark concurrent query encoding with micro-batching.")
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--threads", type=int, default=16, help="concurrent callers")
+    ap.add_argument("--queries", type=int, default=256)
+    ap.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS)
+    ap.add_argument("--batch-max", type=int, default=BATCH_MAX)
+    args = ap.parse_args()
+
+    texts = [f"mettā {i}" for i in range(args.queries)]
+    for window, max_batch in ((0.0, 1), (args.batch_window_ms, args.batch_max)):
+        enc = MicroBatchEncoder(args.model, window_ms=window, max_batch=max_batch)
+        enc.encode("warm-up")
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(enc.encode, texts))
+        elapsed = time.perf_counter() - t0
+        print(f"[report] window={window:g}ms max_batch={max_batch}: {args.queries / elapsed:.1f} queries/s  {enc.stats()}")
+
+
+if __name__ == "__main__":
+    main()
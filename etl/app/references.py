@@ -0,0 +1,169 @@
+# references.py
+# Link the tiers with real Weaviate cross-references (schema profile `references:`), e.g.
+#   Window.inChunk → Chunk, Window.sentences → Sentence, Sentence.inSubchunk → Subchunk, Subchunk.inChunk → Chunk
+# Target uuids are computed like the inserters do (uuid5("<Tier>:<id>")), so no lookups are needed and
+# references are added in bulk with reference_add_many. Run this after the last insert: batch import
+# replaces whole objects, references included.
+#
+# example:
+#   python etl/app/references.py --url http://localhost:8081 --outdir data/outputs
+import argparse
+import csv
+import os
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from weaviate.classes.data import DataReference
+
+from aliases import bump_index_stamp, versioned
+from ingest_report import CollectionStats, IngestReport
+from schema_profiles import load_profile, references
+from tenants import TenantRouter, with_tenant
+from weaviate_multitier_setup_and_search_patched import ID_FIELDS, csv_plan
+
+
+def target_uuid(tier: str, the_id: str) -> uuid.UUID:
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{tier}:{the_id}")
+
+
+def _int(x) -> Optional[int]:
+    try:
+        return int(float(x))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rows(csv_path: str) -> Iterator[Dict[str, str]]:
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+class SpanIndex:
+    """Per chunk_id, the target rows sorted by token_start; finds the rows inside a token span."""
+
+    def __init__(self, csv_path: str, id_col: str):
+        by_chunk: Dict[str, List[Tuple[int, int, str]]] = defaultdict(list)
+        for row in _rows(csv_path):
+            s, e = _int(row.get("token_start")), _int(row.get("token_end"))
+            if s is not None and e is not None and row.get(id_col):
+                by_chunk[row.get("chunk_id", "")].append((s, e, row[id_col]))
+        self._idx = {}
+        for chunk_id, items in by_chunk.items():
+            items.sort()
+            self._idx[chunk_id] = ([i[0] for i in items], [i[1] for i in items], [i[2] for i in items])
+
+    def inside(self, chunk_id: str, start: Optional[int], end: Optional[int]) -> List[str]:
+        if chunk_id not in self._idx or start is None or end is None:
+            return []
+        starts, ends, ids = self._idx[chunk_id]
+        out = []
+        for i in range(bisect_left(starts, start), len(starts)):
+            if starts[i] > end:
+                break
+            if ends[i] <= end:
+                out.append(ids[i])
+        return out
+
+
+def iter_references(tier: str, csv_path: str, specs: List[Dict[str, Any]], paths: Dict[str, Optional[str]]
+                    ) -> Iterator[Tuple[Dict[str, str], DataReference]]:
+    """(source row, DataReference) for every reference of every row of `tier`'s CSV."""
+    spans = {s["name"]: SpanIndex(paths[s["target"]], ID_FIELDS[s["target"]])
+             for s in specs if s.get("span") and paths.get(s["target"])}
+    id_col = ID_FIELDS[tier]
+    for row in _rows(csv_path):
+        src = row.get(id_col)
+        if not src:
+            continue
+        from_uuid = target_uuid(tier, src)
+        for s in specs:
+            if s.get("span"):
+                if s["name"] not in spans:
+                    continue
+                ids = spans[s["name"]].inside(row.get("chunk_id", ""), _int(row.get("token_start")),
+                                              _int(row.get("token_end")))
+            else:
+                ids = [row.get(s["via"])] if row.get(s["via"]) else []
+            if ids:
+                yield row, DataReference(from_property=s["name"], from_uuid=from_uuid,
+                                         to_uuid=[target_uuid(s["target"], t) for t in ids])
+
+
+def link_references(client, outdir: str, profile=None, version: str = "", tenant: str = "",
+                    batch_size: int = 1000, report: Optional[IngestReport] = None, only=None):
+    """Add every profile reference of every tier in bulk; per-tier timings go to `report` as "<tier>/references"."""
+    if not isinstance(profile, dict):
+        profile = load_profile(profile)
+    paths = dict(csv_plan(outdir))
+    for tier in profile["collections"]:
+        specs = references(profile, tier)
+        if not specs or (only is not None and tier not in only):
+            continue
+        if not paths.get(tier):
+            print(f"[skip] {tier}: no CSV to link references from")
+            continue
+        coll = client.collections.get(versioned(tier, version))
+        router = TenantRouter.for_collection(coll, only=tenant)
+        stats = report.stats(tier, "references") if report is not None else CollectionStats(tier, "references")
+        print(f"[i] {tier}: linking {', '.join(s['name'] + '→' + s['target'] for s in specs)}")
+
+        def flush(batch: List[DataReference], t: Optional[str]):
+            t0 = time.perf_counter()
+            res = with_tenant(coll, t).data.reference_add_many(batch)
+            errors = res.errors or {}
+            stats.record_batch(len(batch) - len(errors), time.perf_counter() - t0)
+            for i, e in list(errors.items()):
+                stats.record_failure(batch[i].from_uuid, e.message, None)
+
+        stats.start()
+        pending: Dict[Optional[str], List[DataReference]] = defaultdict(list)
+        for row, ref in iter_references(tier, paths[tier], specs, paths):
+            t = router.tenant(row) if (router.multi_tenant or router.only) else None
+            if router.only and t != router.only:
+                continue
+            t = t if router.multi_tenant else None
+            pending[t].append(ref)
+            if len(pending[t]) >= batch_size:
+                flush(pending.pop(t), t)
+        for t, batch in pending.items():
+            flush(batch, t)
+        stats.finish()
+        for f in stats.failures[:20]:
+            print(f"    [-] reference from uuid={f['uuid']} failed: {f['error']}")
+        stats.print_summary()
+
+
+def main():
+    from weaviate_nodes import connect_any
+
+    ap = argparse.ArgumentParser(description="Link tiers with cross-references from the schema profile.")
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_URL", "http://localhost:8081"))
+    ap.add_argument("--grpc-port", default=os.getenv("WEAVIATE_GRPC_PORT", "50052"))
+    ap.add_argument("--outdir", default=os.getenv("OUTPUTS_DIR", "data/outputs"))
+    ap.add_argument("--schema-profile", default=None)
+    ap.add_argument("--collections", default="", help="Comma-separated source tiers (default: all with references)")
+    ap.add_argument("--version", default="", help="Blue-green: link the <Tier>_<version> collections")
+    ap.add_argument("--tenant", default="", help="Multi-tenant schema: link only this book")
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--report", default="", help="Write an ingestion report (JSON) to this path")
+    ap.add_argument("--report-run", default="default")
+    args = ap.parse_args()
+
+    report = IngestReport({"url": args.url, "batch_size": args.batch_size}) if args.report else None
+    client = connect_any(args.url, args.grpc_port, shuffle=False)
+    try:
+        link_references(client, args.outdir, profile=args.schema_profile, version=args.version,
+                        tenant=args.tenant, batch_size=args.batch_size, report=report,
+                        only=set(c for c in args.collections.split(",") if c) or None)
+        bump_index_stamp(client, "references")  # --follow-refs results change with the links
+    finally:
+        client.close()
+    if report is not None:
+        report.write(args.report, run=args.report_run)
+
+
+if __name__ == "__main__":
+    main()
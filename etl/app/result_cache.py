@@ -0,0 +1,250 @@
+# result_cache.py
+# Search result cache: identical requests (same collection, mode, k, alpha, query, filters, ...) are answered
+# without touching Weaviate or the model. Entries are keyed by the normalized request plus the index stamp
+# (aliases.py) that every load / flip bumps, so results of an older index are never served.
+# Two tiers as in embedding_cache.py: a bounded in-memory LRU (RESULT_CACHE_SIZE) and an optional SQLite
+# file (RESULT_CACHE_PATH) shared by CLI runs, the search service and `prewarm`. The same file keeps a
+# query log (request → count) so a prewarm after each reindex can replay the most frequent queries.
+#
+# examples:
+#   python etl/app/result_cache.py stats
+#   python etl/app/result_cache.py prewarm --top 200                        # in-process, fills RESULT_CACHE_PATH
+#   python etl/app/result_cache.py prewarm --service http://localhost:8090  # the service replays its own log
+#   python etl/app/result_cache.py clear
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from embedding_cache import normalize_query
+
+CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")
+UNCACHED_PARAMS = ("deadline_ms", "cache")  # request options that don't change the result
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Normalized request (search_params() output) as canonical JSON; also the query log entry."""
+    p = {k: v for k, v in params.items() if k not in UNCACHED_PARAMS}
+    p["query"] = normalize_query(p.get("query") or "")
+    return json.dumps(p, sort_keys=True, ensure_ascii=False)
+
+
+class ResultCache:
+    def __init__(self, capacity: int = CACHE_SIZE, path: Optional[str] = CACHE_PATH):
+        self.capacity = max(0, capacity)
+        self.path = path or ""
+        self._lru: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._log: Counter = Counter()  # query log without a file (per process)
+        self._lock = threading.Lock()
+        self.counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_results ("
+                " key TEXT PRIMARY KEY, stamp TEXT NOT NULL, result TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_log ("
+                " request TEXT PRIMARY KEY, n INTEGER NOT NULL, last_seen REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.capacity or self._db is not None)
+
+    @staticmethod
+    def key(request: str, stamp: str) -> str:
+        return f"{stamp}\x1f{request}"
+
+    def _remember(self, key: str, result: Dict[str, Any]):
+        if not self.capacity:
+            return
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get(self, request: str, stamp: str) -> Optional[Dict[str, Any]]:
+        key = self.key(request, stamp)
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+                self.counts["memory_hits"] += 1
+                return result
+            if self._db is not None:
+                row = self._db.execute("SELECT result FROM search_results WHERE key = ?", (key,)).fetchone()
+                if row:
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+                    self.counts["disk_hits"] += 1
+                    return result
+            self.counts["misses"] += 1
+            return None
+
+    def put(self, request: str, stamp: str, result: Dict[str, Any]):
+        key = self.key(request, stamp)
+        with self._lock:
+            self._remember(key, result)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_results (key, stamp, result, created) VALUES (?, ?, ?, ?)",
+                    (key, stamp, json.dumps(result, ensure_ascii=False, default=str), time.time()),
+                )
+                self._db.commit()
+
+    def log(self, request: str):
+        with self._lock:
+            if self._db is None:
+                self._log[request] += 1
+                return
+            self._db.execute(
+                "INSERT INTO query_log (request, n, last_seen) VALUES (?, 1, ?) "
+                "ON CONFLICT(request) DO UPDATE SET n = n + 1, last_seen = excluded.last_seen",
+                (request, time.time()),
+            )
+            self._db.commit()
+
+    def top_requests(self, n: int) -> List[Dict[str, Any]]:
+        """The n most frequent logged requests (search params), most frequent first."""
+        with self._lock:
+            if self._db is None:
+                rows = [r for r, _ in self._log.most_common(n)]
+            else:
+                rows = [r for (r,) in self._db.execute(
+                    "SELECT request FROM query_log ORDER BY n DESC, last_seen DESC LIMIT ?", (n,))]
+        return [json.loads(r) for r in rows]
+
+    def prune(self, stamp: str) -> int:
+        """Drop file entries of other (older) index stamps; memory entries simply age out."""
+        with self._lock:
+            if self._db is None:
+                return 0
+            n = self._db.execute("DELETE FROM search_results WHERE stamp != ?", (stamp,)).rowcount
+            self._db.commit()
+            return n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            size = len(self._lru)
+            disk = self._db.execute("SELECT COUNT(*) FROM search_results").fetchone()[0] if self._db else None
+            logged = self._db.execute("SELECT COUNT(*) FROM query_log").fetchone()[0] if self._db else len(self._log)
+        lookups = sum(counts.values())
+        return {
+            **counts,
+            "hit_rate": round((counts["memory_hits"] + counts["disk_hits"]) / lookups, 3) if lookups else 0.0,
+            "memory_entries": size,
+            "memory_capacity": self.capacity,
+            "disk_path": self.path or None,
+            "disk_entries": disk,
+            "logged_requests": logged,
+        }
+
+    def clear(self, log: bool = False):
+        with self._lock:
+            self._lru.clear()
+            if log:
+                self._log.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM search_results")
+                if log:
+                    self._db.execute("DELETE FROM query_log")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def prewarm(search_fn: Callable[[Dict[str, Any]], Dict[str, Any]], cache: ResultCache, top: int = 100) -> Dict[str, Any]:
+    """Replay the `top` most frequent logged requests through `search_fn`, which stores fresh results."""
+    requests = cache.top_requests(top)
+    t0 = time.perf_counter()
+    errors = 0
+    for params in requests:
+        try:
+            search_fn(params)
+        except Exception as e:  # a request that no longer validates / a missing tier; keep warming the rest
+            errors += 1
+            print(f"[!] prewarm {params.get('collection')}/{params.get('mode')} {params.get('query')!r}: {e}")
+    return {"replayed": len(requests), "errors": errors, "took_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+_shared: Optional[ResultCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_result_cache() -> ResultCache:
+    """Process-wide cache configured from RESULT_CACHE_SIZE / RESULT_CACHE_PATH."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResultCache()
+        return _shared
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect / clear / prewarm the search result cache.")
+    ap.add_argument("cmd", choices=["stats", "clear", "prewarm"])
+    ap.add_argument("--path", default=CACHE_PATH or "data/cache/search_results.sqlite")
+    ap.add_argument("--top", type=int, default=100, help="prewarm: replay this many of the most frequent queries")
+    ap.add_argument("--log", action="store_true", help="clear: also forget the query log")
+    ap.add_argument("--service", default=os.getenv("SEARCH_SERVICE_URL", ""),
+                    help="prewarm: ask a running search_service.py to replay its query log instead")
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_READ_URLS") or os.getenv("WEAVIATE_URL", "http://localhost:8081"))
+    ap.add_argument("--grpc-port", default=os.getenv("WEAVIATE_GRPC_PORT", "50052"))
+    args = ap.parse_args()
+
+    if args.cmd == "prewarm" and args.service:
+        import urllib.request
+        req = urllib.request.Request(args.service.rstrip("/") + "/prewarm", method="POST",
+                                     data=json.dumps({"top": args.top}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=600) as r:
+            print(f"[✓] service prewarm: {r.read().decode('utf-8')}")
+        return
+    if not Path(args.path).exists():
+        print(f"[skip] no result cache at {args.path}")
+        return
+    cache = ResultCache(capacity=0, path=args.path)
+    try:
+        if args.cmd == "stats":
+            print(f"[i] {args.path}: {cache.stats()}")
+            for params in cache.top_requests(10):
+                print(f"    {params.get('collection')}/{params.get('mode')} k={params.get('k')} {params.get('query')!r}")
+        elif args.cmd == "clear":
+            cache.clear(log=args.log)
+            print(f"[-] cleared {args.path}" + (" (query log too)" if args.log else ""))
+        else:
+            from aliases import index_stamp
+            from search_weaviate_labse_hybridfix import get_client, search
+
+            client = get_client(args.url, args.grpc_port)
+            try:
+                stamp = index_stamp(client)
+                if stamp is None:
+                    raise SystemExit("ERROR: index stamp unreadable; nothing cached")
+                print(f"[-] dropped {cache.prune(stamp)} results of older index stamps")
+                summary = prewarm(lambda p: search(client, p, result_cache=cache, log_query=False), cache, args.top)
+                print(f"[✓] prewarmed {summary['replayed']} queries for stamp {stamp or '-'} "
+                      f"({summary['errors']} errors, {summary['took_ms'] / 1000:.1f}s)")
+            finally:
+                client.close()
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
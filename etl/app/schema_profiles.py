@@ -0,0 +1,164 @@
+# schema_profiles.py
+# Load schema profiles (YAML or JSON) and turn them into collections.create() arguments:
+# vector index type + HNSW knobs + PQ/BQ compression, BM25 k1/b, per-property tokenization/indexing.
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from weaviate.classes.config import Configure, DataType, Property, Tokenization, VectorDistances
+
+PROFILES_DIR = Path(__file__).resolve().parent / "profiles"
+DEFAULT_PROFILE = os.getenv("SCHEMA_PROFILE") or str(PROFILES_DIR / "schema_default.yaml")
+
+DATA_TYPES = {
+    "text": DataType.TEXT,
+    "int": DataType.INT,
+    "number": DataType.NUMBER,
+    "boolean": DataType.BOOL,
+    "text[]": DataType.TEXT_ARRAY,
+}
+TOKENIZATIONS = {t.value: t for t in Tokenization}
+DISTANCES = {"cosine": VectorDistances.COSINE, "dot": VectorDistances.DOT, "l2-squared": VectorDistances.L2_SQUARED}
+
+
+def _merge(base: Dict[str, Any], over: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursive dict merge for `extends:`; lists (e.g. properties) are replaced, not appended."""
+    out = dict(base)
+    for k, v in over.items():
+        out[k] = _merge(out[k], v) if isinstance(v, dict) and isinstance(out.get(k), dict) else v
+    return out
+
+
+def load_profile(path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read a profile file; .yaml/.yml needs PyYAML, .json works everywhere.
+    `extends: other.yaml` (relative to this file) loads that profile first and merges this one over it.
+    """
+    path = path or DEFAULT_PROFILE
+    with open(path, "r", encoding="utf-8") as f:
+        if str(path).lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ModuleNotFoundError as e:
+                raise SystemExit(
+                    "ERROR: PyYAML not found in this environment (needed for YAML schema profiles).\n"
+                    "Inside Docker, ensure your Dockerfile runs: pip install -r requirements.txt, or use a .json profile."
+                ) from e
+            profile = yaml.safe_load(f) or {}
+        else:
+            profile = json.load(f)
+    parent = profile.pop("extends", None)
+    if parent:
+        base = load_profile(str(Path(path).resolve().parent / parent))
+        base.pop("_path", None)
+        profile = _merge(base, profile)
+    if "collections" not in profile:
+        raise ValueError(f"Schema profile {path} has no 'collections' section")
+    profile["_path"] = str(path)
+    return profile
+
+
+def _quantizer(spec: Optional[Dict[str, Any]]):
+    if not spec:
+        return None
+    spec = dict(spec)
+    kind = spec.pop("type", "").lower()
+    if kind == "pq":
+        return Configure.VectorIndex.Quantizer.pq(**spec)
+    if kind == "bq":
+        return Configure.VectorIndex.Quantizer.bq(**spec)
+    raise ValueError(f"Unknown quantizer type: {kind!r} (expected pq | bq)")
+
+
+def vector_index_config(spec: Optional[Dict[str, Any]]):
+    spec = dict(spec or {})
+    kind = spec.pop("type", "hnsw").lower()
+    qspec = spec.pop("quantizer", None)
+    if kind == "flat" and qspec and str(qspec.get("type", "")).lower() == "pq":
+        raise ValueError("PQ compression needs an hnsw index; use bq with flat")
+    quantizer = _quantizer(qspec)
+    distance = spec.pop("distance", None)
+    if distance is not None:
+        spec["distance_metric"] = DISTANCES[distance]
+    if kind == "flat":
+        return Configure.VectorIndex.flat(quantizer=quantizer, **spec)
+    if kind == "hnsw":
+        return Configure.VectorIndex.hnsw(quantizer=quantizer, **spec)
+    raise ValueError(f"Unknown vector index type: {kind!r} (expected flat | hnsw)")
+
+
+def inverted_index_config(spec: Optional[Dict[str, Any]]):
+    if not spec:
+        return None
+    return Configure.inverted_index(**spec)
+
+
+def build_properties(props: List[Dict[str, Any]], defaults: Dict[str, Any],
+                     facets: Optional[List[str]] = None) -> List[Property]:
+    out = []
+    for p in props:
+        dtype = p.get("type", "text")
+        merged = {**defaults.get(dtype, {}), **p}
+        if merged["name"] in (facets or ()):
+            merged["filterable"] = True  # filters and aggregate group-by need the inverted index
+        kwargs: Dict[str, Any] = {"name": merged["name"], "data_type": DATA_TYPES[dtype]}
+        if "searchable" in merged and dtype in ("text", "text[]"):
+            kwargs["index_searchable"] = bool(merged["searchable"])
+        if "filterable" in merged:
+            kwargs["index_filterable"] = bool(merged["filterable"])
+        if "tokenization" in merged and dtype in ("text", "text[]"):
+            kwargs["tokenization"] = TOKENIZATIONS[merged["tokenization"]]
+        out.append(Property(**kwargs))
+    return out
+
+
+def references(profile: Dict[str, Any], name: str) -> List[Dict[str, Any]]:
+    """Cross-reference specs of a collection: [{name, target, via | span}] (see references.py)."""
+    refs = profile["collections"][name].get("references") or []
+    for r in refs:
+        if r.get("target") not in profile["collections"]:
+            raise ValueError(f"{name}.{r.get('name')}: unknown reference target {r.get('target')!r}")
+        if not (r.get("via") or r.get("span")):
+            raise ValueError(f"{name}.{r.get('name')}: reference needs `via: <id column>` or `span: token`")
+    return refs
+
+
+def facets(profile: Dict[str, Any], name: str) -> List[str]:
+    """Properties searched with --filter-heading / --facet; always built filterable."""
+    spec = profile["collections"][name]
+    names = {p["name"] for p in spec.get("properties", [])}
+    out = list(spec.get("facets") or [])
+    unknown = [f for f in out if f not in names]
+    if unknown:
+        raise ValueError(f"{name}: facets {unknown} are not properties of the collection")
+    return out
+
+
+def collection_kwargs(profile: Dict[str, Any], name: str) -> Dict[str, Any]:
+    """Keyword arguments for client.collections.create(name=..., **kwargs) (vectorizer excluded)."""
+    spec = profile["collections"][name]
+    defaults = profile.get("defaults", {}) or {}
+    kwargs: Dict[str, Any] = {
+        "description": spec.get("description"),
+        "properties": build_properties(spec.get("properties", []), defaults.get("property", {}) or {},
+                                       facets(profile, name)),
+    }
+    vi = spec.get("vector_index", defaults.get("vector_index"))
+    if vi:
+        kwargs["vector_index_config"] = vector_index_config(vi)
+    ii = spec.get("inverted_index", defaults.get("inverted_index"))
+    if ii:
+        kwargs["inverted_index_config"] = inverted_index_config(ii)
+    # multi-node: shards per collection (desired_count) and copies of each shard (factor)
+    sh = spec.get("sharding", defaults.get("sharding"))
+    if sh:
+        kwargs["sharding_config"] = Configure.sharding(**sh)
+    rep = spec.get("replication", defaults.get("replication"))
+    if rep:
+        kwargs["replication_config"] = Configure.replication(**rep)
+    # one tenant (shard) per book, see tenants.py; tenants themselves are created by the inserters
+    mt = spec.get("multi_tenancy", defaults.get("multi_tenancy"))
+    if mt and mt.get("enabled", True):
+        kwargs["multi_tenancy_config"] = Configure.multi_tenancy(**mt)
+    return kwargs
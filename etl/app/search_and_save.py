@@ -1,18 +1,19 @@
 # search_weaviate_labse_hybridfix.py
 import argparse
+import json
 import os
 import csv
-from typing import List
-import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from weaviate import WeaviateClient
-from weaviate.connect import ConnectionParams
-
-DEFAULT_MODEL = os.getenv("MODEL_NAME", "sentence-transformers/LaBSE")
-LABSE_DEVICE = os.getenv("LABSE_DEVICE")  # 'cpu' | 'cuda' | 'mps' | None
-
-_model = None  # lazy singleton
+# the search itself (in-process or via search_service.py) lives in the shared core
+from search_weaviate_labse_hybridfix import (
+    BACKENDS, FACET_PROPS, context_text, encode_queries, get_client, pick_return_props, print_result, reference_ids,
+    remote_search, run_search, search, search_params,
+)
+from weaviate_nodes import CONSISTENCY_LEVELS
 
 
 def parse_args():
@@ -20,19 +21,18 @@ def parse_args():
 
     parser.add_argument(
         "--url",
-        default=os.getenv("WEAVIATE_URL", "http://localhost:8081"),
-        help="Weaviate REST URL (default: from WEAVIATE_URL env or localhost:8081)"
+        default=os.getenv("WEAVIATE_READ_URLS") or os.getenv("WEAVIATE_URL", "http://localhost:8081"),
+        help="Weaviate REST URL, or comma-separated node URLs of a cluster "
+             "(default: from WEAVIATE_READ_URLS / WEAVIATE_URL env or localhost:8081)"
     )
     parser.add_argument(
         "--grpc-port",
-        type=int,
-        default=int(os.getenv("WEAVIATE_GRPC_PORT", 50052)),
-        help="Weaviate gRPC port (default: from WEAVIATE_GRPC_PORT env or 50052)"
+        default=os.getenv("WEAVIATE_GRPC_PORT", "50052"),
+        help="Weaviate gRPC port, or one per --url node (default: from WEAVIATE_GRPC_PORT env or 50052)"
     )
     parser.add_argument(
         "--collection",
-        required=True,
-        help="Name of the collection / class"
+        help="Name of the collection / class (with --queries-file: default for lines without one)"
     )
     parser.add_argument(
         "--mode",
@@ -42,9 +42,30 @@ def parse_args():
     )
     parser.add_argument(
         "--query",
-        required=True,
         help="Search query text"
     )
+    parser.add_argument(
+        "--queries-file",
+        default="",
+        help="Batch mode: JSONL, one request per line ({\"query\": ..., \"collection\": ..., \"mode\": ..., "
+             "\"k\": ..., \"alpha\": ...}; missing keys come from the other options)"
+    )
+    parser.add_argument(
+        "--query-field",
+        default="query",
+        help="JSON key holding the query text in --queries-file lines (default: query)"
+    )
+    parser.add_argument(
+        "--out",
+        default="",
+        help="Batch mode output, .jsonl or .csv (default: /app/weaviate-result/weaviate_batch_<timestamp>.jsonl)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Batch mode: searches in flight at once on the one client / service (default: 8)"
+    )
     parser.add_argument(
         "--k",
         type=int,
@@ -57,73 +78,118 @@ def parse_args():
         default=0.5, 
         help="hybrid alpha (0..1) higher favors vector"
     )
+    parser.add_argument(
+        "--consistency",
+        choices=CONSISTENCY_LEVELS,
+        default=os.getenv("WEAVIATE_CONSISTENCY") or None,
+        help="Read consistency on replicated collections (ONE = any single replica answers)"
+    )
+    parser.add_argument(
+        "--tenant",
+        default=os.getenv("WEAVIATE_TENANT", ""),
+        help="Book / tenant to search (required on a multi-tenant schema, e.g. MAIN)"
+    )
+    parser.add_argument(
+        "--follow-refs",
+        action="store_true",
+        help="Return cross-referenced sentences / subchunk / chunk with each hit (same query)"
+    )
+    parser.add_argument(
+        "--context",
+        type=int,
+        default=0,
+        help="Add N neighbor sentences before/after each Sentence / Window hit (one extra query in total)"
+    )
+    parser.add_argument(
+        "--filter-heading",
+        action="append",
+        default=[],
+        help="Window / Sentence: only hits under this heading, 'h3=1. Mūlapariyāyavaggo' or a bare value "
+             "for any level; * and ? are wildcards (repeatable, ANDed)"
+    )
+    parser.add_argument(
+        "--filter-path-prefix",
+        default="",
+        help="Window / Sentence: only hits whose heading path starts with this, e.g. 'Majjhimanikāye > Mūlapaṇṇāsa'"
+    )
+    parser.add_argument(
+        "--facet",
+        choices=FACET_PROPS,
+        default=None,
+        help="Window / Sentence: also print hit counts per value of this heading property (one aggregate call)"
+    )
+    parser.add_argument(
+        "--facet-pool",
+        type=int,
+        default=1000,
+        help="Facet counts are taken over the best N matches (default: 1000)"
+    )
+    parser.add_argument(
+        "--fold",
+        action=argparse.BooleanOptionalAction,
+        default=os.getenv("SEARCH_FOLD", "1") != "0",
+        help="BM25 on the diacritic-folded text field with a folded query (mettā = metta = mettaa); "
+             "--no-fold searches the original text (collections loaded before the folded fields existed)"
+    )
+    parser.add_argument(
+        "--hydrate",
+        choices=["snippet", "full", "none"],
+        default="snippet",
+        help="Chunk / Subchunk: query ids + spans first, then fetch a KWIC snippet (default) or the full text "
+             "for the shown hits only"
+    )
+    parser.add_argument(
+        "--show",
+        type=int,
+        default=0,
+        help="Hydrate / print / export only the top N hits (default: all k)"
+    )
     parser.add_argument(
     "--model",
     type=str,
     default="sentence-transformers/LaBSE",
     help="Embedding model to use for vector search"
     )
+    parser.add_argument(
+        "--deadline-ms",
+        type=int,
+        default=int(os.getenv("SEARCH_DEADLINE_MS", "0")),
+        help="Latency budget: if query encoding or the vector / hybrid query isn't done in time, answer with BM25 "
+             "and mark the result degraded (default: from SEARCH_DEADLINE_MS env; 0 = wait)"
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=os.getenv("SEARCH_RESULT_CACHE", "1") != "0",
+        help="Answer repeated requests from the result cache while the index is unchanged "
+             "(RESULT_CACHE_PATH shares it between runs); --no-cache always asks Weaviate"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=os.getenv("SEARCH_BACKEND", "weaviate"),
+        help="local: search the data/outputs artifacts in-process (OUTPUTS_DIR; local_search.py / local_bm25.py), "
+             "no Weaviate needed"
+    )
+    parser.add_argument(
+        "--service",
+        default=os.getenv("SEARCH_SERVICE_URL", ""),
+        help="Send the query to a running search_service.py (model + client already warm), "
+             "e.g. http://localhost:8090 (default: from SEARCH_SERVICE_URL env; empty = search in-process)"
+    )
 
-    return parser.parse_args()
-
-
-def get_client(url: str, grpc_port: int) -> WeaviateClient:
-    cp = ConnectionParams.from_url(url, grpc_port=grpc_port)
-    client = WeaviateClient(cp)
-    client.connect()
-    return client
+    args = parser.parse_args()
+    if args.queries_file:
+        return args
+    try:
+        search_params(args)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
 
 
-def _load_model(model_name: str):
-    global _model
-    if _model is not None:
-        return _model
-    try:
-        from sentence_transformers import SentenceTransformer
-        try:
-            import torch
-            if LABSE_DEVICE:
-                device = LABSE_DEVICE
-            else:
-                device = "cuda" if torch.cuda.is_available() else (
-                    "mps" if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available() else "cpu"
-                )
-        except Exception:
-            device = LABSE_DEVICE or "cpu"
-        _model = SentenceTransformer(model_name, device=device)
-        return _model
-    except ModuleNotFoundError as e:
-        raise SystemExit(
-            "ERROR: sentence-transformers not found in this environment.\n"
-            "Inside Docker, ensure your Dockerfile runs: pip install -r requirements.txt"
-        ) from e
-
-
-def encode_query_labse(text: str, model_name: str) -> np.ndarray:
-    model = _load_model(model_name)
-    vec = model.encode([text], normalize_embeddings=False, convert_to_numpy=True)
-    return vec.astype(np.float32)[0]
-
-
-def pick_return_props(coll_name: str) -> List[str]:
-    if coll_name == "Window":
-        return ["window_id", "text", "chunk_id", "path", "h1", "h2", "h3", "h4", "h5", "h6"]
-    if coll_name == "Sentence":
-        return ["sentence_id", "sentence_text", "chunk_id", "path", "h1", "h2", "h3", "h4", "h5", "h6"]
-    if coll_name == "Subchunk":
-        return ["subchunk_id", "subchunk_text", "chunk_id"]
-    if coll_name == "Chunk":
-        return ["chunk_id", "chunk_text"]
-    return []
-
-
-def short_text(s: str, n: int = 180) -> str:
-    s = s or ""
-    s = " ".join(s.split())
-    return s[:n] + ("..." if len(s) > n else "")
-
-
-def save_to_csv(results, collection_name, query, mode, alpha, output_dir="/app/weaviate-result"):
+def save_to_csv(hits, collection_name, query, mode, alpha, output_dir="/app/weaviate-result", degraded=""):
+    # mode: the mode that produced the hits (bm25 after a deadline fallback); degraded: why, else ""
     # Create directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
@@ -132,7 +198,7 @@ def save_to_csv(results, collection_name, query, mode, alpha, output_dir="/app/w
     filename = f"{output_dir}/weaviate_results_{timestamp}.csv"
     
     # Define CSV fieldnames
-    fieldnames = ["rank", "collection", "query", "mode", "alpha", "score"]
+    fieldnames = ["rank", "collection", "query", "mode", "degraded", "alpha", "score"]
     
     # Add collection-specific fields
     if collection_name == "Window":
@@ -143,15 +209,25 @@ def save_to_csv(results, collection_name, query, mode, alpha, output_dir="/app/w
         fieldnames.extend(["subchunk_id", "subchunk_text", "chunk_id"])
     elif collection_name == "Chunk":
         fieldnames.extend(["chunk_id", "chunk_text"])
+
+    # followed cross-references (--follow-refs): one "ref_<name>" column of target ids each
+    ref_names = sorted({n for h in hits for n in h.get("references") or {}})
+    fieldnames.extend(f"ref_{n}" for n in ref_names)
+    # Chunk / Subchunk snippet hydration: KWIC text and the sentence it was cut from
+    if any("snippet" in h["properties"] for h in hits):
+        fieldnames.extend(["snippet", "snippet_sentence_id"])
+    # --context N: neighbor sentences (fetch_context) around each hit
+    if any("context" in h for h in hits):
+        fieldnames.extend(["context_before", "context_after"])
     
     # Write to CSV
     with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
         
-        for i, obj in enumerate(results.objects or [], start=1):
+        for i, hit in enumerate(hits, start=1):
             # Handle score safely
-            score = getattr(obj.metadata, 'score', None) if hasattr(obj, 'metadata') else None
+            score = hit.get("score")
             score_str = f"{score:.4f}" if score is not None else "N/A"
             
             row = {
@@ -159,15 +235,21 @@ def save_to_csv(results, collection_name, query, mode, alpha, output_dir="/app/w
                 "collection": collection_name,
                 "query": query,
                 "mode": mode,
+                "degraded": degraded,
                 "alpha": alpha if mode == "hybrid" else "N/A",
                 "score": score_str
             }
             
             # Add properties
-            properties = obj.properties or {}
+            properties = hit.get("properties") or {}
             for key in properties:
                 if key in fieldnames:
                     row[key] = str(properties.get(key, ""))
+            for name, targets in (hit.get("references") or {}).items():
+                row[f"ref_{name}"] = reference_ids(targets)
+            if "context" in hit:
+                row["context_before"] = context_text(hit["context"]["before"])
+                row["context_after"] = context_text(hit["context"]["after"])
             
             writer.writerow(row)
     
@@ -175,75 +257,166 @@ def save_to_csv(results, collection_name, query, mode, alpha, output_dir="/app/w
     return filename
 
 
-def main():
-    args = parse_args()
-    print(f"🔗 Connecting to Weaviate at {args.url} (gRPC {args.grpc_port})")
-    
-    client = get_client(args.url, args.grpc_port)
-    try:
-        coll = client.collections.get(args.collection)
-        props = pick_return_props(args.collection)
-
-        if args.mode == "vector":
-            qvec = encode_query_labse(args.query, args.model)
-            res = coll.query.near_vector(
-                near_vector=qvec,
-                limit=args.k,
-                return_properties=props,
-            )
-        elif args.mode == "hybrid":
-            qvec = encode_query_labse(args.query, args.model)
-            res = coll.query.hybrid(
-                query=args.query,
-                vector=qvec,
-                alpha=args.alpha,
-                limit=args.k,
-                return_properties=props,
-            )
-        else:  # bm25
-            res = coll.query.bm25(
-                query=args.query,
-                limit=args.k,
-                return_properties=props,
-            )
-
-        print(f"[results] {len(res.objects)} objects")
-        
-        # Save results to CSV
-        csv_file = save_to_csv(res, args.collection, args.query, args.mode, args.alpha)
-        
-        # Print results to console
-        for i, o in enumerate(res.objects or [], start=1):
-            p = o.properties or {}
-            kind = args.collection.lower()
-            
-            # Handle score safely
-            score = getattr(o.metadata, 'score', None) if hasattr(o, 'metadata') else None
-            score_str = f"{score:.4f}" if score is not None else "N/A"
-            
-            if args.collection == "Window":
-                idx = f"[{kind}] {p.get('window_id','')} | chunk={p.get('chunk_id','')}"
-                text = p.get("text", "")
-                trail = " > ".join(x for x in [p.get("h1"), p.get("h2"), p.get("h3"), p.get("h4"), p.get("h5"), p.get("h6")] if x)
-                suffix = f" | Headings: {trail}" if trail else ""
-            elif args.collection == "Sentence":
-                idx = f"[{kind}] {p.get('sentence_id','')} | chunk={p.get('chunk_id','')}"
-                text = p.get("sentence_text", "")
-                suffix = ""
-            elif args.collection == "Subchunk":
-                idx = f"[{kind}] {p.get('subchunk_id','')} | chunk={p.get('chunk_id','')}"
-                text = p.get("subchunk_text", "")
-                suffix = ""
+def read_queries(path: str, defaults: Dict[str, Any], query_field: str = "query") -> List[Tuple[List[int], Dict]]:
+    """
+    JSONL requests → [(line numbers, search params)]. Lines missing a key take it from `defaults`;
+    identical requests (same params after whitespace-normalizing the query) are run once.
+    """
+    unique: Dict[str, Tuple[List[int], Dict]] = {}
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+                rec["query"] = " ".join(str(rec.get(query_field) or "").split())
+                params = search_params({**defaults, **{k: v for k, v in rec.items() if v is not None}})
+            except (ValueError, AttributeError) as e:
+                print(f"[skip] {path}:{n}: {e}")
+                continue
+            key = json.dumps(params, sort_keys=True, ensure_ascii=False)
+            unique.setdefault(key, ([], params))[0].append(n)
+    return list(unique.values())
+
+
+class BatchWriter:
+    """Streams one record per request (JSONL) or one row per hit (CSV) as results arrive."""
+
+    CSV_FIELDS = ["query_no", "lines", "query", "collection", "mode", "requested_mode", "degraded", "alpha",
+                  "took_ms", "error",
+                  "rank", "score", "id", "chunk_id", "path", "text", "snippet"]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.csv = path.lower().endswith(".csv")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.f = open(path, "w", newline="" if self.csv else None, encoding="utf-8")
+        if self.csv:
+            self.writer = csv.DictWriter(self.f, fieldnames=self.CSV_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, query_no: int, lines: List[int], params: Dict, result: Optional[Dict], error: Optional[str],
+              took_ms: float):
+        # the mode that answered: a deadline fallback returns BM25 scores, not hybrid / vector ones
+        mode = result["mode"] if result and not error else params["mode"]
+        degraded = (result.get("degraded_reason") or "degraded") if result and result.get("degraded") else ""
+        if not self.csv:
+            rec = {"query_no": query_no, "lines": lines,
+                   **{k: params[k] for k in ("query", "collection", "k", "alpha")}, "mode": mode,
+                   "took_ms": round(took_ms, 1)}
+            if error:
+                rec["error"] = error
             else:
-                idx = f"[{kind}] {p.get('chunk_id','')}"
-                text = p.get("chunk_text", "")
-                suffix = ""
+                rec["server_took_ms"] = result.get("took_ms")
+                if degraded:
+                    rec["requested_mode"], rec["degraded"] = params["mode"], degraded
+                rec["objects"] = result["objects"]
+                if "facets" in result:
+                    rec["facets"] = result["facets"]
+            self.f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+        else:
+            base = {"query_no": query_no, "lines": " ".join(map(str, lines)), "query": params["query"],
+                    "collection": params["collection"], "mode": mode, "requested_mode": params["mode"],
+                    "degraded": degraded, "alpha": params["alpha"] if mode == "hybrid" else "N/A",
+                    "took_ms": f"{took_ms:.1f}", "error": error or ""}
+            if error or not result["objects"]:
+                self.writer.writerow(base)
+            id_field, text_field = pick_return_props(params["collection"])[:2]
+            for i, hit in enumerate([] if error else result["objects"], start=1):
+                p = hit.get("properties") or {}
+                score = hit.get("score") if hit.get("score") is not None else hit.get("distance")
+                self.writer.writerow({
+                    **base, "rank": i, "score": f"{score:.4f}" if score is not None else "N/A",
+                    "id": p.get(id_field, ""), "chunk_id": p.get("chunk_id", ""), "path": p.get("path", ""),
+                    "text": p.get(text_field, ""), "snippet": p.get("snippet", ""),
+                })
+        self.f.flush()
 
-            print(f"{i:>2}. {idx}{suffix} (score: {score_str})")
-            print(f"    {short_text(text)}")
-            
+    def close(self):
+        self.f.close()
+
+
+def _pct(values: List[float], q: float) -> float:
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))] if s else 0.0
+
+
+def run_batch(args):
+    """--queries-file: dedupe, encode every vector / hybrid query in one batch, search concurrently, stream out."""
+    jobs = read_queries(args.queries_file, vars(args), args.query_field)
+    if not jobs:
+        raise SystemExit(f"ERROR: no valid requests in {args.queries_file}")
+    n_lines = sum(len(lines) for lines, _ in jobs)
+    print(f"[i] {n_lines} requests in {args.queries_file} → {len(jobs)} distinct")
+    out = args.out or f"/app/weaviate-result/weaviate_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+
+    client = None
+    if args.service:
+        print(f"🔗 Using search service at {args.service}")
+
+        def run_one(params):  # the service encodes / micro-batches vectors itself
+            return remote_search(args.service, params)
+    else:
+        vectors: Dict[Tuple[str, str], Any] = {}
+        by_model: Dict[str, List[str]] = {}
+        for _, p in jobs:
+            if p["mode"] != "bm25":
+                by_model.setdefault(p["model"], []).append(p["query"])
+        for model, texts in by_model.items():
+            t0 = time.perf_counter()
+            for text, vec in encode_queries(texts, model).items():
+                vectors[(model, text)] = vec
+            print(f"[✓] encoded {len(set(texts))} queries with {model} in {time.perf_counter() - t0:.1f}s")
+        if any(p["backend"] != "local" for _, p in jobs):
+            print(f"🔗 Connecting to Weaviate at {args.url} (gRPC {args.grpc_port})")
+            client = get_client(args.url, args.grpc_port)
+
+        def run_one(params):
+            return search(client, params, encode=lambda t: vectors[(params["model"], t)])
+
+    def timed(params):
+        t = time.perf_counter()
+        try:
+            result, error = run_one(params), None
+        except Exception as e:  # one failing request doesn't stop the batch
+            result, error = None, f"{type(e).__name__}: {e}"
+        return result, error, (time.perf_counter() - t) * 1000
+
+    writer = BatchWriter(out)
+    took: List[float] = []
+    errors = 0
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+            futures = {pool.submit(timed, params): (no, lines, params)
+                       for no, (lines, params) in enumerate(jobs, start=1)}
+            for fut in as_completed(futures):
+                no, lines, params = futures[fut]
+                result, error, ms = fut.result()
+                writer.write(no, lines, params, result, error, ms)
+                took.append(ms)
+                if error:
+                    errors += 1
+                    print(f"[!] #{no} {params['collection']}/{params['mode']} {params['query']!r}: {error}")
     finally:
-        client.close()
+        writer.close()
+        if client is not None:
+            client.close()
+    elapsed = time.perf_counter() - t0
+    print(f"[report] {len(jobs)} searches in {elapsed:.1f}s ({len(jobs) / elapsed:.1f}/s), errors={errors}, "
+          f"took_ms p50={_pct(took, 0.50):.1f} p95={_pct(took, 0.95):.1f} max={max(took):.1f}")
+    print(f"Results saved to: {out}")
+
+
+def main():
+    args = parse_args()
+    if args.queries_file:
+        run_batch(args)
+        return
+    result = run_search(args)
+    save_to_csv(result["objects"], args.collection, args.query, result["mode"], args.alpha,
+                degraded=result.get("degraded_reason", "") if result.get("degraded") else "")
+    print_result(result, show_score=True)
 
 
 if __name__ == "__main__":
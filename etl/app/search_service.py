@@ -0,0 +1,221 @@
+# search_service.py
+# Long-running HTTP search service: loads LaBSE and connects to Weaviate once, then answers the same
+# requests as search_and_save.py / search_weaviate_labse_hybridfix.py (collection, mode, k, alpha, filters, ...)
+# without paying for torch import + model load + client connect on every query.
+# The CLIs become thin clients with --service http://localhost:8090 (or SEARCH_SERVICE_URL).
+#
+# examples:
+#   python etl/app/search_service.py --port 8090
+#   curl -s localhost:8090/search -d '{"collection": "Window", "query": "mettā", "mode": "hybrid", "k": 5}'
+#   curl -s 'localhost:8090/search?collection=Sentence&query=metta&k=3'
+#   curl -s localhost:8090/health
+#   curl -s localhost:8090/metrics          # + query encoder batch sizes / queue wait, embedding cache hit rate
+#   curl -s localhost:8090/search -d '{"collection": "Window", "query": "mettā", "mode": "hybrid", "deadline_ms": 150}'
+#   curl -s localhost:8090/prewarm -d '{"top": 200}'   # after a reindex: replay the most frequent queries
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from aliases import index_stamp
+from embedding_cache import shared_cache
+from query_encoder import BATCH_MAX, BATCH_WINDOW_MS, MicroBatchEncoder
+from result_cache import prewarm, shared_result_cache
+from search_weaviate_labse_hybridfix import DEFAULT_MODEL, SEARCH_DEFAULTS, search
+from weaviate_nodes import connect_any
+
+_TRUE = {"1", "true", "yes", "on"}
+
+
+def params_from_query_string(qs: str) -> Dict[str, Any]:
+    """GET /search?collection=Window&query=metta&k=3 → typed request options (types follow SEARCH_DEFAULTS)."""
+    raw: Dict[str, List[str]] = urllib.parse.parse_qs(qs, keep_blank_values=True)
+    out: Dict[str, Any] = {}
+    for key, values in raw.items():
+        key = key.replace("-", "_")
+        default = SEARCH_DEFAULTS.get(key)
+        if isinstance(default, list):
+            out[key] = values
+        elif isinstance(default, bool):
+            out[key] = values[-1].lower() in _TRUE
+        elif isinstance(default, int):
+            out[key] = int(values[-1])
+        elif isinstance(default, float):
+            out[key] = float(values[-1])
+        else:
+            out[key] = values[-1]
+    return out
+
+
+class SearchService:
+    """One Weaviate client + one micro-batching query encoder, shared by all request threads."""
+
+    def __init__(self, url: str, grpc_port, model: str = DEFAULT_MODEL, warm: bool = True,
+                 batch_window_ms: float = BATCH_WINDOW_MS, batch_max: int = BATCH_MAX, deadline_ms: int = 0):
+        self.url, self.grpc_port = url, grpc_port
+        self.deadline_ms = deadline_ms  # for requests that don't send their own deadline_ms
+        self.client = connect_any(url, grpc_port)
+        # concurrent vector / hybrid requests share model.encode() calls (query_encoder.py);
+        # repeated queries are answered from the embedding cache (embedding_cache.py) without the model
+        self.cache = shared_cache()
+        self.encoder = MicroBatchEncoder(model, window_ms=batch_window_ms, max_batch=batch_max, cache=self.cache)
+        # identical requests against an unchanged index skip Weaviate entirely (result_cache.py)
+        self.results = shared_result_cache()
+        self.started = time.time()
+        self._counts_lock = threading.Lock()  # request threads of ThreadingHTTPServer update these
+        self.requests = 0
+        self.errors = 0
+        self.degraded = 0
+        if warm:
+            t0 = time.perf_counter()
+            self.encoder.encode("mettā")  # loads the model now instead of on the first vector query
+            print(f"[✓] model {model} loaded in {time.perf_counter() - t0:.1f}s")
+
+    def _count(self, name: str):
+        with self._counts_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self._count("requests")
+        if params.get("deadline_ms") is None:
+            params = {**params, "deadline_ms": self.deadline_ms}
+        try:
+            result = search(self.client, params, encode=self.encoder.encode)
+        except Exception:
+            self._count("errors")
+            raise
+        if result["degraded"]:
+            self._count("degraded")
+        return result
+
+    def prewarm(self, top: int = 100) -> Dict[str, Any]:
+        """Replay the most frequent logged requests so they are cached for the current index stamp."""
+        index_stamp(self.client, ttl=0)  # called right after a load: don't fill the cache under the old stamp
+        return prewarm(lambda p: search(self.client, p, encode=self.encoder.encode, result_cache=self.results,
+                                        log_query=False), self.results, top)
+
+    def health(self) -> Dict[str, Any]:
+        with self._counts_lock:
+            counts = {"requests": self.requests, "errors": self.errors, "degraded": self.degraded}
+        return {
+            "status": "ok" if self.client.is_ready() else "weaviate not ready",
+            "weaviate": self.url,
+            "uptime_sec": round(time.time() - self.started, 1),
+            **counts,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.health(), "encoder": self.encoder.stats(), "embedding_cache": self.cache.stats(),
+                "result_cache": self.results.stats()}
+
+    def close(self):
+        self.client.close()
+
+
+def make_handler(service: SearchService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive for thin clients sending many queries
+
+        def _send(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _search(self, params: Dict[str, Any]):
+            try:
+                result = service.search(params)
+            except ValueError as e:  # bad request options (search_params)
+                self._send(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self._send(200, result)
+
+        def do_GET(self):
+            path, _, qs = self.path.partition("?")
+            if path == "/health":
+                self._send(200, service.health())
+            elif path == "/metrics":
+                self._send(200, service.metrics())
+            elif path == "/search":
+                try:
+                    params = params_from_query_string(qs)
+                except ValueError as e:
+                    self._send(400, {"error": str(e)})
+                    return
+                self._search(params)
+            else:
+                self._send(404, {"error": f"no route {path}"})
+
+        def do_POST(self):
+            path = self.path.partition("?")[0]
+            if path not in ("/search", "/prewarm"):
+                self._send(404, {"error": f"no route {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                params = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+            except ValueError as e:
+                self._send(400, {"error": f"invalid JSON body: {e}"})
+                return
+            if not isinstance(params, dict):
+                self._send(400, {"error": "JSON body must be an object"})
+                return
+            if path == "/prewarm":
+                try:
+                    top = int(params.get("top") or 100)
+                except (TypeError, ValueError, AttributeError):
+                    self._send(400, {"error": f"top must be an integer, got {params.get('top')!r}"})
+                    return
+                self._send(200, service.prewarm(top))
+                return
+            self._search(params)
+
+        def log_message(self, fmt, *args):  # one compact line per request
+            print(f"[i] {self.address_string()} {fmt % args}")
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HTTP search service with a warm LaBSE model and Weaviate client.")
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_READ_URLS") or os.getenv("WEAVIATE_URL", "http://localhost:8081"),
+                    help="Weaviate REST URL, or comma-separated node URLs of a cluster")
+    ap.add_argument("--grpc-port", default=os.getenv("WEAVIATE_GRPC_PORT", "50052"))
+    ap.add_argument("--host", default=os.getenv("SEARCH_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("SEARCH_PORT", "8090")))
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--no-warm", action="store_true", help="Load the model on the first vector/hybrid query instead")
+    ap.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS,
+                    help="Wait this long for concurrent queries to encode together (QUERY_BATCH_WINDOW_MS)")
+    ap.add_argument("--batch-max", type=int, default=BATCH_MAX, help="Max queries per encode call (QUERY_BATCH_MAX)")
+    ap.add_argument("--deadline-ms", type=int, default=int(os.getenv("SEARCH_DEADLINE_MS", "0")),
+                    help="Default latency budget for requests without deadline_ms: late vector / hybrid legs "
+                         "fall back to BM25 (0 = wait)")
+    args = ap.parse_args()
+
+    service = SearchService(args.url, args.grpc_port, model=args.model, warm=not args.no_warm,
+                            batch_window_ms=args.batch_window_ms, batch_max=args.batch_max,
+                            deadline_ms=args.deadline_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(f"[✓] search service on http://{args.host}:{args.port} (Weaviate {args.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,33 @@
 # search_weaviate_labse_hybridfix.py
 import argparse
+import json
 import os
-from typing import List
+import re
+import threading
+import time
+import unicodedata
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 
 from weaviate import WeaviateClient
-from weaviate.connect import ConnectionParams
+from weaviate.classes.aggregate import GroupByAggregate
+from weaviate.classes.query import Filter, MetadataQuery, QueryReference, Sort
+
+from aliases import index_stamp, logical_name, resolve
+from embedding_cache import shared_cache
+from pali_fold import fold, fold_chars, folded_query, has_folded
+from result_cache import request_key, shared_result_cache
+from tenants import with_tenant
+from weaviate_nodes import CONSISTENCY_LEVELS, connect_any, with_consistency
 
 DEFAULT_MODEL = os.getenv("MODEL_NAME", "sentence-transformers/LaBSE")
 LABSE_DEVICE = os.getenv("LABSE_DEVICE")  # 'cpu' | 'cuda' | 'mps' | None
 
 _model = None  # lazy singleton
+_model_lock = threading.Lock()  # concurrent first searches (threads, asyncio.to_thread) load it once
 
 
 def parse_args():
@@ -18,14 +35,14 @@ def parse_args():
 
     parser.add_argument(
         "--url",
-        default=os.getenv("WEAVIATE_URL", "http://localhost:8081"),
-        help="Weaviate REST URL (default: from WEAVIATE_URL env or localhost:8081)"
+        default=os.getenv("WEAVIATE_READ_URLS") or os.getenv("WEAVIATE_URL", "http://localhost:8081"),
+        help="Weaviate REST URL, or comma-separated node URLs of a cluster "
+             "(default: from WEAVIATE_READ_URLS / WEAVIATE_URL env or localhost:8081)"
     )
     parser.add_argument(
         "--grpc-port",
-        type=int,
-        default=int(os.getenv("WEAVIATE_GRPC_PORT", 50052)),
-        help="Weaviate gRPC port (default: from WEAVIATE_GRPC_PORT env or 50052)"
+        default=os.getenv("WEAVIATE_GRPC_PORT", "50052"),
+        help="Weaviate gRPC port, or one per --url node (default: from WEAVIATE_GRPC_PORT env or 50052)"
     )
     parser.add_argument(
         "--collection",
@@ -55,27 +72,130 @@ def parse_args():
         default=0.5, 
         help="hybrid alpha (0..1) higher favors vector"
     )
+    parser.add_argument(
+        "--consistency",
+        choices=CONSISTENCY_LEVELS,
+        default=os.getenv("WEAVIATE_CONSISTENCY") or None,
+        help="Read consistency on replicated collections (ONE = any single replica answers)"
+    )
+    parser.add_argument(
+        "--tenant",
+        default=os.getenv("WEAVIATE_TENANT", ""),
+        help="Book / tenant to search (required on a multi-tenant schema, e.g. MAIN)"
+    )
+    parser.add_argument(
+        "--follow-refs",
+        action="store_true",
+        help="Return cross-referenced sentences / subchunk / chunk with each hit (same query)"
+    )
+    parser.add_argument(
+        "--context",
+        type=int,
+        default=0,
+        help="Add N neighbor sentences before/after each Sentence / Window hit (one extra query in total)"
+    )
+    parser.add_argument(
+        "--filter-heading",
+        action="append",
+        default=[],
+        help="Window / Sentence: only hits under this heading, 'h3=1. Mūlapariyāyavaggo' or a bare value "
+             "for any level; * and ? are wildcards (repeatable, ANDed)"
+    )
+    parser.add_argument(
+        "--filter-path-prefix",
+        default="",
+        help="Window / Sentence: only hits whose heading path starts with this, e.g. 'Majjhimanikāye > Mūlapaṇṇāsa'"
+    )
+    parser.add_argument(
+        "--facet",
+        choices=FACET_PROPS,
+        default=None,
+        help="Window / Sentence: also print hit counts per value of this heading property (one aggregate call)"
+    )
+    parser.add_argument(
+        "--facet-pool",
+        type=int,
+        default=1000,
+        help="Facet counts are taken over the best N matches (default: 1000)"
+    )
+    parser.add_argument(
+        "--fold",
+        action=argparse.BooleanOptionalAction,
+        default=os.getenv("SEARCH_FOLD", "1") != "0",
+        help="BM25 on the diacritic-folded text field with a folded query (mettā = metta = mettaa); "
+             "--no-fold searches the original text (collections loaded before the folded fields existed)"
+    )
+    parser.add_argument(
+        "--hydrate",
+        choices=["snippet", "full", "none"],
+        default="snippet",
+        help="Chunk / Subchunk: query ids + spans first, then fetch a KWIC snippet (default) or the full text "
+             "for the shown hits only"
+    )
+    parser.add_argument(
+        "--show",
+        type=int,
+        default=0,
+        help="Hydrate / print / export only the top N hits (default: all k)"
+    )
     parser.add_argument(
     "--model",
     type=str,
     default="sentence-transformers/LaBSE",
     help="Embedding model to use for vector search"
     )
+    parser.add_argument(
+        "--deadline-ms",
+        type=int,
+        default=int(os.getenv("SEARCH_DEADLINE_MS", "0")),
+        help="Latency budget: if query encoding or the vector / hybrid query isn't done in time, answer with BM25 "
+             "and mark the result degraded (default: from SEARCH_DEADLINE_MS env; 0 = wait)"
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=os.getenv("SEARCH_RESULT_CACHE", "1") != "0",
+        help="Answer repeated requests from the result cache while the index is unchanged "
+             "(RESULT_CACHE_PATH shares it between runs); --no-cache always asks Weaviate"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=os.getenv("SEARCH_BACKEND", "weaviate"),
+        help="local: search the data/outputs artifacts in-process (OUTPUTS_DIR; local_search.py / local_bm25.py), "
+             "no Weaviate needed"
+    )
+    parser.add_argument(
+        "--service",
+        default=os.getenv("SEARCH_SERVICE_URL", ""),
+        help="Send the query to a running search_service.py (model + client already warm), "
+             "e.g. http://localhost:8090 (default: from SEARCH_SERVICE_URL env; empty = search in-process)"
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    try:
+        search_params(args)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
 
 
-def get_client(url: str, grpc_port: int) -> WeaviateClient:
-    cp = ConnectionParams.from_url(url, grpc_port=grpc_port)
-    client = WeaviateClient(cp)
-    client.connect()
-    return client
+def get_client(url: str, grpc_port) -> WeaviateClient:
+    # url may list several cluster nodes; any reachable one can serve the query
+    return connect_any(url, grpc_port)
 
 
 def _load_model(model_name: str):
     global _model
     if _model is not None:
         return _model
+    with _model_lock:
+        if _model is None:
+            _model = _new_model(model_name)
+        return _model
+
+
+def _new_model(model_name: str):
     try:
         from sentence_transformers import SentenceTransformer
         try:
@@ -88,8 +208,7 @@ def _load_model(model_name: str):
                 )
         except Exception:
             device = LABSE_DEVICE or "cpu"
-        _model = SentenceTransformer(model_name, device=device)
-        return _model
+        return SentenceTransformer(model_name, device=device)
     except ModuleNotFoundError as e:
         raise SystemExit(
             "ERROR: sentence-transformers not found in this environment.\n"
@@ -97,12 +216,35 @@ def _load_model(model_name: str):
         ) from e
 
 
-def encode_query_labse(text: str, model_name: str) -> np.ndarray:
+def _encode_uncached(text: str, model_name: str) -> np.ndarray:
     model = _load_model(model_name)
     vec = model.encode([text], normalize_embeddings=False, convert_to_numpy=True)
     return vec.astype(np.float32)[0]
 
 
+def encode_query_labse(text: str, model_name: str) -> np.ndarray:
+    # repeated queries skip the model: in-memory LRU + optional QUERY_CACHE_PATH file (embedding_cache.py)
+    return shared_cache().get_or_encode(model_name, text, lambda t: _encode_uncached(t, model_name))
+
+
+def encode_queries(texts: List[str], model_name: str, batch_size: int = 64) -> Dict[str, np.ndarray]:
+    """Many query texts → {text: vector}: cached ones from the embedding cache, the rest in one model.encode()."""
+    cache = shared_cache()
+    out: Dict[str, np.ndarray] = {}
+    for t in dict.fromkeys(texts):
+        vec = cache.get(model_name, t)
+        if vec is not None:
+            out[t] = vec
+    missing = [t for t in dict.fromkeys(texts) if t not in out]
+    if missing:
+        vecs = _load_model(model_name).encode(missing, batch_size=batch_size, normalize_embeddings=False,
+                                              convert_to_numpy=True).astype(np.float32)
+        for t, vec in zip(missing, vecs):
+            cache.put(model_name, t, vec)
+            out[t] = vec
+    return out
+
+
 def pick_return_props(coll_name: str) -> List[str]:
     if coll_name == "Window":
         return ["window_id", "text", "chunk_id", "path", "h1", "h2", "h3", "h4", "h5", "h6"]
@@ -121,65 +263,620 @@ def short_text(s: str, n: int = 180) -> str:
     return s[:n] + ("..." if len(s) > n else "")
 
 
-def main():
-    args = parse_args()
-    print(f"🔗 Connecting to Weaviate at {args.url} (gRPC {args.grpc_port})")
-    
-    client = get_client(args.url, args.grpc_port)
+# cross-reference targets: ids + spans only, never the 8000-token chunk_text (see references.py)
+REF_RETURN_PROPS = {
+    "Chunk": ["chunk_id", "token_start", "token_end"],
+    "Subchunk": ["subchunk_id", "order_idx"],
+    "Sentence": ["sentence_id", "order_idx", "sentence_text"],
+    "Window": ["window_id", "order_idx"],
+}
+
+
+def reference_queries(coll) -> List[QueryReference]:
+    """A QueryReference for every cross-reference of the collection, followed in the same query."""
+    out = []
+    for ref in coll.config.get().references:
+        target = logical_name(ref.target_collections[0])
+        out.append(QueryReference(link_on=ref.name, return_properties=REF_RETURN_PROPS.get(target, [])))
+    return out
+
+
+def referenced(o) -> Dict[str, List[Dict]]:
+    """{reference name: [target properties, ordered by order_idx / token_start]} of one result object."""
+    out = {}
+    for name, ref in (getattr(o, "references", None) or {}).items():
+        props = [t.properties or {} for t in ref.objects]
+        out[name] = sorted(props, key=lambda p: (p.get("order_idx") or 0, p.get("token_start") or 0))
+    return out
+
+
+def reference_ids(targets: List[Dict]) -> str:
+    keys = ("sentence_id", "subchunk_id", "window_id", "chunk_id")
+    return ", ".join(next((str(p[k]) for k in keys if p.get(k)), "") for p in targets)
+
+
+def print_references(hit: Dict[str, Any], indent: str = "    "):
+    for name, targets in (hit.get("references") or {}).items():
+        print(f"{indent}↳ {name}: {reference_ids(targets)}")
+        for p in targets:
+            if p.get("sentence_text"):
+                print(f"{indent}    {p.get('sentence_id', '')}: {short_text(p['sentence_text'], 120)}")
+
+
+# --------------------
+# Neighbor context (--context N)
+# --------------------
+_SENTENCE_NO = re.compile(r"-S(\d+)$")  # MAIN001-SUB002-S026 → 26 (= order_idx within the chunk)
+CONTEXT_PROPS = {"Window": ["left_sentence_id", "right_sentence_id"], "Sentence": ["order_idx"]}
+
+
+def hit_span(collection: str, p: Dict) -> Optional[Tuple[str, int, int]]:
+    """(chunk_id, first, last sentence order_idx) covered by a Sentence / Window hit; None for other tiers."""
+    chunk_id = p.get("chunk_id")
+    if not chunk_id:
+        return None
+    if collection == "Sentence" and p.get("order_idx") is not None:
+        return chunk_id, int(p["order_idx"]), int(p["order_idx"])
+    if collection == "Window":
+        lo = _SENTENCE_NO.search(p.get("left_sentence_id") or "")
+        hi = _SENTENCE_NO.search(p.get("right_sentence_id") or "")
+        if lo and hi:
+            return chunk_id, int(lo.group(1)), int(hi.group(1))
+    return None
+
+
+def fetch_context(sentence_coll, collection: str, objects, n: int) -> List[Dict[str, List[Dict]]]:
+    """
+    {"before": [...], "after": [...]} neighbor sentences for every hit, resolved with ONE fetch_objects
+    call whose filter ORs (chunk_id = c AND order_idx in [lo-n, hi+n]) over all hits.
+    """
+    spans = [hit_span(collection, o.properties or {}) for o in objects]
+    wanted = {s for s in spans if s}
+    empty = [{"before": [], "after": []} for _ in objects]
+    if n <= 0 or not wanted:
+        return empty
+    filters = Filter.any_of([
+        Filter.by_property("chunk_id").equal(c)
+        & Filter.by_property("order_idx").greater_or_equal(max(1, lo - n))
+        & Filter.by_property("order_idx").less_or_equal(hi + n)
+        for c, lo, hi in wanted
+    ])
+    res = sentence_coll.query.fetch_objects(
+        filters=filters,
+        limit=sum(hi - lo + 1 + 2 * n for _, lo, hi in wanted),
+        return_properties=["sentence_id", "chunk_id", "order_idx", "sentence_text"],
+    )
+    by_pos = {(p.get("chunk_id"), p.get("order_idx")): p for p in (o.properties or {} for o in res.objects)}
+    out = []
+    for span in spans:
+        if not span:
+            out.append({"before": [], "after": []})
+            continue
+        c, lo, hi = span
+        out.append({
+            "before": [by_pos[(c, i)] for i in range(lo - n, lo) if (c, i) in by_pos],
+            "after": [by_pos[(c, i)] for i in range(hi + 1, hi + n + 1) if (c, i) in by_pos],
+        })
+    return out
+
+
+def context_text(sentences: List[Dict]) -> str:
+    return " ".join(p.get("sentence_text") or "" for p in sentences)
+
+
+def print_context(ctx: Optional[Dict[str, List[Dict]]], indent: str = "    "):
+    if not ctx:
+        return
+    for p in ctx["before"]:
+        print(f"{indent}‹ {p.get('sentence_id', '')}: {short_text(p.get('sentence_text', ''), 120)}")
+    for p in ctx["after"]:
+        print(f"{indent}› {p.get('sentence_id', '')}: {short_text(p.get('sentence_text', ''), 120)}")
+
+
+# --------------------
+# Two-phase results: light query, then hydrate only the hits that are shown / exported
+# --------------------
+HEAVY_TEXT = {"Chunk": "chunk_text", "Subchunk": "subchunk_text"}  # ~8000 / ~200 tokens per object
+SNIPPET_PARENT = {"Chunk": "chunk_id", "Subchunk": "subchunk_id"}   # Sentence property pointing at the hit
+
+
+def light_props(collection: str, props: List[str]) -> List[str]:
+    """Phase 1: drop the big text field of Chunk / Subchunk, keep ids + token span."""
+    heavy = HEAVY_TEXT.get(collection)
+    if not heavy:
+        return props
+    return [p for p in props if p != heavy] + [p for p in ("token_start", "token_end") if p not in props]
+
+
+def kwic(text: str, query: str, width: int = 90, max_fragments: int = 2) -> str:
+    """
+    Keyword-in-context: up to `max_fragments` windows of ~width chars around query terms, terms in [ ].
+    Terms are matched on the diacritic-folded text, so "metta" marks "mettā".
+    """
+    text = " ".join(unicodedata.normalize("NFC", text or "").split())
+    low = fold_chars(text)  # same length as text: offsets carry over
+    terms = sorted({t for t in re.findall(r"\w+", fold(query)) if len(t) > 1}, key=len, reverse=True)
+    hits = []
+    for t in terms:
+        i = low.find(t)
+        if i >= 0:
+            hits.append((i, i + len(t)))
+    if not hits:
+        return short_text(text, 2 * width)
+    frags: List[List[int]] = []
+    for s, e in sorted(hits):
+        lo, hi = max(0, s - width // 2), min(len(text), e + width // 2)
+        if frags and lo <= frags[-1][1]:
+            frags[-1][1] = max(frags[-1][1], hi)
+        else:
+            frags.append([lo, hi])
+    out = []
+    for lo, hi in frags[:max_fragments]:
+        marks = sorted({(m.start(), m.end()) for t in terms for m in re.finditer(re.escape(t), low[lo:hi])})
+        frag, prev = "", 0
+        for s, e in marks:
+            if s >= prev:
+                frag += text[lo + prev:lo + s] + "[" + text[lo + s:lo + e] + "]"
+                prev = e
+        frag += text[lo + prev:hi]
+        out.append(("…" if lo > 0 else "") + frag + ("…" if hi < len(text) else ""))
+    return " ".join(out)
+
+
+def hydrate(client, collection: str, objects, query: str, mode: str = "snippet", tenant: str = "",
+            fold: bool = True) -> int:
+    """
+    Phase 2 for Chunk / Subchunk hits (in place, on o.properties):
+      snippet : one BM25 query on the Sentence tier restricted to the hits' chunk/subchunk ids; the best
+                sentence per hit becomes a KWIC `snippet` — no chunk_text leaves the server. Hits without
+                a matching sentence (vector hits often share no token with the query) get their first
+                sentence (lowest token_start) instead
+      full    : fetch the text field of just these objects by uuid
+    Returns the bytes of text pulled in this phase.
+    """
+    heavy = HEAVY_TEXT.get(collection)
+    if not heavy or mode == "none" or not objects:
+        return 0
+    if mode == "full":
+        coll = with_tenant(client.collections.get(resolve(client, collection)), tenant)
+        res = coll.query.fetch_objects(filters=Filter.by_id().contains_any([o.uuid for o in objects]),
+                                       limit=len(objects), return_properties=[heavy])
+        texts = {str(o.uuid): (o.properties or {}).get(heavy, "") for o in res.objects}
+        for o in objects:
+            o.properties[heavy] = texts.get(str(o.uuid), "")
+        return sum(len(t.encode("utf-8")) for t in texts.values())
+
+    parent = SNIPPET_PARENT[collection]
+    keys = sorted({(o.properties or {}).get(parent) for o in objects} - {None, ""})
+    sent = with_tenant(client.collections.get(resolve(client, "Sentence")), tenant)
+    kw_query, kw_props = folded_query("Sentence", query, fold and has_folded(sent, "Sentence"))
+    res = sent.query.bm25(query=kw_query, query_properties=kw_props, filters=Filter.by_property(parent).contains_any(keys),
+                          limit=min(1000, 10 * len(keys)), return_properties=["sentence_id", parent, "sentence_text"])
+    best: Dict[str, Dict] = {}
+    for s in res.objects:  # score-ordered: first sentence seen per parent is its best match
+        best.setdefault((s.properties or {}).get(parent), s.properties or {})
+    for key in (k for k in keys if k not in best):  # at most one small query per unmatched hit
+        head = sent.query.fetch_objects(filters=Filter.by_property(parent).equal(key), limit=1,
+                                        sort=Sort.by_property("token_start", ascending=True),
+                                        return_properties=["sentence_id", parent, "sentence_text"])
+        if head.objects:
+            best[key] = head.objects[0].properties or {}
+    for o in objects:
+        s = best.get(o.properties.get(parent))
+        o.properties["snippet"] = kwic(s.get("sentence_text", ""), query) if s else ""
+        o.properties["snippet_sentence_id"] = s.get("sentence_id", "") if s else ""
+    return sum(len((s.get("sentence_text") or "").encode("utf-8")) for s in best.values())
+
+
+def payload_bytes(objects) -> int:
+    """Approximate size of the returned properties (UTF-8 bytes of every value)."""
+    return sum(len(str(v).encode("utf-8")) for o in objects for v in (o.properties or {}).values() if v is not None)
+
+
+# --------------------
+# Heading filters + facets (Window / Sentence carry h1..h6 and path)
+# --------------------
+HEADING_TIERS = ("Window", "Sentence")
+FACET_PROPS = ["h1", "h2", "h3", "h4", "h5", "h6", "path"]
+
+
+def _match(prop: str, value: str):
+    return Filter.by_property(prop).like(value) if ("*" in value or "?" in value) else Filter.by_property(prop).equal(value)
+
+
+def heading_filters(headings: Optional[List[str]] = None, path_prefix: str = ""):
+    """
+    --filter-heading "h3=1. Mūlapariyāyavaggo" (or a bare value: any heading level; * and ? are wildcards)
+    and --filter-path-prefix, all ANDed into one Weaviate filter. None when nothing is set.
+    """
+    parts = []
+    for h in headings or []:
+        prop, sep, value = h.partition("=")
+        if sep and prop in FACET_PROPS:
+            parts.append(_match(prop, value))
+        else:
+            parts.append(Filter.any_of([_match(p, h) for p in FACET_PROPS[:6]]))
+    if path_prefix:
+        parts.append(Filter.by_property("path").like(path_prefix.rstrip("*") + "*"))
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else Filter.all_of(parts)
+
+
+def facet_counts(coll, prop: str, mode: str, query: str, qvec=None, alpha: float = 0.5, filters=None,
+                 pool: int = 1000, top: int = 20, query_properties=None) -> List[Tuple[str, int]]:
+    """
+    Hit counts per `prop` value among the best `pool` matches of the same query and filters,
+    from one aggregate group-by call (bm25 runs as hybrid with alpha=0, i.e. keyword only).
+    """
+    group_by = GroupByAggregate(prop=prop, limit=top)
+    if mode == "vector":
+        res = coll.aggregate.near_vector(near_vector=qvec, object_limit=pool, filters=filters,
+                                         group_by=group_by, total_count=True)
+    else:
+        res = coll.aggregate.hybrid(query=query, query_properties=query_properties, vector=qvec,
+                                    alpha=alpha if mode == "hybrid" else 0, object_limit=pool, filters=filters, group_by=group_by, total_count=True)
+    counts = [(str(g.grouped_by.value), g.total_count or 0) for g in res.groups]
+    return sorted(counts, key=lambda c: -c[1])
+
+
+def print_facets(prop: str, counts: List[Tuple[str, int]]):
+    print(f"[facets] {prop}: {len(counts)} value(s)")
+    for value, n in counts:
+        print(f"    {n:>5}  {value or '(none)'}")
+
+
+# --------------------
+# Search core: one request end to end, shared by the CLIs and search_service.py
+# --------------------
+TIERS = ("Window", "Sentence", "Subchunk", "Chunk")
+_SIDE_QUERIES = ThreadPoolExecutor(max_workers=4)  # facet aggregates sent next to the top-k query
+_LEG_WORKERS = 8
+_DEADLINE_LEGS = ThreadPoolExecutor(max_workers=_LEG_WORKERS)  # encode / vector legs we may stop waiting for (deadline_ms)
+_LEG_SLOTS = threading.BoundedSemaphore(_LEG_WORKERS)  # one per worker: a leg never waits in the pool's queue
+SEARCH_DEFAULTS: Dict[str, Any] = {
+    "collection": "Window", "mode": "bm25", "query": "", "k": 5, "alpha": 0.5, "consistency": None,
+    "tenant": "", "follow_refs": False, "context": 0, "filter_heading": [], "filter_path_prefix": "",
+    "facet": None, "facet_pool": 1000, "fold": True, "hydrate": "snippet", "show": 0, "model": DEFAULT_MODEL,
+    "deadline_ms": 0, "cache": True, "backend": "weaviate",
+}
+BACKENDS = ("weaviate", "local")
+# numeric options and their allowed range (inclusive, None = open); the type follows SEARCH_DEFAULTS.
+# 10000 is Weaviate's default QUERY_MAXIMUM_RESULTS
+NUMERIC_RANGES = {"k": (1, 10000), "alpha": (0.0, 1.0), "context": (0, 100), "show": (0, None),
+                  "facet_pool": (1, 10000), "deadline_ms": (0, None)}
+
+
+def _typed_option(name: str, value: Any) -> Any:
+    """JSON / CLI value → the type of SEARCH_DEFAULTS[name]; ValueError (→ HTTP 400) if it doesn't fit."""
+    kind = type(SEARCH_DEFAULTS[name])
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ("1", "true", "yes", "on", "0", "false", "no", "off"):
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        raise ValueError(f"{name} must be true or false, got {value!r}")
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        num = float(value)
+        if kind is int and not num.is_integer():
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be {'an integer' if kind is int else 'a number'}, got {value!r}") from None
+    lo, hi = NUMERIC_RANGES[name]
+    if num < lo or (hi is not None and num > hi) or num != num:  # num != num: NaN
+        raise ValueError(f"{name} must be {f'between {lo} and {hi}' if hi is not None else f'>= {lo}'}, got {value!r}")
+    return int(num) if kind is int else num
+
+
+def search_params(source) -> Dict[str, Any]:
+    """Request options from argparse args or a JSON dict: unknown keys dropped, defaults filled in, validated."""
+    src = vars(source) if isinstance(source, argparse.Namespace) else dict(source or {})
+    p = {k: (src[k] if src.get(k) is not None else v) for k, v in SEARCH_DEFAULTS.items()}
+    for name, default in SEARCH_DEFAULTS.items():
+        if name in NUMERIC_RANGES or isinstance(default, bool):
+            p[name] = _typed_option(name, p[name])
+    for name in ("collection", "mode", "query", "tenant", "hydrate", "backend", "filter_path_prefix"):
+        if not isinstance(p[name], str):
+            raise ValueError(f"{name} must be a string, got {p[name]!r}")
+    if not str(p["query"]).strip():
+        raise ValueError("query is required")
+    if p["collection"] not in TIERS:
+        raise ValueError(f"unknown collection {p['collection']!r} (expected {', '.join(TIERS)})")
+    if p["mode"] not in ("bm25", "hybrid", "vector"):
+        raise ValueError(f"unknown mode {p['mode']!r} (expected bm25 | hybrid | vector)")
+    if p["hydrate"] not in ("snippet", "full", "none"):
+        raise ValueError(f"unknown hydrate mode {p['hydrate']!r} (expected snippet | full | none)")
+    if p["consistency"] and p["consistency"] not in CONSISTENCY_LEVELS:
+        raise ValueError(f"unknown consistency {p['consistency']!r} (expected {', '.join(CONSISTENCY_LEVELS)})")
+    if p["facet"] and p["facet"] not in FACET_PROPS:
+        raise ValueError(f"unknown facet {p['facet']!r} (expected {', '.join(FACET_PROPS)})")
+    if isinstance(p["filter_heading"], str):
+        p["filter_heading"] = [p["filter_heading"]]
+    if not isinstance(p["filter_heading"], list) or not all(isinstance(f, str) for f in p["filter_heading"]):
+        raise ValueError(f"filter_heading must be a string or a list of strings, got {p['filter_heading']!r}")
+    if p["backend"] not in BACKENDS:
+        raise ValueError(f"unknown backend {p['backend']!r} (expected {' | '.join(BACKENDS)})")
+    if (p["filter_heading"] or p["filter_path_prefix"] or p["facet"]) and p["collection"] not in HEADING_TIERS:
+        raise ValueError(f"heading filters / facets need --collection {' or '.join(HEADING_TIERS)}")
+    return p
+
+
+def hit_dict(o) -> Dict[str, Any]:
+    """One result object as plain JSON-ready data."""
+    md = getattr(o, "metadata", None)
+    return {
+        "uuid": str(o.uuid),
+        "score": getattr(md, "score", None),
+        "distance": getattr(md, "distance", None),
+        "properties": dict(o.properties or {}),
+        "references": referenced(o),
+    }
+
+
+class LegsBusy(FuturesTimeout):
+    """Every _DEADLINE_LEGS worker is still running an earlier leg; queueing would only eat the deadline."""
+
+
+def _deadline_leg(fn, timeout: Optional[float]):
+    """
+    fn() on _DEADLINE_LEGS, waiting at most `timeout` s. Raises LegsBusy at once when no worker is free
+    and FuturesTimeout when late; a late leg is cancelled if it has not started (a running one can't be
+    stopped, it keeps its slot until it returns).
+    """
+    if not _LEG_SLOTS.acquire(blocking=False):
+        raise LegsBusy(f"all {_LEG_WORKERS} deadline workers busy")
+
+    def leg():
+        try:
+            return fn()
+        finally:
+            _LEG_SLOTS.release()
+
+    try:
+        fut = _DEADLINE_LEGS.submit(leg)
+    except BaseException:
+        _LEG_SLOTS.release()
+        raise
     try:
-        coll = client.collections.get(args.collection)
-        props = pick_return_props(args.collection)
+        return fut.result(timeout=timeout)
+    except FuturesTimeout:
+        if fut.cancel():  # never started: leg() won't run, so its slot is ours to free
+            _LEG_SLOTS.release()
+        raise
+
+
+def search(client: WeaviateClient, params: Dict[str, Any], encode=None, result_cache=None,
+           log_query: bool = True) -> Dict[str, Any]:
+    """
+    Run one search request (see SEARCH_DEFAULTS for the options). `encode(text)` turns the query into a
+    vector (default: encode_query_labse; search_service.py passes a MicroBatchEncoder). Returns
+    {"collection", "query", "mode", "objects": [hit_dict (+ "context")], "facets", "payload_kb", "degraded", "took_ms"}.
+    With deadline_ms, query encoding and the vector / hybrid leg that don't finish in time (or can't start
+    because every deadline worker is busy) are abandoned and BM25 answers instead ("degraded": true, "degraded_reason", "requested_mode").
+    Repeated requests come from the result cache (result_cache.py, "cached": true) while the index stamp
+    (aliases.py) is unchanged; `result_cache` defaults to the process-wide one, cache=False skips it.
+    """
+    p = search_params(params)
+    if p["backend"] == "local":
+        # in-process over the data/outputs artifacts (local_search.py); `client` is not used
+        from local_search import local_search
+        return local_search(p, encode)
+    t0 = time.perf_counter()
+    cache = (result_cache or shared_result_cache()) if p["cache"] else None
+    request = stamp = None
+    if cache is not None and cache.enabled:
+        request = request_key(p)
+        if log_query:
+            cache.log(request)
+        stamp = index_stamp(client)  # None: registry unreadable → don't trust (or fill) the cache
+        hit = cache.get(request, stamp) if stamp is not None else None
+        if hit is not None:
+            return {**hit, "cached": True, "took_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    deadline = t0 + p["deadline_ms"] / 1000.0 if p["deadline_ms"] else None
+
+    def left() -> Optional[float]:
+        return max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+
+    # logical tier name → physical collection currently serving it (blue-green, aliases.py)
+    coll = with_consistency(client.collections.get(resolve(client, p["collection"])), p["consistency"])
+    coll = with_tenant(coll, p["tenant"])
+    props = pick_return_props(p["collection"])
+    if p["context"]:
+        props = props + [c for c in CONTEXT_PROPS.get(p["collection"], []) if c not in props]
+    refs = reference_queries(coll) if p["follow_refs"] else None
+    if p["hydrate"] != "full" or p["show"]:
+        props = light_props(p["collection"], props)  # phase 1: ids + spans, text comes in phase 2
+    filters = heading_filters(p["filter_heading"], p["filter_path_prefix"])
+    # BM25 part runs once, on <text>_folded with the folded query (pali_fold.py); vectors use the raw query
+    kw_query, kw_props = folded_query(p["collection"], p["query"], p["fold"] and has_folded(coll, p["collection"]))
+    mode, degraded = p["mode"], None
+    qvec = None
+    if mode != "bm25":
+        encode = encode or (lambda text: encode_query_labse(text, p["model"]))
+        if deadline is None:
+            qvec = encode(p["query"])
+        else:
+            try:
+                qvec = _deadline_leg(lambda: encode(p["query"]), left())
+            except LegsBusy as e:  # degrade now instead of queueing behind legs that already blew their budget
+                mode, degraded = "bm25", f"query encoding skipped: {e}"
+            except FuturesTimeout:  # e.g. the model is still loading
+                mode, degraded = "bm25", f"query encoding exceeded {p['deadline_ms']} ms"
+    facets = None
+    if p["facet"]:
+        # runs next to the top-k query, so both come back in about one round trip
+        facets = _SIDE_QUERIES.submit(
+            facet_counts, coll, p["facet"], mode, kw_query, qvec, p["alpha"], filters, p["facet_pool"],
+            query_properties=kw_props)
 
-        if args.mode == "vector":
-            qvec = encode_query_labse(args.query, args.model)
-            res = coll.query.near_vector(
+    def run_bm25():
+        return coll.query.bm25(
+            query=kw_query,
+            query_properties=kw_props,
+            limit=p["k"],
+            filters=filters,
+            return_properties=props,
+            return_references=refs,
+            return_metadata=MetadataQuery(score=True),
+        )
+
+    def run_vector_leg():
+        if mode == "vector":
+            return coll.query.near_vector(
                 near_vector=qvec,
-                limit=args.k,
-                return_properties=props,
-            )
-        elif args.mode == "hybrid":
-            qvec = encode_query_labse(args.query, args.model)
-            res = coll.query.hybrid(
-                query=args.query,
-                vector=qvec,
-                alpha=args.alpha,
-                limit=args.k,
-                return_properties=props,
-            )
-        else:  # bm25
-            res = coll.query.bm25(
-                query=args.query,
-                limit=args.k,
+                limit=p["k"],
+                filters=filters,
                 return_properties=props,
+                return_references=refs,
+                return_metadata=MetadataQuery(distance=True),
             )
+        return coll.query.hybrid(
+            query=kw_query,
+            query_properties=kw_props,
+            vector=qvec,
+            alpha=p["alpha"],
+            limit=p["k"],
+            filters=filters,
+            return_properties=props,
+            return_references=refs,
+            return_metadata=MetadataQuery(score=True),
+        )
 
-        print(f"[results] {len(res.objects)} objects")
-        for i, o in enumerate(res.objects or [], start=1):
-            p = o.properties or {}
-            kind = args.collection.lower()
-            if args.collection == "Window":
-                idx = f"[{kind}] {p.get('window_id','')} | chunk={p.get('chunk_id','')}"
-                text = p.get("text", "")
-                trail = " > ".join(x for x in [p.get("h1"), p.get("h2"), p.get("h3"), p.get("h4"), p.get("h5"), p.get("h6")] if x)
-                suffix = f" | Headings: {trail}" if trail else ""
-            elif args.collection == "Sentence":
-                idx = f"[{kind}] {p.get('sentence_id','')} | chunk={p.get('chunk_id','')}"
-                text = p.get("sentence_text", "")
-                suffix = ""
-            elif args.collection == "Subchunk":
-                idx = f"[{kind}] {p.get('subchunk_id','')} | chunk={p.get('chunk_id','')}"
-                text = p.get("subchunk_text", "")
-                suffix = ""
-            else:
-                idx = f"[{kind}] {p.get('chunk_id','')}"
-                text = p.get("chunk_text", "")
-                suffix = ""
+    if mode == "bm25":
+        res = run_bm25()
+    elif deadline is None:
+        res = run_vector_leg()
+    else:
+        try:
+            res = _deadline_leg(run_vector_leg, left())
+        except LegsBusy as e:
+            degraded = f"{mode} query skipped: {e}"
+        except FuturesTimeout:
+            degraded = f"{mode} query exceeded {p['deadline_ms']} ms"
+        except Exception as e:
+            degraded = f"{mode} query failed: {e}"
+        if degraded:
+            mode = "bm25"
+            res = run_bm25()
+
+    objects = res.objects or []
+    light = payload_bytes(objects)
+    if p["show"]:
+        objects = objects[: p["show"]]
+    hydrated = 0
+    if p["collection"] in HEAVY_TEXT and (p["hydrate"] != "full" or p["show"]):
+        hydrated = hydrate(client, p["collection"], objects, p["query"], p["hydrate"], p["tenant"], fold=p["fold"])
+    hits = [hit_dict(o) for o in objects]
+    if p["context"]:
+        # neighbors of all hits in one filtered fetch on the Sentence tier
+        sent_coll = with_tenant(client.collections.get(resolve(client, "Sentence")), p["tenant"])
+        for h, ctx in zip(hits, fetch_context(sent_coll, p["collection"], objects, p["context"])):
+            h["context"] = ctx
 
-            print(f"{i:>2}. {idx}{suffix}")
-            print(f"    {short_text(text)}")
+    out: Dict[str, Any] = {
+        "collection": p["collection"], "query": p["query"], "mode": mode, "objects": hits,
+        "payload_kb": {"phase1": round(light / 1024, 1), "hydrated": round(hydrated / 1024, 1)},
+        "degraded": bool(degraded),
+    }
+    if degraded:
+        out["degraded_reason"] = degraded
+        out["requested_mode"] = p["mode"]
+    if facets is not None:
+        try:
+            out["facets"] = {"prop": p["facet"], "counts": facets.result(timeout=left())}
+        except FuturesTimeout:
+            facets.cancel()
+            out["facets"] = {"prop": p["facet"], "error": f"not ready within {p['deadline_ms']} ms"}
+        except Exception as e:  # e.g. a server without hybrid aggregation; the hits are still good
+            out["facets"] = {"prop": p["facet"], "error": str(e)}
+    out["cached"] = False
+    out["took_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    if stamp is not None and not degraded and "error" not in (out.get("facets") or {}):
+        cache.put(request, stamp, out)
+    return out
+
+
+def remote_search(service_url: str, params: Dict[str, Any], timeout: float = 60) -> Dict[str, Any]:
+    """POST one request to search_service.py; same result shape as search()."""
+    req = urllib.request.Request(service_url.rstrip("/") + "/search", data=json.dumps(params).encode("utf-8"),
+                                 method="POST", headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            return json.loads(r.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"search service answered {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+    except urllib.error.URLError as e:
+        raise RuntimeError(f"search service at {service_url} unreachable: {e.reason}") from e
+
+
+def run_search(args) -> Dict[str, Any]:
+    """--service: thin client of search_service.py; otherwise connect, search in-process and close."""
+    params = search_params(args)
+    if args.service:
+        print(f"🔗 Using search service at {args.service}")
+        try:
+            return remote_search(args.service, params)
+        except RuntimeError as e:
+            raise SystemExit(f"ERROR: {e}") from e
+    if params["backend"] == "local":
+        return search(None, params)
+    print(f"🔗 Connecting to Weaviate at {args.url} (gRPC {args.grpc_port})")
+    client = get_client(args.url, args.grpc_port)
+    try:
+        return search(client, params)
     finally:
         client.close()
 
 
+def print_result(result: Dict[str, Any], show_score: bool = False):
+    kb = result.get("payload_kb") or {}
+    print(f"[results] {len(result['objects'])} objects (phase 1: {kb.get('phase1', 0):.1f} KB, "
+          f"hydrated: {kb.get('hydrated', 0):.1f} KB, {result.get('took_ms', 0):.0f} ms"
+          f"{', cached' if result.get('cached') else ''})")
+    if result.get("degraded"):
+        print(f"[!] degraded to {result['mode']}: {result.get('degraded_reason', '')}")
+    facets = result.get("facets")
+    if facets and "error" in facets:
+        print(f"[!] facet counts unavailable: {facets['error']}")
+    elif facets:
+        print_facets(facets["prop"], facets["counts"])
+    collection = result["collection"]
+    kind = collection.lower()
+    for i, h in enumerate(result["objects"], start=1):
+        p = h.get("properties") or {}
+        if collection == "Window":
+            idx = f"[{kind}] {p.get('window_id','')} | chunk={p.get('chunk_id','')}"
+            text = p.get("text", "")
+            trail = " > ".join(x for x in [p.get("h1"), p.get("h2"), p.get("h3"), p.get("h4"), p.get("h5"), p.get("h6")] if x)
+            suffix = f" | Headings: {trail}" if trail else ""
+        elif collection == "Sentence":
+            idx = f"[{kind}] {p.get('sentence_id','')} | chunk={p.get('chunk_id','')}"
+            text = p.get("sentence_text", "")
+            suffix = ""
+        elif collection == "Subchunk":
+            idx = f"[{kind}] {p.get('subchunk_id','')} | chunk={p.get('chunk_id','')}"
+            text = p.get("subchunk_text") or p.get("snippet", "")
+            suffix = ""
+        else:
+            idx = f"[{kind}] {p.get('chunk_id','')}"
+            text = p.get("chunk_text") or p.get("snippet", "")
+            suffix = ""
+        if show_score:
+            score = h.get("score")
+            suffix += f" (score: {score:.4f})" if score is not None else " (score: N/A)"
+
+        print(f"{i:>2}. {idx}{suffix}")
+        print(f"    {short_text(text)}")
+        print_references(h)
+        print_context(h.get("context"))
+
+
+def main():
+    args = parse_args()
+    print_result(run_search(args))
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
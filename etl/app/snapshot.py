@@ -0,0 +1,219 @@
+# snapshot.py
+# Fast start: save the loaded collections with Weaviate's backup-filesystem module and restore them
+# instead of re-running the ETL, as long as the artifact manifest (outputs + schema profile + loader code)
+# is unchanged. The backup id is derived from the manifest hash, so a changed CSV/npy simply misses.
+# Needs ENABLE_MODULES=backup-filesystem and BACKUP_FILESYSTEM_PATH on the weaviate service (single node).
+#
+# examples:
+#   python etl/app/snapshot.py id
+#   python etl/app/snapshot.py save    --url http://localhost:8081
+#   python etl/app/snapshot.py restore --url http://localhost:8081
+import argparse
+import ast
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+APP_DIR = Path(__file__).resolve().parent
+BACKEND = os.getenv("SNAPSHOT_BACKEND", "filesystem")
+TIERS = ["Window", "Sentence", "Subchunk", "Chunk"]
+# scripts pipeline.py runs to build the index; they and every etl/app module they import (transitively)
+# shape what ends up in it, so a change to any of them invalidates old snapshots
+LOADER_ENTRYPOINTS = ["weaviate_multitier_setup_and_search_patched.py", "insert_vectors_generic.py",
+                      "references.py", "aliases.py", "pipeline.py"]
+ARTIFACT_SUFFIXES = (".csv", ".txt", ".npy")
+
+
+def _sha1(path: Path, block: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for buf in iter(lambda: f.read(block), b""):
+            h.update(buf)
+    return h.hexdigest()
+
+
+def loader_modules(entrypoints: List[str] = LOADER_ENTRYPOINTS, app_dir: Path = APP_DIR) -> List[str]:
+    """The entrypoint scripts plus the local modules they import, directly or indirectly (sorted file names)."""
+    seen: set = set()
+    todo = [name for name in entrypoints if (app_dir / name).exists()]
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        tree = ast.parse((app_dir / name).read_text(encoding="utf-8"), filename=name)
+        for node in ast.walk(tree):  # function-level (lazy) imports count too
+            if isinstance(node, ast.Import):
+                mods = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                mods = [node.module]
+            else:
+                continue
+            for mod in mods:
+                local = f"{mod.split('.')[0]}.py"
+                if local not in seen and (app_dir / local).exists():
+                    todo.append(local)
+    return sorted(seen)
+
+
+def artifact_manifest(outputs_dir: Path, profile_path: Optional[str] = None) -> Dict[str, Any]:
+    """sha1 of every CSV/ids/npy artifact, the schema profile directory and the loader code (loader_modules)."""
+    outputs_dir = Path(outputs_dir)
+    profile = Path(profile_path or os.getenv("SCHEMA_PROFILE") or APP_DIR / "profiles" / "schema_default.yaml")
+    files: Dict[str, str] = {}
+    for p in sorted(outputs_dir.iterdir()):
+        if p.is_file() and p.suffix.lower() in ARTIFACT_SUFFIXES:
+            files[f"outputs/{p.name}"] = _sha1(p)
+    # profiles may `extends:` each other, so hash the whole directory of the selected one
+    for p in sorted(profile.resolve().parent.iterdir()):
+        if p.is_file():
+            files[f"profiles/{p.name}"] = _sha1(p)
+    for name in loader_modules():
+        files[f"app/{name}"] = _sha1(APP_DIR / name)
+    return {"profile": profile.name, "files": files}
+
+
+def snapshot_id(manifest: Dict[str, Any]) -> str:
+    """Backup ids must be lowercase [a-z0-9_-]."""
+    digest = hashlib.sha1(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"tipitaka-{digest[:16]}"
+
+
+# --------------------
+# REST helpers (stdlib only, so pipeline.py can use them before any client is installed)
+# --------------------
+def _request(method: str, url: str, body: Optional[Dict[str, Any]] = None, timeout: int = 30):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            return r.status, json.loads(r.read().decode("utf-8") or "{}")
+    except urllib.error.HTTPError as e:
+        try:
+            payload = json.loads(e.read().decode("utf-8") or "{}")
+        except ValueError:
+            payload = {}
+        return e.code, payload
+
+
+def _error(payload: Dict[str, Any]) -> str:
+    errs = payload.get("error") or []
+    return "; ".join(e.get("message", str(e)) for e in errs) if isinstance(errs, list) else str(errs)
+
+
+def existing_collections(url: str) -> List[str]:
+    status, payload = _request("GET", url.rstrip("/") + "/v1/schema")
+    return [c["class"] for c in payload.get("classes") or []] if status == 200 else []
+
+
+def backup_info(url: str, backup_id: str, backend: str = BACKEND) -> Dict[str, Any]:
+    """{"status": STARTED | TRANSFERRING | SUCCESS | FAILED, "classes": [...], ...}; {} when no such backup exists."""
+    status, payload = _request("GET", f"{url.rstrip('/')}/v1/backups/{backend}/{backup_id}")
+    return payload if status == 200 else {}
+
+
+def backup_status(url: str, backup_id: str, backend: str = BACKEND) -> Optional[str]:
+    """STARTED / TRANSFERRING / SUCCESS / FAILED, or None when no such backup exists."""
+    return backup_info(url, backup_id, backend).get("status")
+
+
+def _wait(url: str, path: str, what: str, max_wait: int, poll: float = 2.0) -> bool:
+    start = time.time()
+    while True:
+        status, payload = _request("GET", url.rstrip("/") + path)
+        state = payload.get("status") if status == 200 else None
+        if state == "SUCCESS":
+            print(f"[✓] {what} done in {time.time() - start:.1f}s")
+            return True
+        if state == "FAILED" or status != 200:
+            print(f"[!] {what} failed: {payload.get('error') or _error(payload) or status}")
+            return False
+        if time.time() - start > max_wait:
+            print(f"[!] {what} still {state} after {max_wait}s; giving up")
+            return False
+        time.sleep(poll)
+
+
+def save(url: str, backup_id: str, collections: Optional[List[str]] = None,
+         backend: str = BACKEND, max_wait: int = 1800) -> bool:
+    if backup_status(url, backup_id, backend) == "SUCCESS":
+        print(f"[skip] snapshot {backup_id} already exists")
+        return True
+    present = existing_collections(url)
+    include = [c for c in (collections or TIERS) if c in present]
+    if not include:
+        print("[!] nothing to snapshot (no tier collections)")
+        return False
+    status, payload = _request("POST", f"{url.rstrip('/')}/v1/backups/{backend}",
+                               {"id": backup_id, "include": include})
+    if status != 200:
+        print(f"[!] snapshot not created ({status}): {_error(payload)}")
+        return False
+    print(f"[i] saving snapshot {backup_id}: {', '.join(include)}")
+    return _wait(url, f"/v1/backups/{backend}/{backup_id}", f"snapshot {backup_id}", max_wait)
+
+
+def restore(url: str, backup_id: str, collections: Optional[List[str]] = None,
+            backend: str = BACKEND, max_wait: int = 1800) -> bool:
+    """
+    Restore `backup_id` if it exists. Weaviate refuses to restore over existing classes, so tiers
+    already present are dropped first (their content is what the snapshot replaces) — but only once the
+    backup is known to be complete and to contain every requested tier; otherwise nothing is touched.
+    """
+    info = backup_info(url, backup_id, backend)
+    if info.get("status") != "SUCCESS":
+        print(f"[i] no snapshot {backup_id} (artifacts, schema profile or loader changed)")
+        return False
+    saved = info.get("classes") or []
+    wanted = [c for c in (collections or TIERS) if c in saved] if saved else list(collections or TIERS)
+    missing = [c for c in (collections or []) if saved and c not in saved]
+    if missing or not wanted:
+        print(f"[!] snapshot {backup_id} lacks {', '.join(missing) or 'the tiers'}; live collections kept")
+        return False
+    for name in existing_collections(url):
+        if name in wanted:
+            _request("DELETE", f"{url.rstrip('/')}/v1/schema/{name}")
+            print(f"[-] dropped {name} before restore")
+    status, payload = _request("POST", f"{url.rstrip('/')}/v1/backups/{backend}/{backup_id}/restore",
+                               {"include": wanted})
+    if status != 200:
+        print(f"[!] restore not started ({status}): {_error(payload)}; {', '.join(wanted)} need a full load")
+        return False
+    print(f"[i] restoring snapshot {backup_id}")
+    return _wait(url, f"/v1/backups/{backend}/{backup_id}/restore", f"restore {backup_id}", max_wait)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Save / restore Weaviate snapshots keyed by the artifact manifest.")
+    ap.add_argument("cmd", choices=["id", "manifest", "save", "restore", "status"])
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_URL", "http://localhost:8081"))
+    ap.add_argument("--outdir", default=os.getenv("OUTPUTS_DIR", "data/outputs"))
+    ap.add_argument("--schema-profile", default=None)
+    ap.add_argument("--id", default="", help="Explicit backup id (default: derived from the manifest)")
+    ap.add_argument("--collections", default="", help="Comma-separated subset (default: all 4 tiers)")
+    args = ap.parse_args()
+
+    manifest = artifact_manifest(Path(args.outdir), args.schema_profile)
+    backup_id = args.id or snapshot_id(manifest)
+    collections = [c for c in args.collections.split(",") if c] or None
+
+    if args.cmd == "id":
+        print(backup_id)
+    elif args.cmd == "manifest":
+        print(json.dumps({"id": backup_id, **manifest}, indent=2, ensure_ascii=False))
+    elif args.cmd == "status":
+        print(f"{backup_id}: {backup_status(args.url, backup_id) or 'missing'}")
+    elif args.cmd == "save":
+        sys.exit(0 if save(args.url, backup_id, collections) else 1)
+    else:
+        sys.exit(0 if restore(args.url, backup_id, collections) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# stream_align.py
+# Bounded-memory readers for the inserters: CSV in chunks, vectors via mmap, ids streamed line by line.
+# Rows are joined to their vector batch by batch, so peak RSS depends on batch size / pending window,
+# not on the number of rows in the tier.
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_PENDING = 10000
+
+
+def iter_ids(path: str) -> Iterator[Tuple[int, str]]:
+    """(row number in the .npy, id) for every non-empty line of an ids file."""
+    with open(path, "r", encoding="utf-8") as f:
+        i = 0
+        for line in f:
+            the_id = line.strip()
+            if the_id:
+                yield i, the_id
+                i += 1
+
+
+def open_vectors(path: str) -> np.ndarray:
+    """Memory-map a .npy matrix (read-only); rows are paged in only when a batch touches them."""
+    return np.load(path, mmap_mode="r")
+
+
+def iter_csv_records(csv_path: str, chunksize: int = 1024) -> Iterator[Dict[str, Any]]:
+    """CSV rows as dicts of strings ("" for empty cells), read `chunksize` rows at a time."""
+    for chunk in pd.read_csv(csv_path, encoding="utf-8-sig", chunksize=chunksize,
+                             dtype=str, keep_default_na=False):
+        yield from chunk.to_dict("records")
+
+
+def iter_csv_batches(csv_path: str, batch_size: int = 256) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for rec in iter_csv_records(csv_path, chunksize=batch_size):
+        batch.append(rec)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_aligned(csv_path: str, id_col: str, ids_path: str, chunksize: int = 1024,
+                 max_pending: int = DEFAULT_MAX_PENDING,
+                 on_skip: Optional[Callable[[str, str], None]] = None,
+                 on_orphan: Optional[Callable[[str, Dict[str, Any]], None]] = None
+                 ) -> Iterator[Tuple[str, Dict[str, Any], int]]:
+    """
+    Stream-join CSV rows with the ids file (line i of ids ↔ row i of the .npy); yields (id, record, vec_row).
+
+    make_labse_embeddings.py writes ids in CSV order, skipping rows without text, so this is a merge-join:
+    a row whose id is not next in the ids file is held as a row without a vector, and ids are only read
+    ahead (at most `max_pending`) while looking for the current row. An id read ahead is given up as
+    "no CSV row" only once an id `max_pending // 2` lines further down has met its row, i.e. when it
+    is well behind the CSV cursor; held rows beyond `max_pending` are given up as "no vector". Entries
+    out of order by less than `max_pending // 2` lines still meet. Everything unmatched is reported
+    through on_skip(id, "no vector" | "no CSV row"); with `on_orphan`, rows without a vector go to
+    on_orphan(id, record) instead, so callers can still insert them.
+    """
+    skip = on_skip or (lambda _id, _why: None)
+
+    def no_vector(the_id, rec):
+        if on_orphan is not None:
+            on_orphan(the_id, rec)
+        else:
+            skip(the_id, "no vector")
+    ids_it = iter_ids(ids_path)
+    pending_rows: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # read, no vector yet
+    pending_ids: "OrderedDict[str, int]" = OrderedDict()  # read ahead, no row yet (ascending vec rows)
+    last_matched = -1  # highest vec row that met its CSV row
+    slack = max(1, max_pending // 2)
+    ids_done = False
+
+    for rec in iter_csv_records(csv_path, chunksize=chunksize):
+        rid = rec[id_col]
+        vi = pending_ids.pop(rid, None)
+        while vi is None and not ids_done:
+            if len(pending_ids) >= max_pending:
+                oldest, old_vi = next(iter(pending_ids.items()))
+                if old_vi + slack > last_matched:
+                    break  # nothing in the window is behind the cursor yet: hold the row instead
+                del pending_ids[oldest]
+                skip(oldest, "no CSV row")
+            nxt = next(ids_it, None)
+            if nxt is None:
+                ids_done = True
+                break
+            n_vi, the_id = nxt
+            if the_id == rid:
+                vi = n_vi
+            elif the_id in pending_rows:  # its row came earlier than the ids file says
+                last_matched = max(last_matched, n_vi)
+                yield the_id, pending_rows.pop(the_id), n_vi
+            else:
+                pending_ids[the_id] = n_vi
+        if vi is None:
+            pending_rows[rid] = rec
+            if len(pending_rows) > max_pending:
+                no_vector(*pending_rows.popitem(last=False))
+            continue
+        last_matched = max(last_matched, vi)
+        yield rid, rec, vi
+
+    for vi, the_id in ids_it:
+        rec = pending_rows.pop(the_id, None)
+        if rec is not None:
+            yield the_id, rec, vi
+        else:
+            skip(the_id, "no CSV row")
+    for the_id in pending_ids:
+        skip(the_id, "no CSV row")
+    for rid, rec in pending_rows.items():
+        no_vector(rid, rec)
+
+
+def aligned_batches(csv_path: str, id_col: str, ids_path: str, npy_path: str, batch_size: int = 256,
+                    max_pending: int = DEFAULT_MAX_PENDING,
+                    on_skip: Optional[Callable[[str, str], None]] = None, orphans: bool = False
+                    ) -> Iterator[Tuple[List[str], List[Dict[str, Any]], Optional[np.ndarray]]]:
+    """
+    (ids, records, float32 vectors) batches of `batch_size`. Vectors are gathered from the mmap'ed
+    .npy per batch into one contiguous block; callers can hand its rows to the client as views.
+    orphans=True also yields the CSV rows without a vector, as (ids, records, None) batches, so a
+    single pass still loads every row of the tier (bulk mode has no separate CSV pass).
+    """
+    vecs = open_vectors(npy_path)
+    ids: List[str] = []
+    recs: List[Dict[str, Any]] = []
+    rows: List[int] = []
+    held: List[Tuple[str, Dict[str, Any]]] = []
+
+    def flush():
+        block = np.ascontiguousarray(vecs[np.asarray(rows, dtype=np.int64)], dtype=np.float32)
+        return ids, recs, block
+
+    def flush_orphans(final: bool = False):
+        while len(held) >= batch_size or (final and held):
+            part = held[:batch_size]
+            del held[:batch_size]
+            yield [i for i, _ in part], [r for _, r in part], None
+
+    def hold(the_id, rec):
+        held.append((the_id, rec))
+
+    for the_id, rec, vi in iter_aligned(csv_path, id_col, ids_path, chunksize=batch_size,
+                                        max_pending=max_pending, on_skip=on_skip,
+                                        on_orphan=hold if orphans else None):
+        if vi >= len(vecs):
+            raise ValueError(f"ids file has more rows than {npy_path} ({len(vecs)} vectors)")
+        ids.append(the_id); recs.append(rec); rows.append(vi)
+        if len(ids) >= batch_size:
+            yield flush()
+            ids, recs, rows = [], [], []
+        yield from flush_orphans()
+    if ids:
+        yield flush()
+    yield from flush_orphans(final=True)
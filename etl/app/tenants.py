@@ -0,0 +1,159 @@
+# tenants.py
+# Per-book multi-tenancy: with `multi_tenancy: {enabled: true}` in the schema profile every tier keeps
+# one tenant (own shard + HNSW graph) per book. The book is the letter prefix of chunk_id (MAIN001 → MAIN),
+# optionally mapped to a coarser tenant (e.g. per Nikaya) by `tenants.map` in the profile.
+# Inserters route rows to their tenant and create missing tenants; search CLIs scope with --tenant.
+#
+# examples:
+#   python etl/app/tenants.py list
+#   python etl/app/tenants.py deactivate --tenant MAIN     # take one book offline (COLD), keep its data
+#   python etl/app/tenants.py drop --tenant MAIN           # delete one book, then reload it with --tenant MAIN
+import argparse
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from weaviate.classes.tenants import Tenant
+
+TIERS = ["Window", "Sentence", "Subchunk", "Chunk"]
+_BOOK_RE = re.compile(r"[A-Za-z]+")
+_TENANT_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def book_of(chunk_id: str) -> str:
+    m = _BOOK_RE.match((chunk_id or "").strip())
+    return m.group(0).upper() if m else "MISC"
+
+
+def tenant_map_from_profile(profile=None) -> Dict[str, str]:
+    from schema_profiles import load_profile
+    if not isinstance(profile, dict):
+        profile = load_profile(profile)
+    return {str(k).upper(): str(v) for k, v in ((profile.get("tenants") or {}).get("map") or {}).items()}
+
+
+def is_multi_tenant(coll) -> bool:
+    cfg = coll.config.get().multi_tenancy_config
+    return bool(cfg and cfg.enabled)
+
+
+def active_tenants(coll) -> List[str]:
+    """Tenants that can be queried (ACTIVE / HOT), sorted; [] on a single-tenant collection."""
+    if not is_multi_tenant(coll):
+        return []
+    return sorted(t.name for t in coll.tenants.get().values()
+                  if str(getattr(t.activity_status, "value", t.activity_status)).upper() in ("ACTIVE", "HOT"))
+
+
+def with_tenant(coll, tenant: Optional[str]):
+    """Scope a collection handle to one tenant; unchanged when tenant is empty (single-tenant schema)."""
+    return coll.with_tenant(tenant) if tenant else coll
+
+
+class TenantRouter:
+    """
+    Groups insert batches by tenant for one collection.
+    `only` keeps just the rows of that tenant (reload a single book), also on single-tenant collections.
+    """
+
+    def __init__(self, multi_tenant: bool, only: Optional[str] = None, tenant_map: Optional[Dict[str, str]] = None):
+        self.multi_tenant = multi_tenant
+        self.only = only or None
+        self.tenant_map = tenant_map or {}
+        self._known: Optional[set] = None
+
+    @classmethod
+    def for_collection(cls, coll, only: Optional[str] = None, profile=None) -> "TenantRouter":
+        mt = is_multi_tenant(coll)
+        return cls(mt, only, tenant_map_from_profile(profile) if mt else None)
+
+    def tenant(self, rec: Dict[str, Any]) -> str:
+        book = book_of(str(rec.get("chunk_id") or ""))
+        name = self.tenant_map.get(book, book)
+        if not _TENANT_RE.match(name):
+            raise ValueError(f"Invalid tenant name {name!r} for book {book!r} (allowed: A-Z a-z 0-9 _ -)")
+        return name
+
+    def split(self, objs: List[Any], sids: Optional[List[str]], recs: List[Dict[str, Any]]
+              ) -> Iterator[Tuple[List[Any], Optional[List[str]], Optional[str]]]:
+        """(objects, source_ids, tenant) per tenant in the batch; tenant is None for single-tenant collections."""
+        if not self.multi_tenant and not self.only:
+            yield objs, sids, None
+            return
+        groups: "OrderedDict[str, List[int]]" = OrderedDict()
+        for i, rec in enumerate(recs):
+            t = self.tenant(rec)
+            if self.only is None or t == self.only:
+                groups.setdefault(t, []).append(i)
+        for t, idx in groups.items():
+            yield ([objs[i] for i in idx], [sids[i] for i in idx] if sids else None,
+                   t if self.multi_tenant else None)
+
+    def missing(self, names, existing) -> List[str]:
+        """Tenants not seen yet (the server's list is fetched once through `existing()`)."""
+        if self._known is None:
+            self._known = set(existing())
+        new = [n for n in dict.fromkeys(names) if n and n not in self._known]
+        self._known.update(new)
+        return new
+
+    def ensure(self, coll, names):
+        new = self.missing(names, lambda: coll.tenants.get().keys())
+        if new:
+            coll.tenants.create([Tenant(name=n) for n in new])
+            print(f"[✓] {coll.name}: created tenant(s) {', '.join(new)}")
+
+    async def ensure_async(self, coll, names):
+        if self._known is None:
+            self._known = set((await coll.tenants.get()).keys())
+        new = self.missing(names, lambda: ())
+        if new:
+            await coll.tenants.create([Tenant(name=n) for n in new])
+            print(f"[✓] {coll.name}: created tenant(s) {', '.join(new)}")
+
+
+def main():
+    from aliases import resolve
+    from weaviate_nodes import connect_any
+
+    ap = argparse.ArgumentParser(description="List / (de)activate / drop per-book tenants on all tiers.")
+    ap.add_argument("cmd", choices=["list", "create", "activate", "deactivate", "drop"])
+    ap.add_argument("--url", default=os.getenv("WEAVIATE_URL", "http://localhost:8081"))
+    ap.add_argument("--grpc-port", default=os.getenv("WEAVIATE_GRPC_PORT", "50052"))
+    ap.add_argument("--tenant", default="", help="Tenant name (book prefix, or mapped name)")
+    ap.add_argument("--collections", default=",".join(TIERS))
+    args = ap.parse_args()
+    if args.cmd != "list" and not args.tenant:
+        ap.error(f"{args.cmd} needs --tenant")
+
+    client = connect_any(args.url, args.grpc_port)
+    try:
+        for name in args.collections.split(","):
+            coll = client.collections.get(resolve(client, name))
+            if not is_multi_tenant(coll):
+                print(f"[skip] {name}: not multi-tenant")
+                continue
+            if args.cmd == "list":
+                ts = coll.tenants.get()
+                print(f"[{name}] {len(ts)} tenant(s)")
+                for t in ts.values():
+                    print(f"    {t.name:<24} {t.activity_status.value}")
+            elif args.cmd == "create":
+                coll.tenants.create([Tenant(name=args.tenant)])
+                print(f"[✓] {name}: created {args.tenant}")
+            elif args.cmd == "activate":
+                coll.tenants.activate(args.tenant)
+                print(f"[✓] {name}: {args.tenant} active")
+            elif args.cmd == "deactivate":
+                coll.tenants.deactivate(args.tenant)
+                print(f"[✓] {name}: {args.tenant} inactive (offline, data kept)")
+            else:
+                coll.tenants.remove([args.tenant])
+                print(f"[-] {name}: dropped {args.tenant}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
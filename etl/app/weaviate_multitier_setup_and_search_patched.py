@@ -2,12 +2,23 @@
 import argparse
 import csv
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from types import SimpleNamespace
 from typing import List
 
 import weaviate
 from weaviate import WeaviateClient
 from weaviate.connect import ConnectionParams
-from weaviate.classes.config import Property, DataType, Configure
+from weaviate.classes.config import Configure, ReferenceProperty
+from weaviate.classes.query import MetadataQuery
+
+from aliases import bump_index_stamp, logical_name, resolve, version_in_use, versioned
+from fusion import FUSION_METHODS, fuse
+from pali_fold import add_folded, folded_query, has_folded
+from schema_profiles import collection_kwargs, load_profile, references
+from search_weaviate_labse_hybridfix import HEAVY_TEXT, SNIPPET_PARENT, hydrate, light_props
+from tenants import TenantRouter, with_tenant
 
 # --------------------
 # Helpers
@@ -18,94 +29,47 @@ def connect(url: str, grpc_port: int) -> WeaviateClient:
     client.connect()
     return client
 
-def create_collections(client: WeaviateClient, use_vectorizer: bool = False):
+def create_collections(client: WeaviateClient, use_vectorizer: bool = False, profile=None, version: str = ""):
     """
     Create 4 collections. Default: BM25-only (no vectorizer).
     Set use_vectorizer=True if your Weaviate has a text2vec module enabled.
+    Properties, vector index (flat/hnsw + PQ/BQ), BM25 k1/b and per-property indexing come from a
+    schema profile (schema_profiles.py): a loaded dict, a path, or None for SCHEMA_PROFILE / the default.
+    With `version` the collections are created as <Name>_<version> (blue-green load, see aliases.py);
+    a version whose collections already exist or are registered is refused (RuntimeError).
     """
     vectorizer = Configure.Vectorizer.text2vec_transformers() if use_vectorizer else Configure.Vectorizer.none()
+    if not isinstance(profile, dict):
+        profile = load_profile(profile)
+    print(f"[i] Schema profile: {profile.get('_path', '(inline)')}")
 
+    if version:
+        # a version is built once: upserting into a serving / rollback version would mix two loads
+        taken = version_in_use(client, version, list(profile["collections"]))
+        if taken:
+            raise RuntimeError(f"version {version} already used ({'; '.join(taken)}); build a new one")
     existing = set(client.collections.list_all())
 
-    if "Window" not in existing:
+    for logical in profile["collections"]:
+        name = versioned(logical, version)
+        if name in existing:
+            continue
         client.collections.create(
-            name="Window",
-            description="2/3-sentence windows with optional heading context",
+            name=name,
             vectorizer_config=vectorizer,  # note: DeprecationWarning is OK; keeps backwards-compat
-            properties=[
-                Property(name="window_id", data_type=DataType.TEXT),
-                Property(name="chunk_id", data_type=DataType.TEXT),
-                Property(name="size", data_type=DataType.INT),
-                Property(name="left_sentence_id", data_type=DataType.TEXT),
-                Property(name="right_sentence_id", data_type=DataType.TEXT),
-                Property(name="order_idx", data_type=DataType.INT),
-                Property(name="text", data_type=DataType.TEXT),
-                Property(name="token_start", data_type=DataType.INT),
-                Property(name="token_end", data_type=DataType.INT),
-                Property(name="heading_id", data_type=DataType.TEXT),
-                Property(name="level", data_type=DataType.INT),
-                Property(name="path", data_type=DataType.TEXT),
-                Property(name="h1", data_type=DataType.TEXT),
-                Property(name="h2", data_type=DataType.TEXT),
-                Property(name="h3", data_type=DataType.TEXT),
-                Property(name="h4", data_type=DataType.TEXT),
-                Property(name="h5", data_type=DataType.TEXT),
-                Property(name="h6", data_type=DataType.TEXT),
-            ],
-        )
-
-    if "Sentence" not in existing:
-        client.collections.create(
-            name="Sentence",
-            description="Sentence-level units with optional heading context",
-            vectorizer_config=vectorizer,
-            properties=[
-                Property(name="sentence_id", data_type=DataType.TEXT),
-                Property(name="chunk_id", data_type=DataType.TEXT),
-                Property(name="subchunk_id", data_type=DataType.TEXT),
-                Property(name="order_idx", data_type=DataType.INT),
-                Property(name="token_start", data_type=DataType.INT),
-                Property(name="token_end", data_type=DataType.INT),
-                Property(name="sentence_text", data_type=DataType.TEXT),
-                Property(name="heading_id", data_type=DataType.TEXT),
-                Property(name="level", data_type=DataType.INT),
-                Property(name="path", data_type=DataType.TEXT),
-                Property(name="h1", data_type=DataType.TEXT),
-                Property(name="h2", data_type=DataType.TEXT),
-                Property(name="h3", data_type=DataType.TEXT),
-                Property(name="h4", data_type=DataType.TEXT),
-                Property(name="h5", data_type=DataType.TEXT),
-                Property(name="h6", data_type=DataType.TEXT),
-            ],
+            **collection_kwargs(profile, logical),
         )
+        print(f"[✓] created {name}")
 
-    if "Subchunk" not in existing:
-        client.collections.create(
-            name="Subchunk",
-            description="~200-token subchunks",
-            vectorizer_config=vectorizer,
-            properties=[
-                Property(name="subchunk_id", data_type=DataType.TEXT),
-                Property(name="chunk_id", data_type=DataType.TEXT),
-                Property(name="order_idx", data_type=DataType.INT),
-                Property(name="token_start", data_type=DataType.INT),
-                Property(name="token_end", data_type=DataType.INT),
-                Property(name="subchunk_text", data_type=DataType.TEXT),
-            ],
-        )
-
-    if "Chunk" not in existing:
-        client.collections.create(
-            name="Chunk",
-            description="~8000-token chunks",
-            vectorizer_config=vectorizer,
-            properties=[
-                Property(name="chunk_id", data_type=DataType.TEXT),
-                Property(name="token_start", data_type=DataType.INT),
-                Property(name="token_end", data_type=DataType.INT),
-                Property(name="chunk_text", data_type=DataType.TEXT),
-            ],
-        )
+    # cross-references need every target to exist first; values are linked after the load (references.py)
+    for logical in profile["collections"]:
+        coll = client.collections.get(versioned(logical, version))
+        have = {r.name for r in coll.config.get().references}
+        for ref in references(profile, logical):
+            if ref["name"] not in have:
+                coll.config.add_reference(ReferenceProperty(
+                    name=ref["name"], target_collection=versioned(ref["target"], version)))
+                print(f"[✓] {versioned(logical, version)}.{ref['name']} → {versioned(ref['target'], version)}")
 
 def _safe_int(x):
     if x is None:
@@ -118,12 +82,36 @@ def _safe_int(x):
     except Exception:
         return None
 
-def insert_csv(client: WeaviateClient, collection: str, csv_path: str):
+# id column per class; objects get uuid5("<Class>:<id>") like insert_vectors_generic.py,
+# so a later vector insert overwrites the CSV row instead of duplicating it
+ID_FIELDS = {"Window": "window_id", "Sentence": "sentence_id", "Subchunk": "subchunk_id", "Chunk": "chunk_id"}
+
+def _object_uuid(collection: str, row):
+    the_id = (row.get(ID_FIELDS.get(collection, "")) or "").strip()
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{collection}:{the_id}") if the_id else None
+
+def _csv_props(row, int_fields, tier: str = ""):
+    props = {}
+    for k, v in row.items():
+        if k in int_fields:
+            props[k] = _safe_int(v)
+        else:
+            props[k] = v if v is not None else ""
+    return add_folded(props, tier)  # <text>_folded copy for diacritic-insensitive BM25 (pali_fold.py)
+
+def insert_csv(client: WeaviateClient, collection: str, csv_path: str,
+               batch_size: int = 0, concurrency: int = 1, stats=None, tenant: str = ""):
     """
     Insert a single CSV file into the given collection.
     No recursion. No outdir usage here.
+    batch_size=0 and no stats → client-side dynamic batching (default).
+    Otherwise fixed insert_many batches are timed into `stats` (ingest_report.CollectionStats).
+    Multi-tenant collections: rows go to their book's tenant (tenants.py); `tenant` loads only that one.
+    `collection` may be a versioned name (Window_v2026...); ids and int fields follow the logical tier.
     """
     coll = client.collections.get(collection)
+    tier = logical_name(collection)
+    router = TenantRouter.for_collection(coll, only=tenant)
     total = 0
 
     # INT fields per collection
@@ -133,27 +121,72 @@ def insert_csv(client: WeaviateClient, collection: str, csv_path: str):
         "Subchunk": ["order_idx", "token_start", "token_end"],
         "Chunk":    ["token_start", "token_end"],
     }
-    int_fields = set(int_fields_map.get(collection, []))
+    int_fields = set(int_fields_map.get(tier, []))
+
+    if batch_size or stats is not None:
+        from ingest_report import CollectionStats, send_batches
+        from weaviate.classes.data import DataObject
+        stats = stats if stats is not None else CollectionStats(collection, "csv")
+        batch_size = batch_size or 256
+
+        def routed(objs, rows):
+            for t_objs, _, t in router.split(objs, None, rows):
+                if t:
+                    router.ensure(coll, [t])
+                yield t_objs, None, t
+
+        def batches():
+            with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+                objs, rows = [], []
+                for row in csv.DictReader(f):
+                    objs.append(DataObject(properties=_csv_props(row, int_fields, tier),
+                                           uuid=_object_uuid(tier, row)))
+                    rows.append(row)
+                    if len(objs) >= batch_size:
+                        yield from routed(objs, rows)
+                        objs, rows = [], []
+                if objs:
+                    yield from routed(objs, rows)
 
+        def progress(n):
+            nonlocal total
+            total += n
+            if total % 1000 < n:
+                print(f"[i] {collection}: {total} sent...")
+
+        send_batches(coll, batches(), stats, concurrency=concurrency, on_batch=progress)
+        stats.print_summary()
+        print(f"[✓] {collection}: {stats.objects_ok} inserted from {csv_path} ({stats.objects_failed} failed)")
+        return stats
+
+    # tenants are per object, which only the client-level batcher takes
+    batcher = client.batch if router.multi_tenant else coll.batch
     with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
         reader = csv.DictReader(f)
-        with coll.batch.dynamic() as batch:
+        with batcher.dynamic() as batch:
             for row in reader:
-                props = {}
-                for k, v in row.items():
-                    if k in int_fields:
-                        props[k] = _safe_int(v)
-                    else:
-                        props[k] = v if v is not None else ""
-                batch.add_object(properties=props)
+                props, uid = _csv_props(row, int_fields, tier), _object_uuid(tier, row)
+                t = router.tenant(row) if (router.multi_tenant or router.only) else None
+                if router.only and t != router.only:
+                    continue
+                if router.multi_tenant:
+                    router.ensure(coll, [t])
+                    batch.add_object(collection=collection, properties=props, uuid=uid, tenant=t)
+                else:
+                    batch.add_object(properties=props, uuid=uid)
                 total += 1
                 if total % 1000 == 0:
                     print(f"[i] {collection}: {total} inserted...")
-    print(f"[✓] {collection}: {total} inserted from {csv_path}")
+    failed = batcher.failed_objects
+    for fo in failed[:20]:
+        print(f"    [-] Failed uuid={fo.original_uuid}: {fo.message}")
+    if len(failed) > 20:
+        print(f"    [-] ... {len(failed) - 20} more failed objects")
+    print(f"[✓] {collection}: {total - len(failed)} inserted from {csv_path} ({len(failed)} failed)")
 
-def ingest_all(client, outdir):
+def csv_plan(outdir):
     """
-    Choose best-available CSV per class and insert once each.
+    Best-available CSV per class (None when missing).
     Priority:
       Window   → windows_with_headings.csv  else windows_2_3.csv
       Sentence → sentences_with_headings.csv else sentences_from_200.csv
@@ -178,101 +211,134 @@ def ingest_all(client, outdir):
     sub_csv = pick(os.path.join(outdir, "subchunks_200.csv"))
     chk_csv = pick(os.path.join(outdir, "chunks.csv"))
 
-    plan = [
+    return [
         ("Window",   win_csv),
         ("Sentence", sen_csv),
         ("Subchunk", sub_csv),
         ("Chunk",    chk_csv),
     ]
 
+def ingest_all(client, outdir, batch_size: int = 0, concurrency: int = 1, report=None, only=None, tenant: str = "",
+               version: str = ""):
+    """
+    Choose best-available CSV per class (csv_plan) and insert once each.
+    With `report` (ingest_report.IngestReport) each class is timed as "<class>/csv".
+    `only` restricts the load to these class names, `tenant` to one book (multi-tenant schema).
+    `version` loads into the <class>_<version> collections of a blue-green build.
+    """
+    outdir = os.path.abspath(outdir)
+    plan = csv_plan(outdir)
+
     for cname, path in plan:
+        if only is not None and cname not in only:
+            continue
         if path:
-            insert_csv(client, cname, path)
+            stats = report.stats(cname, "csv") if report is not None else None
+            insert_csv(client, versioned(cname, version), path, batch_size=batch_size, concurrency=concurrency, stats=stats,
+                       tenant=tenant)
         else:
             print(f"[skip] {cname}: required CSV not found in {outdir}")
 
 # --------------------
 # Search (cascade)
 # --------------------
-def bm25(coll, query: str, limit: int, return_props: List[str]):
-    return coll.query.bm25(query=query, limit=limit, return_properties=return_props)
+def bm25(coll, query: str, limit: int, return_props: List[str], query_props=None):
+    return coll.query.bm25(query=query, query_properties=query_props, limit=limit, return_properties=return_props,
+                           return_metadata=MetadataQuery(score=True))
 
-def hybrid(coll, query: str, alpha: float, limit: int, return_props: List[str]):
+def hybrid(coll, query: str, alpha: float, limit: int, return_props: List[str], query_props=None):
     # only works if vectorizer enabled; otherwise BM25 is used
     try:
-        return coll.query.hybrid(query=query, alpha=alpha, limit=limit, return_properties=return_props)
+        return coll.query.hybrid(query=query, query_properties=query_props, alpha=alpha, limit=limit,
+                                 return_properties=return_props, return_metadata=MetadataQuery(score=True))
     except Exception:
-        return bm25(coll, query, limit, return_props)
+        return bm25(coll, query, limit, return_props, query_props)
 
-def cascade_search(client: WeaviateClient, query: str, limit: int = 10, use_hybrid: bool = False, alpha: float = 0.5):
-    results = []
+# tier → (kind, return properties, text field, id field); Window → Sentence → Subchunk → Chunk
+SEARCH_TIERS = {
+    "Window": ("window", ["window_id","text","path","chunk_id","h1","h2","h3","h4","h5","h6"], "text", "window_id"),
+    "Sentence": ("sentence", ["sentence_id","sentence_text","path","chunk_id","h1","h2","h3","h4","h5","h6"],
+                 "sentence_text", "sentence_id"),
+    "Subchunk": ("subchunk", ["subchunk_id","subchunk_text","chunk_id"], "subchunk_text", "subchunk_id"),
+    "Chunk": ("chunk", ["chunk_id","chunk_text"], "chunk_text", "chunk_id"),
+}
 
-    def add_results(objs, kind: str, text_field: str, id_field: str):
-        for o in objs.objects:
-            p = o.properties
-            results.append({
-                "kind": kind,
-                "id": p.get(id_field, ""),
-                "text": p.get(text_field, ""),
-                "path": p.get("path", ""),
-                "chunk_id": p.get("chunk_id", ""),
-                "h1": p.get("h1", ""),
-                "h2": p.get("h2", ""),
-                "h3": p.get("h3", ""),
-                "h4": p.get("h4", ""),
-                "h5": p.get("h5", ""),
-                "h6": p.get("h6", ""),
-            })
-
-    # Window
-    coll = client.collections.get("Window")
-    props = ["window_id","text","path","chunk_id","h1","h2","h3","h4","h5","h6"]
-    res = hybrid(coll, query, alpha, limit, props) if use_hybrid else bm25(coll, query, limit, props)
-    add_results(res, "window", "text", "window_id")
-    if len(results) >= limit:
-        return results[:limit]
-
-    # Sentence
-    coll = client.collections.get("Sentence")
-    props = ["sentence_id","sentence_text","path","chunk_id","h1","h2","h3","h4","h5","h6"]
-    res = hybrid(coll, query, alpha, limit, props) if use_hybrid else bm25(coll, query, limit, props)
-    add_results(res, "sentence", "sentence_text", "sentence_id")
-    if len(results) >= limit:
-        return results[:limit]
-
-    # Subchunk
-    coll = client.collections.get("Subchunk")
-    props = ["subchunk_id","subchunk_text","chunk_id"]
-    res = hybrid(coll, query, alpha, limit, props) if use_hybrid else bm25(coll, query, limit, props)
+def _tier_hits(res, tier: str) -> List[dict]:
+    kind, _, text_field, id_field = SEARCH_TIERS[tier]
+    hits = []
     for o in res.objects:
         p = o.properties
-        results.append({
-            "kind": "subchunk",
-            "id": p.get("subchunk_id",""),
-            "text": p.get("subchunk_text",""),
-            "path": "",
-            "chunk_id": p.get("chunk_id",""),
-            "h1":"", "h2":"", "h3":"", "h4":"", "h5":"", "h6":"",
+        hits.append({
+            "kind": kind,
+            "id": p.get(id_field, ""),
+            "text": p.get(text_field, ""),
+            "path": p.get("path", ""),
+            "chunk_id": p.get("chunk_id", ""),
+            "h1": p.get("h1", ""),
+            "h2": p.get("h2", ""),
+            "h3": p.get("h3", ""),
+            "h4": p.get("h4", ""),
+            "h5": p.get("h5", ""),
+            "h6": p.get("h6", ""),
+            "token_start": p.get("token_start"),
+            "token_end": p.get("token_end"),
+            "score": getattr(o.metadata, "score", None) if o.metadata else None,
         })
-    if len(results) >= limit:
-        return results[:limit]
+    return hits
 
-    # Chunk
-    coll = client.collections.get("Chunk")
-    props = ["chunk_id","chunk_text"]
-    res = hybrid(coll, query, alpha, limit, props) if use_hybrid else bm25(coll, query, limit, props)
-    for o in res.objects:
-        p = o.properties
-        results.append({
-            "kind": "chunk",
-            "id": p.get("chunk_id",""),
-            "text": p.get("chunk_text",""),
-            "path": "",
-            "chunk_id": p.get("chunk_id",""),
-            "h1":"", "h2":"", "h3":"", "h4":"", "h5":"", "h6":"",
-        })
+def _tier_search(client: WeaviateClient, tier: str, query: str, limit: int, use_hybrid: bool, alpha: float,
+                 tenant: str, fold: bool) -> List[dict]:
+    # one BM25 query per tier on the diacritic-folded copy (pali_fold.py) instead of per spelling
+    coll = with_tenant(client.collections.get(resolve(client, tier)), tenant)
+    q, qp = folded_query(tier, query, fold and has_folded(coll, tier))
+    props = light_props(tier, SEARCH_TIERS[tier][1] + ["token_start", "token_end"])  # Chunk / Subchunk text comes from hydrate_hits
+    res = hybrid(coll, q, alpha, limit, props, qp) if use_hybrid else bm25(coll, q, limit, props, qp)
+    return _tier_hits(res, tier)
 
-    return results[:limit]
+def hydrate_hits(client: WeaviateClient, hits: List[dict], query: str, tenant: str, fold: bool) -> List[dict]:
+    # only the hits that are shown: a KWIC snippet from their best sentence instead of the whole chunk text
+    for tier, (kind, _, _, _) in SEARCH_TIERS.items():
+        mine = [h for h in hits if h["kind"] == kind]
+        if tier not in HEAVY_TEXT or not mine:
+            continue
+        objs = [SimpleNamespace(properties={SNIPPET_PARENT[tier]: h["id"]}) for h in mine]
+        hydrate(client, tier, objs, query, "snippet", tenant, fold)
+        for h, o in zip(mine, objs):
+            h["text"] = o.properties["snippet"]
+    return hits
+
+def cascade_search(client: WeaviateClient, query: str, limit: int = 10, use_hybrid: bool = False, alpha: float = 0.5,
+                   tenant: str = "", fold: bool = True):
+    # next tier only while there are fewer than `limit` results (up to four round trips)
+    results = []
+    for tier in SEARCH_TIERS:
+        results.extend(_tier_search(client, tier, query, limit, use_hybrid, alpha, tenant, fold))
+        if len(results) >= limit:
+            break
+    return hydrate_hits(client, results[:limit], query, tenant, fold)
+
+def fused_search(client: WeaviateClient, query: str, limit: int = 10, use_hybrid: bool = False, alpha: float = 0.5,
+                 tenant: str = "", fold: bool = True, fusion: str = "rrf", deadline_ms: int = 0):
+    """
+    All tiers at once (about one round trip), merged by fusion.py: rrf or normalized score, overlapping spans
+    merged into the finest one. Chunk / Subchunk text is fetched only for the returned hits, as a snippet.
+    With deadline_ms, tiers that haven't answered in time are left out (reported as degraded).
+    """
+    pool = ThreadPoolExecutor(max_workers=len(SEARCH_TIERS))
+    futures = {tier: pool.submit(_tier_search, client, tier, query, limit, use_hybrid, alpha, tenant, fold)
+               for tier in SEARCH_TIERS}
+    wait(futures.values(), timeout=deadline_ms / 1000.0 if deadline_ms else None)
+    pool.shutdown(wait=False, cancel_futures=True)  # don't block on late tiers
+    ranked = {}
+    for tier, fut in futures.items():
+        if not fut.done():
+            print(f"[!] degraded: {tier} did not answer within {deadline_ms} ms")
+            continue
+        try:
+            ranked[tier] = fut.result()
+        except Exception as e:  # e.g. a tier that was not loaded; the others still answer
+            print(f"[!] {tier} search failed: {e}")
+    return hydrate_hits(client, fuse(ranked, method=fusion, limit=limit), query, tenant, fold)
 
 # --------------------
 # CLI
@@ -283,29 +349,61 @@ def main():
     ap.add_argument("--grpc-port", type=int, default=50051, help="Weaviate gRPC port")
     ap.add_argument("--outdir", default="outputs", help="Directory containing CSVs")
     ap.add_argument("--setup", action="store_true", help="Create collections")
+    ap.add_argument("--schema-profile", default=None, help="Schema profile (.yaml/.json); default: SCHEMA_PROFILE or profiles/schema_default.yaml")
     ap.add_argument("--insert", action="store_true", help="Insert all CSVs")
+    ap.add_argument("--collections", default="", help="Comma-separated classes to insert (default: all)")
     ap.add_argument("--search", default="", help="Run a cascade search for this query")
     ap.add_argument("--limit", type=int, default=10, help="Number of results to return")
     ap.add_argument("--hybrid", action="store_true", help="Use hybrid search if vectorizer is enabled")
+    ap.add_argument("--no-fold", action="store_true", help="Search the original text instead of the diacritic-folded copy")
+    ap.add_argument("--fusion", choices=("cascade",) + FUSION_METHODS, default="cascade",
+                    help="cascade: tier by tier until --limit hits; rrf / score: all tiers concurrently, "
+                         "fused by reciprocal rank or normalized score, overlapping spans deduplicated")
+    ap.add_argument("--deadline-ms", type=int, default=0,
+                    help="With --fusion rrf/score: fuse only the tiers that answered within this budget (0 = wait)")
+    ap.add_argument("--batch-size", type=int, default=0, help="Fixed insert batch size (default: dynamic batching)")
+    ap.add_argument("--concurrency", type=int, default=1, help="insert_many requests in flight (with --batch-size/--report)")
+    ap.add_argument("--report", default="", help="Write an ingestion report (JSON) to this path")
+    ap.add_argument("--report-run", default="default", help="Run name inside the report file")
+    ap.add_argument("--tenant", default="", help="Multi-tenant schema: insert / search only this book (tenant)")
+    ap.add_argument("--version", default="", help="Blue-green: create/insert <Class>_<version> collections (aliases.py)")
     args = ap.parse_args()
 
     client = connect(args.url, args.grpc_port)
     try:
         if args.setup:
-            create_collections(client, use_vectorizer=False)
+            create_collections(client, use_vectorizer=False, profile=args.schema_profile, version=args.version)
 
         if args.insert:
-            ingest_all(client, args.outdir)
+            report = None
+            if args.report:
+                from ingest_report import IngestReport
+                report = IngestReport({"url": args.url, "batch_size": args.batch_size or 256,
+                                       "concurrency": args.concurrency})
+            only = set(c for c in args.collections.split(",") if c) or None
+            ingest_all(client, args.outdir, batch_size=args.batch_size,
+                       concurrency=args.concurrency, report=report, only=only, tenant=args.tenant,
+                       version=args.version)
+            bump_index_stamp(client, "setup --insert")  # cached search results are stale now
+            if report is not None:
+                report.write(args.report, run=args.report_run)
 
         if args.search:
-            hits = cascade_search(client, args.search, limit=args.limit, use_hybrid=args.hybrid)
+            if args.fusion == "cascade":
+                hits = cascade_search(client, args.search, limit=args.limit, use_hybrid=args.hybrid,
+                                      tenant=args.tenant, fold=not args.no_fold)
+            else:
+                hits = fused_search(client, args.search, limit=args.limit, use_hybrid=args.hybrid,
+                                    tenant=args.tenant, fold=not args.no_fold, fusion=args.fusion,
+                                    deadline_ms=args.deadline_ms)
             print(f"\n[Results] {len(hits)} objects")
             for i, h in enumerate(hits, start=1):
                 path = f" | Path: {h['path']}" if h.get("path") else ""
                 trail = " > ".join(x for x in [h.get("h1"),h.get("h2"),h.get("h3"),h.get("h4"),h.get("h5"),h.get("h6")] if x)
                 if trail:
                     path = f" | Headings: {trail}"
-                print(f"{i:>2}. [{h['kind']}] {h['id']} | {h['chunk_id']}{path}")
+                fused = f" | {args.fusion}={h['fused']:.4f}" if "fused" in h else ""
+                print(f"{i:>2}. [{h['kind']}] {h['id']} | {h['chunk_id']}{path}{fused}")
                 print(f"    {h['text'][:180]}{'...' if len(h['text'])>180 else ''}")
     finally:
         client.close()
@@ -0,0 +1,49 @@
+# weaviate_nodes.py
+# Connect to any node of a (multi-node) Weaviate cluster.
+# --url / WEAVIATE_URL may list several REST URLs ("http://localhost:8081,http://localhost:8082,...")
+# with one gRPC port for all or one per URL ("50052,50053,50054"). Nodes are tried in random order,
+# so several search processes spread their reads over the cluster.
+import random
+from typing import List, Optional, Tuple
+
+from weaviate import WeaviateClient
+from weaviate.connect import ConnectionParams
+
+CONSISTENCY_LEVELS = ["ONE", "QUORUM", "ALL"]
+
+
+def parse_nodes(url: str, grpc_port) -> List[Tuple[str, int]]:
+    urls = [u.strip() for u in str(url).split(",") if u.strip()]
+    ports = [int(p) for p in str(grpc_port).split(",") if p.strip()]
+    if len(ports) == 1:
+        ports = ports * len(urls)
+    if not urls or len(ports) != len(urls):
+        raise SystemExit(f"ERROR: {len(urls)} URL(s) but {len(ports)} gRPC port(s); give one port or one per URL.")
+    return list(zip(urls, ports))
+
+
+def connect_any(url: str, grpc_port, shuffle: bool = True) -> WeaviateClient:
+    """Connected WeaviateClient for the first reachable node (random order when shuffle=True)."""
+    nodes = parse_nodes(url, grpc_port)
+    if shuffle:
+        random.shuffle(nodes)
+    last_err: Optional[Exception] = None
+    for node_url, node_grpc in nodes:
+        try:
+            client = WeaviateClient(ConnectionParams.from_url(node_url, grpc_port=node_grpc))
+            client.connect()
+            if len(nodes) > 1:
+                print(f"[i] Using node {node_url} (gRPC {node_grpc})")
+            return client
+        except Exception as e:
+            print(f"[!] Node {node_url} unavailable: {e}")
+            last_err = e
+    raise SystemExit(f"ERROR: no Weaviate node reachable ({last_err})")
+
+
+def with_consistency(coll, level: Optional[str]):
+    """Apply a read consistency level (ONE lets a single replica answer); None keeps the server default."""
+    if not level:
+        return coll
+    from weaviate.classes.config import ConsistencyLevel
+    return coll.with_consistency_level(ConsistencyLevel[level])
@@ -0,0 +1,48 @@
+# test_fusion.py
+# Regression tests for the multi-tier fusion (fuse / dedupe_overlaps): overlapping hits are merged into
+# the finest one and their contributions summed before ranking.
+#
+# example:
+#   python -m pytest -q etl/tests
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from fusion import fuse  # noqa: E402
+
+
+def _hit(kind, hit_id, chunk_id, start, end, score=1.0):
+    return {"kind": kind, "id": hit_id, "chunk_id": chunk_id, "token_start": start, "token_end": end,
+            "score": score}
+
+
+RANKED = {
+    "Window": [_hit("window", "w1", "c1", 0, 30), _hit("window", "w2", "c2", 0, 30)],
+    "Sentence": [_hit("sentence", "s9", "c9", 0, 10), _hit("sentence", "s1", "c1", 5, 15)],
+    "Subchunk": [_hit("subchunk", "sc7", "c7", 0, 200), _hit("subchunk", "sc1", "c1", 0, 200)],
+    "Chunk": [_hit("chunk", "c8", "c8", 0, 8000), _hit("chunk", "c1", "c1", 0, 8000)],
+}
+
+
+def test_corroborated_passage_outranks_single_tier_hits():
+    hits = fuse(RANKED, method="rrf", limit=5)
+    top = hits[0]
+    assert (top["kind"], top["id"]) == ("sentence", "s1")  # the finest of the overlapping c1 hits
+    assert sorted(top["tiers"]) == ["chunk", "sentence", "subchunk", "window"]
+    assert top["fused"] > 3 * hits[1]["fused"]
+    ids = [h["id"] for h in hits]
+    assert not {"w1", "sc1", "c1"} & set(ids)  # merged into s1, not listed again
+
+
+def test_score_fusion_sums_normalized_contributions():
+    ranked = {"Sentence": [_hit("sentence", "s1", "c1", 5, 15, 2.0), _hit("sentence", "s2", "c2", 0, 9, 1.0)],
+              "Chunk": [_hit("chunk", "c1", "c1", 0, 8000, 4.0), _hit("chunk", "c3", "c3", 0, 8000, 3.0)]}
+    hits = fuse(ranked, method="score", limit=10)
+    assert [(h["id"], h["fused"]) for h in hits] == [("s1", 2.0), ("s2", 0.0), ("c3", 0.0)]
+
+
+def test_without_dedupe_every_hit_is_listed():
+    hits = fuse(RANKED, method="rrf", limit=100, dedupe=False)
+    assert len(hits) == 8
+    assert all("tiers" not in h for h in hits)
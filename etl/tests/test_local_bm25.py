@@ -0,0 +1,72 @@
+# test_local_bm25.py
+# Offline BM25 (local_bm25.py) on a tiny Sentence CSV: Pāli folding, IDF ranking, no zero-score hits and
+# the rebuild of a stale .npz.
+#
+# example:
+#   python -m pytest -q etl/tests
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from local_bm25 import LocalBM25Index, build_index  # noqa: E402
+
+SENTENCES = [
+    ("s1", "Mettā bhāvanā is the development of loving kindness."),
+    ("s2", "The monk dwells pervading one quarter with a mind of mettā, mettā and again mettā."),
+    ("s3", "Karuṇā is compassion."),
+    ("s4", "Upekkhā is equanimity, and so is the mind of upekkha."),
+]
+
+
+def _write_csv(outdir: Path, rows):
+    path = outdir / "sentences_with_headings.csv"
+    path.write_text("sentence_id,sentence_text\n" + "".join(f'{i},"{t}"\n' for i, t in rows), encoding="utf-8")
+    return path
+
+
+def _index(tmp_path, rows=SENTENCES):
+    _write_csv(tmp_path, rows)
+    return LocalBM25Index("Sentence", tmp_path, tmp_path / "bm25")
+
+
+def test_diacritic_and_long_vowel_spellings_match(tmp_path):
+    index = _index(tmp_path)
+    for query in ("mettā", "metta", "mettaa", "METTĀ"):
+        assert {i for i, _ in index.search(query, 10)} == {"s1", "s2"}, query
+
+
+def test_more_term_hits_rank_first(tmp_path):
+    index = _index(tmp_path)
+    hits = index.search("mettā", 10)
+    assert [i for i, _ in hits] == ["s2", "s1"]
+    assert hits[0][1] > hits[1][1] > 0
+    # a rarer term weighs more: "karuṇā" (1 doc) beats "mind" (2 docs) for the same tf
+    ranked = [i for i, _ in index.search("karuna mind", 10)]
+    assert ranked[0] == "s3"
+
+
+def test_documents_without_a_query_term_are_never_returned(tmp_path):
+    index = _index(tmp_path)
+    assert [i for i, _ in index.search("upekkhā", 10)] == ["s4"]
+    assert index.search("nibbāna", 10) == []
+    assert len(index.search("mind", 1)) == 1
+
+
+def test_stale_npz_is_rebuilt_when_the_csv_changes(tmp_path):
+    csv_path = _write_csv(tmp_path, SENTENCES)
+    npz = build_index("Sentence", tmp_path, tmp_path / "bm25")
+    built = npz.stat().st_mtime_ns
+    assert LocalBM25Index("Sentence", tmp_path, tmp_path / "bm25").search("nibbāna", 10) == []
+    assert npz.stat().st_mtime_ns == built  # fresh: loaded, not rebuilt
+
+    st = csv_path.stat()
+    os.utime(csv_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # same size, newer mtime
+    LocalBM25Index("Sentence", tmp_path, tmp_path / "bm25")
+    assert npz.stat().st_mtime_ns != built
+
+    _write_csv(tmp_path, SENTENCES + [("s5", "Nibbāna is the highest bliss.")])  # new size
+    index = LocalBM25Index("Sentence", tmp_path, tmp_path / "bm25")
+    assert index.n_docs == 5
+    assert [i for i, _ in index.search("nibbana", 10)] == ["s5"]
@@ -0,0 +1,69 @@
+# test_local_search.py
+# In-process search (local_search.py): blocked top-k against a full sort, ids ↔ .npy alignment and the
+# hybrid relative-score fusion on a few hand-made vectors.
+#
+# example:
+#   python -m pytest -q etl/tests
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import local_bm25  # noqa: E402
+from local_search import LocalVectorIndex, local_search, topk  # noqa: E402
+from search_weaviate_labse_hybridfix import search_params  # noqa: E402
+
+
+@pytest.mark.parametrize("rows,k,block", [(50, 7, 3), (50, 7, 5), (10, 10, 4), (6, 20, 4)])
+def test_topk_matches_a_full_argsort(rows, k, block):
+    rng = np.random.default_rng(rows + k)
+    vectors = rng.normal(size=(rows, 8)).astype(np.float32)
+    q = rng.normal(size=8).astype(np.float32)
+    idx, scores = topk(vectors, q, k, block=block)
+    expected = np.argsort(-(vectors @ q), kind="stable")[:k]
+    assert idx.tolist() == expected.tolist()
+    assert np.allclose(scores, (vectors @ q)[expected])
+
+
+# sentence_id, text, LaBSE stand-in (unit vectors); the query vector is [1, 0, 0]
+SENTENCES = [
+    ("s1", "metta metta metta", [0.0, 1.0, 0.0]),
+    ("s2", "karuna", [1.0, 0.0, 0.0]),
+    ("s3", "metta in the long run of a longer sentence", [0.6, 0.8, 0.0]),
+    ("s4", "upekkha", [0.0, 0.0, 1.0]),
+]
+
+
+def _artifacts(outdir: Path, rows=SENTENCES, n_ids=None):
+    (outdir / "sentences_with_headings.csv").write_text(
+        "sentence_id,sentence_text\n" + "".join(f"{i},{t}\n" for i, t, _ in rows), encoding="utf-8")
+    ids = [i for i, _, _ in rows][:n_ids]
+    (outdir / "sentences_ids.txt").write_text("".join(f"{i}\n" for i in ids), encoding="utf-8")
+    np.save(outdir / "sentences_labse.npy", np.array([v for _, _, v in rows], dtype=np.float32))
+
+
+def test_ids_and_npy_row_count_mismatch_is_an_error(tmp_path):
+    _artifacts(tmp_path, n_ids=3)
+    with pytest.raises(ValueError, match="4 rows but sentences_ids.txt 3 ids"):
+        LocalVectorIndex("Sentence", tmp_path)
+
+
+@pytest.mark.parametrize("alpha,expected", [
+    # vector min-max: s2 1, s3 .6, s1 0, s4 0; BM25 min-max ("metta"): s1 1, s3 0
+    (1.0, [("s2", 1.0), ("s3", 0.6), ("s1", 0.0)]),
+    (0.6, [("s2", 0.6), ("s1", 0.4), ("s3", 0.36)]),
+    (0.3, [("s1", 0.7), ("s2", 0.3), ("s3", 0.18)]),
+])
+def test_hybrid_is_min_max_relative_score_fusion(tmp_path, monkeypatch, alpha, expected):
+    monkeypatch.setattr(local_bm25, "BM25_DIR", tmp_path / "bm25")
+    _artifacts(tmp_path)
+    p = search_params({"collection": "Sentence", "mode": "hybrid", "query": "metta", "k": 3, "alpha": alpha,
+                       "backend": "local"})
+    result = local_search(p, encode=lambda text: np.array([1.0, 0.0, 0.0], dtype=np.float32), outdir=tmp_path)
+    got = [(h["properties"]["sentence_id"], h["score"]) for h in result["objects"]]
+    assert [i for i, _ in got] == [i for i, _ in expected]
+    assert [s for _, s in got] == pytest.approx([s for _, s in expected], abs=1e-6)
+    assert result["backend"] == "local" and result["mode"] == "hybrid"
@@ -0,0 +1,82 @@
+# test_pali_fold.py
+# Pāli diacritic folding (pali_fold.py) that every BM25 path relies on: the folded text, the
+# length-preserving variant KWIC offsets depend on, and the fallback to the unfolded field.
+#
+# example:
+#   python -m pytest -q etl/tests
+import sys
+import unicodedata
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import pali_fold  # noqa: E402
+from pali_fold import add_folded, fold, fold_chars, folded_query, has_folded  # noqa: E402
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("Mettā", "metta"),
+    ("METTĀ", "metta"),
+    ("Mettāsuttaṃ", "mettasuttam"),
+    ("saṅgha ñāṇa ṭhāna ḍīpa ḷ", "sangha nana thana dipa l"),
+    ("Ānanda", "ananda"),
+    ("Méttā", "metta"),  # decomposed (NFD) input
+])
+def test_diacritics_and_case(text, expected):
+    assert fold(text) == expected
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("mettaa", "metta"),
+    ("niibbaana", "nibbana"),
+    ("bhikkhuu", "bhikkhu"),
+    ("Mettaa-suttaa", "metta-sutta"),  # every doubled a / i / u; consonants stay doubled
+    ("ee oo kk", "ee oo kk"),          # only a / i / u are long vowels
+    ("mettā", fold("mettaa")),
+])
+def test_long_vowels_collapse(text, expected):
+    assert fold(text) == expected
+
+
+@pytest.mark.parametrize("text", ["Mettāsuttaṃ", "Méttā", "aa ii uu", "ṭhāna—ñāṇa", ""])
+def test_fold_chars_keeps_the_nfc_length(text):
+    nfc = unicodedata.normalize("NFC", text)
+    folded = fold_chars(text)
+    assert len(folded) == len(nfc)
+    assert folded == folded.lower()
+    for i, ch in enumerate(nfc):  # offsets carry over character by character
+        assert folded[i] == fold_chars(ch)
+
+
+@pytest.mark.parametrize("tier,enabled,expected", [
+    ("Sentence", True, ("metta", ["sentence_text_folded"])),
+    ("Window", True, ("metta", ["text_folded"])),
+    ("Sentence", False, ("Mettaa", None)),   # folding disabled: raw query, default (unfolded) fields
+    ("AliasRegistry", True, ("Mettaa", None)),  # tier without a folded copy
+])
+def test_folded_query(tier, enabled, expected):
+    assert folded_query(tier, "Mettaa", enabled) == expected
+
+
+def _collection(name, props):
+    config = SimpleNamespace(get=lambda: SimpleNamespace(properties=[SimpleNamespace(name=p) for p in props]))
+    return SimpleNamespace(name=name, config=config)
+
+
+def test_collections_without_the_folded_field_fall_back(monkeypatch):
+    monkeypatch.setattr(pali_fold, "_has_folded", {})
+    old = _collection("Sentence_v1", ["sentence_id", "sentence_text"])
+    new = _collection("Sentence_v2", ["sentence_id", "sentence_text", "sentence_text_folded"])
+    assert not has_folded(old, "Sentence")
+    assert has_folded(new, "Sentence")
+    assert folded_query("Sentence", "Mettā", has_folded(old, "Sentence")) == ("Mettā", None)
+    assert folded_query("Sentence", "Mettā", has_folded(new, "Sentence")) == ("metta", ["sentence_text_folded"])
+
+
+def test_add_folded_copies_only_the_tier_text():
+    props = add_folded({"sentence_id": "s1", "sentence_text": "Mettā", "path": "Ā"}, "Sentence")
+    assert props == {"sentence_id": "s1", "sentence_text": "Mettā", "path": "Ā", "sentence_text_folded": "metta"}
+    assert add_folded({"sentence_text": None}, "Sentence")["sentence_text_folded"] is None
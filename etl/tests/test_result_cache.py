@@ -0,0 +1,90 @@
+# test_result_cache.py
+# Search result cache (result_cache.py): request keys, index-stamp invalidation and the query log that
+# prewarm replays, in memory and on the SQLite file.
+#
+# example:
+#   python -m pytest -q etl/tests
+import sys
+import unicodedata
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from result_cache import ResultCache, request_key  # noqa: E402
+
+PARAMS = {"collection": "Window", "mode": "hybrid", "query": "mettā bhāvanā", "k": 5, "alpha": 0.5,
+          "deadline_ms": 0, "cache": True}
+RESULT = {"collection": "Window", "mode": "hybrid", "objects": [{"uuid": "u1", "score": 1.0}]}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    path = str(tmp_path / "results.sqlite") if request.param == "sqlite" else ""
+    c = ResultCache(capacity=16, path=path)
+    yield c
+    c.close()
+
+
+def test_deadline_and_cache_flags_do_not_change_the_key():
+    base = request_key(PARAMS)
+    assert request_key({**PARAMS, "deadline_ms": 150}) == base
+    assert request_key({**PARAMS, "cache": False}) == base
+    assert request_key({**PARAMS, "k": 10}) != base
+    assert request_key({**PARAMS, "alpha": 0.7}) != base
+
+
+@pytest.mark.parametrize("query", [
+    "  mettā   bhāvanā ",
+    "mettā\tbhāvanā\n",
+    unicodedata.normalize("NFD", "mettā bhāvanā"),
+])
+def test_whitespace_and_nfc_variants_share_a_key(query):
+    assert request_key({**PARAMS, "query": query}) == request_key(PARAMS)
+
+
+def test_case_and_diacritics_stay_distinct():
+    assert request_key({**PARAMS, "query": "metta bhavana"}) != request_key(PARAMS)
+
+
+def test_entries_of_another_stamp_are_misses(cache):
+    key = request_key(PARAMS)
+    cache.put(key, "stamp-1", RESULT)
+    assert cache.get(key, "stamp-1") == RESULT
+    assert cache.get(key, "stamp-2") is None
+    assert cache.get(key, "") is None
+    assert cache.counts["misses"] == 2
+
+
+def test_prune_removes_file_entries_of_older_stamps(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    old, new = request_key(PARAMS), request_key({**PARAMS, "k": 10})
+    writer = ResultCache(capacity=16, path=path)
+    writer.put(old, "stamp-1", RESULT)
+    writer.put(new, "stamp-2", RESULT)
+    assert writer.prune("stamp-2") == 1
+    assert writer.stats()["disk_entries"] == 1
+    writer.close()
+
+    reader = ResultCache(capacity=0, path=path)  # file only: no memory copy to hide a stale row
+    assert reader.get(old, "stamp-1") is None
+    assert reader.get(new, "stamp-2") == RESULT
+    reader.close()
+
+
+def test_prune_without_a_file_drops_nothing():
+    c = ResultCache(capacity=16, path="")
+    c.put(request_key(PARAMS), "stamp-1", RESULT)
+    assert c.prune("stamp-2") == 0
+
+
+def test_top_requests_orders_the_query_log_by_count(cache):
+    requests = {q: {**PARAMS, "query": q} for q in ("a", "b", "c")}
+    for q, n in (("b", 3), ("a", 1), ("c", 2)):
+        for _ in range(n):
+            cache.log(request_key(requests[q]))
+    top = cache.top_requests(2)
+    assert [r["query"] for r in top] == ["b", "c"]
+    assert "deadline_ms" not in top[0] and top[0]["k"] == 5  # replayable search params
+    assert [r["query"] for r in cache.top_requests(10)] == ["b", "c", "a"]
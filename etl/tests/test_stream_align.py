@@ -0,0 +1,97 @@
+# test_stream_align.py
+# Regression tests for the CSV ↔ ids stream-join used by the inserters (iter_aligned / aligned_batches).
+#
+# example:
+#   python -m pytest -q etl/tests
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from stream_align import aligned_batches, iter_aligned  # noqa: E402
+
+
+def _write(tmp_path, rows, ids):
+    csv_path = tmp_path / "tier.csv"
+    ids_path = tmp_path / "tier_ids.txt"
+    csv_path.write_text("id,text\n" + "".join(f"{r},t{r}\n" for r in rows), encoding="utf-8")
+    ids_path.write_text("".join(f"{i}\n" for i in ids), encoding="utf-8")
+    return str(csv_path), str(ids_path)
+
+
+def _join(csv_path, ids_path, **kw):
+    skipped = []
+    got = {rid: vi for rid, _rec, vi in iter_aligned(csv_path, "id", ids_path,
+                                                      on_skip=lambda i, why: skipped.append((i, why)), **kw)}
+    return got, skipped
+
+
+def test_interleaved_orphan_rows_keep_every_vector(tmp_path):
+    # rows without text (no vector) scattered through the CSV, as make_labse_embeddings.read_pairs skips them
+    rng = random.Random(0)
+    rows = [f"r{i}" for i in range(30000)]
+    orphans = {r for r in rows if rng.random() < 0.05}
+    ids = [r for r in rows if r not in orphans]
+    got, skipped = _join(*_write(tmp_path, rows, ids), chunksize=256, max_pending=1000)
+    assert got == {the_id: vi for vi, the_id in enumerate(ids)}
+    assert sorted(skipped) == sorted((r, "no vector") for r in orphans)
+
+
+def test_ids_without_rows_are_reported(tmp_path):
+    rows = [f"r{i}" for i in range(5000)]
+    ids = []
+    for r in rows:
+        ids.append(r)
+        if r.endswith("7"):
+            ids.append(f"gone-{r}")  # vector whose CSV row was removed
+    got, skipped = _join(*_write(tmp_path, rows, ids), chunksize=100, max_pending=200)
+    assert got == {the_id: vi for vi, the_id in enumerate(ids) if not the_id.startswith("gone-")}
+    assert sorted(skipped) == sorted((i, "no CSV row") for i in ids if i.startswith("gone-"))
+
+
+def test_local_disorder_within_the_window_still_meets(tmp_path):
+    rng = random.Random(1)
+    rows = [f"r{i}" for i in range(4000)]
+    ids = [r for r in rows if rng.random() > 0.1]
+    for start in range(0, len(ids) - 10, 10):  # shuffle ids in blocks of 10
+        block = ids[start:start + 10]
+        rng.shuffle(block)
+        ids[start:start + 10] = block
+    got, skipped = _join(*_write(tmp_path, rows, ids), chunksize=64, max_pending=100)
+    assert got == {the_id: vi for vi, the_id in enumerate(ids)}
+    assert {why for _i, why in skipped} <= {"no vector"}
+    assert len(skipped) == len(rows) - len(ids)
+
+
+def test_aligned_batches_gather_the_matching_vectors(tmp_path):
+    rows = [f"r{i}" for i in range(1000)]
+    ids = [r for i, r in enumerate(rows) if i % 9]
+    csv_path, ids_path = _write(tmp_path, rows, ids)
+    npy_path = tmp_path / "tier_labse.npy"
+    np.save(npy_path, np.arange(len(ids) * 4, dtype=np.float32).reshape(len(ids), 4))
+    seen = 0
+    for batch_ids, _recs, block in aligned_batches(csv_path, "id", ids_path, str(npy_path), batch_size=64):
+        for the_id, vec in zip(batch_ids, block):
+            assert vec[0] == ids.index(the_id) * 4
+        seen += len(batch_ids)
+    assert seen == len(ids)
+
+
+def test_orphan_rows_come_back_as_vectorless_batches(tmp_path):
+    rows = [f"r{i}" for i in range(700)]
+    ids = [r for i, r in enumerate(rows) if i % 7]
+    csv_path, ids_path = _write(tmp_path, rows, ids)
+    npy_path = tmp_path / "tier_labse.npy"
+    np.save(npy_path, np.zeros((len(ids), 4), dtype=np.float32))
+    skipped = []
+    with_vec, without = [], []
+    for batch_ids, recs, block in aligned_batches(csv_path, "id", ids_path, str(npy_path), batch_size=32,
+                                                  on_skip=lambda i, why: skipped.append(i), orphans=True):
+        assert len(batch_ids) == len(recs) <= 32
+        (with_vec if block is not None else without).extend(batch_ids)
+    assert sorted(with_vec) == sorted(ids)
+    assert sorted(without) == sorted(set(rows) - set(ids))
+    assert skipped == []